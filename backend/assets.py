@@ -0,0 +1,233 @@
+import base64
+import hashlib
+import os
+import threading
+
+from backend.protocol import encode_message
+
+DEFAULT_CHUNK_SIZE = 32 * 1024
+MAX_TRANSFERS_PER_SESSION = 4
+# How long the worker sleeps when every open transfer is waiting on a client
+# that is not reading.
+BLOCKED_WAIT = 0.02
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class AssetStore:
+    def __init__(self, assets_path):
+        self._assets_path = assets_path
+        self._by_hash = {}
+        self._by_name = {}
+        self._load_assets()
+
+    def _load_assets(self):
+        if not os.path.isdir(self._assets_path):
+            return
+        for root, _, names in os.walk(self._assets_path):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    digest = hash_file(path)
+                    size = os.path.getsize(path)
+                except OSError:
+                    continue
+                relative = os.path.relpath(path, self._assets_path).replace(os.sep, "/")
+                self._by_name[relative] = digest
+                # Identical files under different names are stored once.
+                self._by_hash.setdefault(digest, (path, size))
+
+    def index(self):
+        return {
+            name: {"hash": digest, "size": self._by_hash[digest][1]}
+            for name, digest in sorted(self._by_name.items())
+        }
+
+    def resolve(self, name):
+        return self._by_name.get(name)
+
+    def info(self, digest):
+        entry = self._by_hash.get(digest)
+        if entry is None:
+            return None
+        return {"hash": digest, "size": entry[1]}
+
+    def open(self, digest):
+        entry = self._by_hash.get(digest)
+        if entry is None:
+            return None
+        return open(entry[0], "rb")
+
+
+class AssetTransfer:
+    __slots__ = (
+        "key", "handler", "transfer_id", "digest", "handle", "offset", "end", "chunk",
+    )
+
+    def __init__(self, key, handler, transfer_id, digest, handle, offset, end):
+        self.key = key
+        self.handler = handler
+        self.transfer_id = transfer_id
+        self.digest = digest
+        self.handle = handle
+        self.offset = offset
+        self.end = end
+        # The encoded next chunk with its size and final flag, kept until the
+        # connection takes it.
+        self.chunk = None
+
+
+class AssetStreamer:
+    # Streams chunks for every open transfer from one worker thread, one chunk
+    # per transfer per pass. Each chunk is a separate write, so state frames
+    # sent by other threads slip in between chunks instead of queueing behind
+    # a whole file. Chunks go out with send_nowait: a transfer whose client is
+    # not reading is skipped for the pass rather than stalling the others or
+    # holding that connection's send lock.
+    def __init__(
+        self,
+        store,
+        chunk_size=DEFAULT_CHUNK_SIZE,
+        max_per_session=MAX_TRANSFERS_PER_SESSION,
+    ):
+        self._store = store
+        self.chunk_size = chunk_size
+        self.max_per_session = max_per_session
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._transfers = []
+        self._started = 0
+        self._bytes_sent = 0
+        self._thread = None
+
+    def start(self):
+        if self._thread:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if not self._thread:
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(1.0)
+        self._thread = None
+        with self._lock:
+            transfers, self._transfers = self._transfers, []
+        for transfer in transfers:
+            transfer.handle.close()
+
+    def open(self, key, handler, digest, offset=0, length=None, transfer_id=None):
+        info = self._store.info(digest)
+        if info is None:
+            return None, "Unknown asset"
+        size = info["size"]
+        if offset > size:
+            return None, "Invalid asset offset"
+        end = size if length is None else min(size, offset + length)
+        with self._lock:
+            active = sum(1 for transfer in self._transfers if transfer.key == key)
+        if active >= self.max_per_session:
+            return None, "Too many asset transfers"
+        try:
+            handle = self._store.open(digest)
+            handle.seek(offset)
+        except OSError:
+            return None, "Asset unavailable"
+        info = dict(info, offset=offset, length=end - offset)
+        # The header goes out before the transfer is visible to the worker, so
+        # it always precedes the first chunk.
+        handler.send_raw(encode_message(dict(info, type="asset_info", id=transfer_id)))
+        with self._lock:
+            self._transfers.append(
+                AssetTransfer(key, handler, transfer_id, digest, handle, offset, end)
+            )
+            self._started += 1
+        self._wake.set()
+        return info, None
+
+    def cancel_session(self, key):
+        with self._lock:
+            closed = [transfer for transfer in self._transfers if transfer.key == key]
+            self._transfers = [transfer for transfer in self._transfers if transfer.key != key]
+        for transfer in closed:
+            transfer.handle.close()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "active": len(self._transfers),
+                "started": self._started,
+                "bytes_sent": self._bytes_sent,
+            }
+
+    def _send_chunk(self, transfer):
+        # Returns (bytes sent, finished), or None if the client is not ready.
+        if transfer.chunk is None:
+            length = min(self.chunk_size, transfer.end - transfer.offset)
+            try:
+                data = transfer.handle.read(length) if length > 0 else b""
+            except (OSError, ValueError):
+                data = b""
+            final = length <= 0 or len(data) < self.chunk_size or (
+                transfer.offset + len(data) >= transfer.end
+            )
+            frame = encode_message({
+                "type": "asset_chunk",
+                "id": transfer.transfer_id,
+                "hash": transfer.digest,
+                "offset": transfer.offset,
+                "data": base64.b64encode(data).decode("ascii"),
+                "final": final,
+            })
+            transfer.chunk = (frame, len(data), final)
+        frame, size, final = transfer.chunk
+        if not transfer.handler.send_nowait(frame):
+            return None
+        transfer.chunk = None
+        transfer.offset += size
+        return size, final
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self._lock:
+                transfers = list(self._transfers)
+            if not transfers:
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            sent = 0
+            progressed = False
+            finished = []
+            for transfer in transfers:
+                if self._stop.is_set():
+                    return
+                result = self._send_chunk(transfer)
+                if result is None:
+                    continue
+                progressed = True
+                size, final = result
+                sent += size
+                if final:
+                    finished.append(transfer)
+            with self._lock:
+                self._bytes_sent += sent
+                if finished:
+                    self._transfers = [
+                        transfer for transfer in self._transfers if transfer not in finished
+                    ]
+            for transfer in finished:
+                transfer.handle.close()
+            if not progressed:
+                self._wake.wait(BLOCKED_WAIT)
+                self._wake.clear()
@@ -0,0 +1,187 @@
+import json
+import socket
+import struct
+import threading
+import time
+
+DISCOVERY_PORT = 5099
+MULTICAST_GROUP = "239.255.42.99"
+DISCOVERY_SERVICE = "who-is-the-murderer"
+PROBE = b"WITM-PROBE 1\n"
+DISCOVERY_TIMEOUT = 0.3
+# One probe is sent to several targets and may arrive more than once; repeats
+# from the same socket inside this window are not answered again.
+MIN_REPLY_INTERVAL = 0.1
+MAX_TRACKED_PROBERS = 1024
+
+
+def local_address():
+    # The address of the interface that routes off this machine. Connecting a
+    # UDP socket sends nothing.
+    try:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            sock.connect(("8.8.8.8", 80))
+            return sock.getsockname()[0]
+        finally:
+            sock.close()
+    except OSError:
+        return "127.0.0.1"
+
+
+def encode_beacon(beacon):
+    return json.dumps(dict(beacon, service=DISCOVERY_SERVICE), ensure_ascii=False).encode("utf-8")
+
+
+class DiscoveryResponder:
+    # Answers probes on a UDP port, joined to the multicast group and open to
+    # broadcast and unicast probes too. beacon() returns ready-made bytes the
+    # caller caches, so a probe costs one recvfrom and one sendto.
+    def __init__(self, beacon, port=DISCOVERY_PORT, group=MULTICAST_GROUP):
+        self._beacon = beacon
+        self._group = group
+        self._requested_port = port
+        self._socket = None
+        self._thread = None
+        self._answered = {}
+        self._probes = 0
+        self._replies = 0
+        self._repeats = 0
+        self._busy = 0.0
+
+    @property
+    def port(self):
+        return self._socket.getsockname()[1] if self._socket else self._requested_port
+
+    def start(self):
+        if self._thread:
+            return
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if hasattr(socket, "SO_REUSEPORT"):
+            # Several hosts on one machine can then share the port; multicast
+            # and broadcast probes reach each of them.
+            try:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+            except OSError:
+                pass
+        try:
+            sock.bind(("", self._requested_port))
+        except OSError:
+            sock.close()
+            raise
+        try:
+            membership = struct.pack(
+                "4s4s", socket.inet_aton(self._group), socket.inet_aton("0.0.0.0")
+            )
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, membership)
+        except OSError:
+            # No multicast route; broadcast and unicast probes still work.
+            pass
+        self._socket = sock
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if not self._thread:
+            return
+        sock, self._socket = self._socket, None
+        # Closing the socket wakes recvfrom, which ends the loop.
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        sock.close()
+        self._thread.join(1.0)
+        self._thread = None
+
+    def _run(self):
+        sock = self._socket
+        answered = self._answered
+        while True:
+            try:
+                data, address = sock.recvfrom(64)
+            except OSError:
+                if self._socket is None:
+                    return
+                # An ICMP error for an earlier reply to a prober that left.
+                continue
+            if data != PROBE:
+                continue
+            start = time.perf_counter()
+            self._probes += 1
+            last = answered.get(address)
+            if last is not None and start - last < MIN_REPLY_INTERVAL:
+                self._repeats += 1
+                continue
+            if len(answered) >= MAX_TRACKED_PROBERS:
+                answered.clear()
+            answered[address] = start
+            try:
+                sock.sendto(self._beacon(), address)
+                self._replies += 1
+            except OSError:
+                pass
+            self._busy += time.perf_counter() - start
+
+    def snapshot(self):
+        return {
+            "port": self.port,
+            "probes": self._probes,
+            "replies": self._replies,
+            "repeats": self._repeats,
+            "busy_ms": round(self._busy * 1000, 3),
+        }
+
+
+def discover_hosts(
+    timeout=DISCOVERY_TIMEOUT,
+    port=DISCOVERY_PORT,
+    group=MULTICAST_GROUP,
+    targets=None,
+    on_found=None,
+):
+    # Sends one probe to the multicast group, the broadcast address and this
+    # machine, then collects beacons until the timeout. "host" is set to the
+    # address the first reply came from, which is known to be reachable.
+    targets = targets or (group, "255.255.255.255", "127.0.0.1")
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    hosts = {}
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 1)
+        for target in targets:
+            try:
+                sock.sendto(PROBE, (target, port))
+            except OSError:
+                continue
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            sock.settimeout(remaining)
+            try:
+                data, address = sock.recvfrom(2048)
+            except socket.timeout:
+                break
+            except OSError:
+                continue
+            try:
+                beacon = json.loads(data.decode("utf-8"))
+            except (UnicodeDecodeError, ValueError):
+                continue
+            if not isinstance(beacon, dict) or beacon.get("service") != DISCOVERY_SERVICE:
+                continue
+            beacon["host"] = address[0]
+            # A local host answers both over loopback and over the LAN; its
+            # id keeps it to one entry.
+            key = beacon.get("id") or (beacon["host"], beacon.get("port"))
+            if key in hosts:
+                continue
+            hosts[key] = beacon
+            if on_found is not None:
+                on_found(beacon)
+    finally:
+        sock.close()
+    return list(hosts.values())
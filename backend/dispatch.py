@@ -0,0 +1,206 @@
+_MISSING = object()
+
+
+def non_empty_str(value):
+    if not isinstance(value, str):
+        raise TypeError("expected a string")
+    return value
+
+
+def scalar_id(value):
+    # Ids from clients are used as dict keys; lists and objects are not.
+    return isinstance(value, (str, int)) and not isinstance(value, bool)
+
+
+def as_bool(value):
+    return bool(value)
+
+
+def operation_list(value):
+    if not isinstance(value, list) or not value:
+        raise ValueError("expected a non-empty list")
+    for item in value:
+        if not isinstance(item, dict) or not isinstance(item.get("type"), str):
+            raise ValueError("each operation needs a type")
+    return value
+
+
+def etag_map(value):
+    if not isinstance(value, dict):
+        raise ValueError("expected an object")
+    for key, etag in value.items():
+        if not isinstance(etag, str):
+            raise ValueError("etags must be strings")
+    return value
+
+
+def phase_timers(value):
+    if not isinstance(value, dict):
+        raise ValueError("expected an object")
+    timers = {}
+    for phase, seconds in value.items():
+        if isinstance(seconds, bool) or not isinstance(seconds, (int, float)) or seconds < 0:
+            raise ValueError("timer durations must be non-negative numbers")
+        timers[phase] = float(seconds)
+    return timers
+
+
+class Field:
+    __slots__ = ("name", "convert", "required", "default", "error", "check", "check_error")
+
+    def __init__(
+        self,
+        name,
+        convert=None,
+        required=True,
+        default=None,
+        error=None,
+        check=None,
+        check_error=None,
+    ):
+        self.name = name
+        self.convert = convert
+        self.required = required
+        self.default = default
+        self.error = error or f"Invalid {name}"
+        self.check = check
+        self.check_error = check_error or self.error
+
+
+class MessageSpec:
+    __slots__ = (
+        "message_type",
+        "handler",
+        "host_only",
+        "phases",
+        "phase_error",
+        "requires_session",
+        "batchable",
+        "spectator",
+        "_fields",
+    )
+
+    def __init__(
+        self,
+        message_type,
+        handler,
+        fields=(),
+        host_only=False,
+        phases=None,
+        phase_error=None,
+        requires_session=True,
+        batchable=True,
+        spectator=False,
+    ):
+        self.message_type = message_type
+        self.handler = handler
+        self.host_only = host_only
+        self.phases = frozenset(phases) if phases else None
+        self.phase_error = phase_error or "Not allowed in the current phase"
+        self.requires_session = requires_session
+        self.batchable = batchable
+        self.spectator = spectator
+        self._fields = tuple(
+            (
+                field.name,
+                field.convert,
+                field.required,
+                field.default,
+                field.error,
+                field.check,
+                field.check_error,
+            )
+            for field in fields
+        )
+
+    @property
+    def needs_session_info(self):
+        return self.host_only or self.phases is not None
+
+    def validate(self, message, session_info=None):
+        if session_info is not None:
+            is_host, phase = session_info
+            if self.host_only and not is_host:
+                return None, "Host only"
+            if self.phases is not None and phase not in self.phases:
+                return None, self.phase_error
+        values = {}
+        for name, convert, required, default, error, check, check_error in self._fields:
+            value = message.get(name, _MISSING)
+            if value is _MISSING or value is None or value == "":
+                if required:
+                    return None, error
+                values[name] = default
+                continue
+            if convert is not None:
+                try:
+                    value = convert(value)
+                except (TypeError, ValueError):
+                    return None, error
+            if check is not None and not check(value):
+                return None, check_error
+            values[name] = value
+        return values, None
+
+
+class MessageRegistry:
+    def __init__(self):
+        self._specs = {}
+
+    def register(self, message_type, handler=None, **options):
+        if handler is None:
+            def decorator(func):
+                self.register(message_type, func, **options)
+                return func
+            return decorator
+        if message_type in self._specs:
+            raise ValueError(f"Message type already registered: {message_type}")
+        spec = MessageSpec(message_type, handler, **options)
+        self._specs[message_type] = spec
+        return spec
+
+    def unregister(self, message_type):
+        self._specs.pop(message_type, None)
+
+    def get(self, message_type):
+        return self._specs.get(message_type)
+
+    def message_types(self):
+        return sorted(self._specs)
+
+
+class DispatchContext:
+    __slots__ = (
+        "server",
+        "handler",
+        "player_id",
+        "message_type",
+        "values",
+        "error",
+        "changed",
+        "replies",
+        "outbox",
+    )
+
+    def __init__(self, server, handler, message_type, values):
+        self.server = server
+        self.handler = handler
+        self.player_id = handler.player_id
+        self.message_type = message_type
+        self.values = values
+        self.error = None
+        self.changed = False
+        self.replies = []
+        self.outbox = []
+
+    def reply(self, message):
+        self.replies.append(message)
+
+    def send_to(self, player_id, message):
+        self.outbox.append((player_id, message))
+
+    def fail(self, text):
+        self.error = text
+
+    def mark_changed(self):
+        self.changed = True
@@ -0,0 +1,365 @@
+import argparse
+import json
+import os
+import sys
+import threading
+
+SEGMENT_BYTES = 4 * 1024 * 1024
+SEGMENT_PREFIX = "segment-"
+INDEX_FILE = "index.log"
+AGGREGATES_FILE = "aggregates.json"
+WORKER_PREFIX = "worker-"
+REPLAY_DIR = "replays"
+# Index entries are positional to keep the index small:
+# [game_id, segment, offset, length, script_id, ended_at]
+ENTRY_GAME, ENTRY_SEGMENT, ENTRY_OFFSET, ENTRY_LENGTH, ENTRY_SCRIPT, ENTRY_ENDED = range(6)
+
+
+def default_history_dir():
+    base = os.environ.get("XDG_DATA_HOME") or os.path.join(
+        os.path.expanduser("~"), ".local", "share"
+    )
+    return os.path.join(base, "who-is-the-murderer", "history")
+
+
+def _segment_name(number):
+    return f"{SEGMENT_PREFIX}{number:06d}.log"
+
+
+def empty_aggregates():
+    return {"games": 0, "scripts": {}}
+
+
+def fold_record(aggregates, record):
+    # Every figure is a sum or a count, so folding records one at a time and
+    # merging archives are the same operation.
+    aggregates["games"] += 1
+    script = aggregates["scripts"].setdefault(record["script_id"], {
+        "title": "",
+        "games": 0,
+        "players": 0,
+        "votes": 0,
+        "correct_votes": 0,
+        "decided": 0,
+        "solved": 0,
+        "clues": {},
+        "phases": {},
+    })
+    script["title"] = record.get("title") or script["title"]
+    script["games"] += 1
+    script["players"] += len(record.get("players", []))
+    outcome = record.get("outcome") or {}
+    if outcome.get("correct_votes") is not None:
+        script["votes"] += outcome.get("votes", 0)
+        script["correct_votes"] += outcome["correct_votes"]
+        script["decided"] += 1
+        script["solved"] += 1 if outcome.get("solved") else 0
+    for clue in record.get("clues", []):
+        entry = script["clues"].setdefault(clue["clue_id"], {"name": "", "count": 0})
+        entry["name"] = clue.get("name") or entry["name"]
+        entry["count"] += 1
+    for phase, seconds in record.get("phases", []):
+        entry = script["phases"].setdefault(phase, [0.0, 0])
+        entry[0] += seconds
+        entry[1] += 1
+    return aggregates
+
+
+def merge_aggregates(target, source):
+    target["games"] += source["games"]
+    for script_id, theirs in source["scripts"].items():
+        ours = target["scripts"].get(script_id)
+        if ours is None:
+            target["scripts"][script_id] = json.loads(json.dumps(theirs))
+            continue
+        ours["title"] = theirs["title"] or ours["title"]
+        for key in ("games", "players", "votes", "correct_votes", "decided", "solved"):
+            ours[key] += theirs[key]
+        for clue_id, clue in theirs["clues"].items():
+            entry = ours["clues"].setdefault(clue_id, {"name": clue["name"], "count": 0})
+            entry["count"] += clue["count"]
+        for phase, (seconds, count) in theirs["phases"].items():
+            entry = ours["phases"].setdefault(phase, [0.0, 0])
+            entry[0] += seconds
+            entry[1] += count
+    return target
+
+
+def _ratio(numerator, denominator):
+    return round(numerator / denominator, 4) if denominator else None
+
+
+def build_report(aggregates, script_id=None, top_clues=10):
+    scripts = aggregates["scripts"]
+    if script_id is not None:
+        scripts = {script_id: scripts[script_id]} if script_id in scripts else {}
+    report = []
+    for key in sorted(scripts, key=lambda key: (-scripts[key]["games"], key)):
+        script = scripts[key]
+        clues = sorted(
+            script["clues"].items(), key=lambda item: (-item[1]["count"], item[0])
+        )[:top_clues]
+        report.append({
+            "script_id": key,
+            "title": script["title"],
+            "games": script["games"],
+            "average_players": _ratio(script["players"], script["games"]),
+            "vote_accuracy": _ratio(script["correct_votes"], script["votes"]),
+            "solve_rate": _ratio(script["solved"], script["decided"]),
+            "clue_frequency": [
+                {
+                    "clue_id": clue_id,
+                    "name": clue["name"],
+                    "per_game": _ratio(clue["count"], script["games"]),
+                }
+                for clue_id, clue in clues
+            ],
+            "phase_seconds": {
+                phase: round(seconds / count, 1)
+                for phase, (seconds, count) in script["phases"].items()
+                if count
+            },
+        })
+    return {"games": aggregates["games"], "scripts": report}
+
+
+class GameHistory:
+    # Append-only archive of finished games. Records go to numbered segment
+    # files; a one-line-per-game index holds where each record lives, and
+    # aggregates.json holds running sums that reports are built from, so
+    # neither listing games nor reporting reads the segments.
+    def __init__(self, root, segment_bytes=SEGMENT_BYTES):
+        self.root = root
+        self.segment_bytes = segment_bytes
+        self._lock = threading.Lock()
+        self._entries = []
+        self._game_ids = set()
+        self._aggregates = empty_aggregates()
+        self._segment = 1
+        self._handle = None
+        self._index_handle = None
+        os.makedirs(root, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        sizes = {}
+        for name in os.listdir(self.root):
+            if name.startswith(SEGMENT_PREFIX):
+                try:
+                    number = int(name[len(SEGMENT_PREFIX):].split(".")[0])
+                except ValueError:
+                    continue
+                sizes[number] = os.path.getsize(os.path.join(self.root, name))
+        if sizes:
+            self._segment = max(sizes)
+        try:
+            with open(os.path.join(self.root, INDEX_FILE), "r", encoding="utf-8") as handle:
+                lines = handle.readlines()
+        except OSError:
+            lines = []
+        for line in lines:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # A torn last line from a crash mid-append.
+                continue
+            end = entry[ENTRY_OFFSET] + entry[ENTRY_LENGTH]
+            if sizes.get(entry[ENTRY_SEGMENT], 0) < end or entry[ENTRY_GAME] in self._game_ids:
+                continue
+            self._entries.append(entry)
+            self._game_ids.add(entry[ENTRY_GAME])
+        try:
+            with open(os.path.join(self.root, AGGREGATES_FILE), "r", encoding="utf-8") as handle:
+                aggregates = json.load(handle)
+        except (OSError, ValueError):
+            aggregates = None
+        if not isinstance(aggregates, dict) or aggregates.get("games", 0) > len(self._entries):
+            aggregates = empty_aggregates()
+        # Games indexed after the last aggregates write (a crash in between)
+        # are folded in from their records.
+        for entry in self._entries[aggregates["games"]:]:
+            record = self._read(entry)
+            if record is not None:
+                fold_record(aggregates, record)
+            else:
+                aggregates["games"] += 1
+        self._aggregates = aggregates
+        if len(self._entries) != len(lines):
+            self._rewrite_index()
+
+    def _rewrite_index(self):
+        path = os.path.join(self.root, INDEX_FILE)
+        with open(path + ".tmp", "w", encoding="utf-8") as handle:
+            for entry in self._entries:
+                handle.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        os.replace(path + ".tmp", path)
+
+    def _write_aggregates(self):
+        path = os.path.join(self.root, AGGREGATES_FILE)
+        with open(path + ".tmp", "w", encoding="utf-8") as handle:
+            json.dump(self._aggregates, handle, ensure_ascii=False)
+        os.replace(path + ".tmp", path)
+
+    def _open_segment(self):
+        if self._handle is not None:
+            if self._handle.tell() < self.segment_bytes:
+                return self._handle
+            self._handle.close()
+            self._segment += 1
+        self._handle = open(os.path.join(self.root, _segment_name(self._segment)), "ab")
+        return self._handle
+
+    def append(self, record):
+        data = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            if record["game_id"] in self._game_ids:
+                return False
+            handle = self._open_segment()
+            offset = handle.tell()
+            handle.write(data)
+            handle.flush()
+            entry = [
+                record["game_id"],
+                self._segment,
+                offset,
+                len(data),
+                record["script_id"],
+                record.get("ended_at"),
+            ]
+            if self._index_handle is None:
+                self._index_handle = open(
+                    os.path.join(self.root, INDEX_FILE), "a", encoding="utf-8"
+                )
+            self._index_handle.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._index_handle.flush()
+            self._entries.append(entry)
+            self._game_ids.add(record["game_id"])
+            fold_record(self._aggregates, record)
+            self._write_aggregates()
+            return True
+
+    def _read(self, entry):
+        path = os.path.join(self.root, _segment_name(entry[ENTRY_SEGMENT]))
+        try:
+            with open(path, "rb") as handle:
+                handle.seek(entry[ENTRY_OFFSET])
+                return json.loads(handle.read(entry[ENTRY_LENGTH]).decode("utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def get(self, game_id):
+        with self._lock:
+            entry = next(
+                (entry for entry in reversed(self._entries) if entry[ENTRY_GAME] == game_id),
+                None,
+            )
+        return self._read(entry) if entry else None
+
+    def games(self, script_id=None, limit=20):
+        # Newest first, straight from the index.
+        with self._lock:
+            entries = list(reversed(self._entries))
+        if script_id is not None:
+            entries = [entry for entry in entries if entry[ENTRY_SCRIPT] == script_id]
+        return [
+            {"game_id": entry[ENTRY_GAME], "script_id": entry[ENTRY_SCRIPT],
+             "ended_at": entry[ENTRY_ENDED]}
+            for entry in entries[:limit]
+        ]
+
+    def aggregates(self):
+        with self._lock:
+            return json.loads(json.dumps(self._aggregates))
+
+    def report(self, script_id=None):
+        return build_report(self.aggregates(), script_id)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, game_id):
+        with self._lock:
+            return game_id in self._game_ids
+
+    def replay_path(self, game_id):
+        return os.path.join(self.root, REPLAY_DIR, f"{game_id}.jsonl")
+
+    def close(self):
+        with self._lock:
+            for handle in (self._handle, self._index_handle):
+                if handle is not None:
+                    handle.close()
+            self._handle = None
+            self._index_handle = None
+
+
+def archive_roots(root):
+    # A sharded server keeps one archive per worker under the same root.
+    roots = []
+    if os.path.exists(os.path.join(root, INDEX_FILE)):
+        roots.append(root)
+    if os.path.isdir(root):
+        for name in sorted(os.listdir(root)):
+            path = os.path.join(root, name)
+            if name.startswith(WORKER_PREFIX) and os.path.isdir(path):
+                roots.append(path)
+    return roots
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report on the archived game history")
+    parser.add_argument("root", nargs="?", default=default_history_dir())
+    parser.add_argument("--script", help="only this script id")
+    parser.add_argument("--games", type=int, default=0, help="also list the N latest games")
+    parser.add_argument("--game", help="print one archived game record")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    histories = [GameHistory(path) for path in archive_roots(args.root)]
+    if not histories:
+        print(f"No game history in {args.root}")
+        return 1
+    if args.game:
+        record = next(
+            (record for record in (history.get(args.game) for history in histories) if record),
+            None,
+        )
+        if record is None:
+            print(f"Unknown game {args.game}")
+            return 1
+        print(json.dumps(record, ensure_ascii=False, indent=2))
+        return 0
+    aggregates = empty_aggregates()
+    for history in histories:
+        merge_aggregates(aggregates, history.aggregates())
+    report = build_report(aggregates, args.script)
+    if args.games:
+        games = [game for history in histories for game in history.games(args.script, args.games)]
+        games.sort(key=lambda game: game["ended_at"] or 0, reverse=True)
+        report["latest"] = games[:args.games]
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return 0
+    print(f"{report['games']} archived games")
+    for script in report["scripts"]:
+        accuracy = script["vote_accuracy"]
+        solve_rate = script["solve_rate"]
+        print(f"\n{script['title'] or script['script_id']} ({script['script_id']}): "
+              f"{script['games']} games, {script['average_players']} players on average")
+        print(f"  vote accuracy {'-' if accuracy is None else f'{accuracy:.0%}'}, "
+              f"solved {'-' if solve_rate is None else f'{solve_rate:.0%}'}")
+        if script["phase_seconds"]:
+            print("  phases: " + ", ".join(
+                f"{phase} {seconds:.0f}s" for phase, seconds in script["phase_seconds"].items()
+            ))
+        for clue in script["clue_frequency"]:
+            print(f"  clue {clue['name'] or clue['clue_id']}: {clue['per_game']:.2f} per game")
+    for game in report.get("latest", []):
+        print(f"{game['game_id']}  {game['script_id']}  {game['ended_at']}")
+    for history in histories:
+        history.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,262 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+LATENCY_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+)
+
+
+class Histogram:
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self._bounds = bounds
+        self._counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self._counts[bisect_left(self._bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, fraction):
+        if not self.count:
+            return 0.0
+        target = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self._counts):
+            seen += count
+            if seen >= target:
+                if index < len(self._bounds):
+                    return min(self._bounds[index], self.max)
+                return self.max
+        return self.max
+
+    def snapshot(self):
+        buckets = {}
+        for bound, count in zip(self._bounds, self._counts):
+            if count:
+                buckets[str(bound)] = count
+        if self._counts[-1]:
+            buckets["+Inf"] = self._counts[-1]
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "max": self.max,
+            "p50": self.quantile(0.50),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "buckets": buckets,
+        }
+
+
+class InstrumentedLock:
+    # Wraps a lock (usually an RLock) and records wait and hold times. Only
+    # the outermost acquire and release of the owning thread are timed;
+    # re-entrant acquires neither wait nor start a new hold.
+    def __init__(self, lock, metrics, name):
+        self._lock = lock
+        self._metrics = metrics
+        self._name = name
+        self._owner = None
+        self._depth = 0
+        self._acquired_at = 0.0
+
+    def acquire(self, blocking=True, timeout=-1):
+        thread_id = threading.get_ident()
+        if self._owner == thread_id:
+            acquired = self._lock.acquire(blocking, timeout)
+            if acquired:
+                self._depth += 1
+            return acquired
+        start = time.perf_counter()
+        acquired = self._lock.acquire(blocking, timeout)
+        if acquired:
+            now = time.perf_counter()
+            self._owner = thread_id
+            self._depth = 1
+            self._acquired_at = now
+            self._metrics.record_lock_wait(self._name, now - start)
+        return acquired
+
+    def release(self):
+        self._depth -= 1
+        if self._depth:
+            self._lock.release()
+            return
+        acquired_at = self._acquired_at
+        self._owner = None
+        self._lock.release()
+        self._metrics.record_lock_hold(self._name, time.perf_counter() - acquired_at)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.release()
+
+
+class NullMetrics:
+    enabled = False
+
+    def instrument_lock(self, lock, name):
+        return lock
+
+    def record_message(self, message_type, seconds):
+        pass
+
+    def record_error(self, kind):
+        pass
+
+    def record_lock_wait(self, name, seconds):
+        pass
+
+    def record_lock_hold(self, name, seconds):
+        pass
+
+    def record_serialize(self, seconds, size):
+        pass
+
+    def record_fanout(self, seconds, sessions):
+        pass
+
+    def record_bytes(self, session_key, size):
+        pass
+
+    def snapshot(self):
+        return {"enabled": False}
+
+
+class ServerMetrics:
+    enabled = True
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._started = time.time()
+        self._messages = {}
+        self._errors = {}
+        self._lock_wait = {}
+        self._lock_hold = {}
+        self._serialize = Histogram()
+        self._state_bytes = Histogram(bounds=(256, 1024, 4096, 16384, 65536, 262144, 1048576))
+        self._fanout = Histogram()
+        self._fanout_sessions = 0
+        self._sessions = {}
+
+    def instrument_lock(self, lock, name):
+        return InstrumentedLock(lock, self, name)
+
+    def record_message(self, message_type, seconds):
+        with self._lock:
+            histogram = self._messages.get(message_type)
+            if histogram is None:
+                histogram = self._messages[message_type] = Histogram()
+            histogram.observe(seconds)
+
+    def record_error(self, kind):
+        with self._lock:
+            self._errors[kind] = self._errors.get(kind, 0) + 1
+
+    def record_lock_wait(self, name, seconds):
+        with self._lock:
+            self._observe(self._lock_wait, name, seconds)
+
+    def record_lock_hold(self, name, seconds):
+        with self._lock:
+            self._observe(self._lock_hold, name, seconds)
+
+    def record_serialize(self, seconds, size):
+        with self._lock:
+            self._serialize.observe(seconds)
+            self._state_bytes.observe(size)
+
+    def record_fanout(self, seconds, sessions):
+        with self._lock:
+            self._fanout.observe(seconds)
+            self._fanout_sessions += sessions
+
+    def record_bytes(self, session_key, size):
+        with self._lock:
+            stats = self._sessions.get(session_key)
+            if stats is None:
+                stats = self._sessions[session_key] = [0, 0]
+            stats[0] += 1
+            stats[1] += size
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "enabled": True,
+                "uptime": time.time() - self._started,
+                "messages": {
+                    message_type: histogram.snapshot()
+                    for message_type, histogram in self._messages.items()
+                },
+                "errors": dict(self._errors),
+                "locks": {
+                    name: {
+                        "wait": self._lock_wait[name].snapshot(),
+                        "hold": self._lock_hold.get(name, Histogram()).snapshot(),
+                    }
+                    for name in self._lock_wait
+                },
+                "serialize": self._serialize.snapshot(),
+                "state_bytes": self._state_bytes.snapshot(),
+                "fanout": self._fanout.snapshot(),
+                "fanout_sessions": self._fanout_sessions,
+                "sessions": {
+                    str(session_key): {"frames_sent": stats[0], "bytes_sent": stats[1]}
+                    for session_key, stats in self._sessions.items()
+                },
+            }
+
+    def _observe(self, table, name, seconds):
+        histogram = table.get(name)
+        if histogram is None:
+            histogram = table[name] = Histogram()
+        histogram.observe(seconds)
+
+
+class MetricsDumper:
+    def __init__(self, metrics, path, interval):
+        self._metrics = metrics
+        self._path = path
+        self._interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread:
+            return
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if not self._thread:
+            return
+        self._stop.set()
+        self._thread.join(self._interval + 1)
+        self._thread = None
+        self.dump()
+
+    def dump(self):
+        snapshot = self._metrics.snapshot()
+        snapshot["timestamp"] = time.time()
+        temp_path = f"{self._path}.tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as handle:
+                json.dump(snapshot, handle, indent=2)
+            os.replace(temp_path, self._path)
+        except OSError:
+            pass
+
+    def _run(self):
+        while not self._stop.wait(self._interval):
+            self.dump()
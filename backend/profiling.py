@@ -0,0 +1,262 @@
+import marshal
+import os
+import re
+import sys
+import threading
+import time
+
+PROFILE_MODES = ("sampling", "deterministic")
+DEFAULT_PROFILE_SECONDS = 10.0
+MAX_PROFILE_SECONDS = 300.0
+DEFAULT_SAMPLE_INTERVAL = 0.002
+MAX_COLLAPSE_DEPTH = 64
+
+
+def _frame_key(code):
+    return (code.co_filename, code.co_firstlineno, code.co_name)
+
+
+def _frame_label(key):
+    filename, _, name = key
+    module = os.path.splitext(os.path.basename(filename))[0]
+    return f"{module}:{name}"
+
+
+def _tag_key(tag):
+    return ("<message>", 0, f"handle_message[{tag}]")
+
+
+def _safe_name(text):
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", text)
+
+
+class ProfileSession:
+    def __init__(self, mode, duration, output_dir, interval=DEFAULT_SAMPLE_INTERVAL, on_finish=None):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode: {mode}")
+        self.mode = mode
+        self.duration = min(max(duration, 0.1), MAX_PROFILE_SECONDS)
+        self._output_dir = output_dir
+        self._interval = interval
+        self._on_finish = on_finish
+        self._lock = threading.Lock()
+        self._active = {}
+        self._stats = {}
+        self._samples = {}
+        self._sample_count = 0
+        self._started_at = None
+        self._stop_event = threading.Event()
+        self._sampler = None
+        self._timer = None
+        self._finished = False
+        self.skipped_calls = 0
+        self.files = []
+
+    def start(self):
+        self._started_at = time.time()
+        if self.mode == "sampling":
+            self._sampler = threading.Thread(target=self._sample_loop, daemon=True)
+            self._sampler.start()
+        self._timer = threading.Timer(self.duration, self.stop)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def run(self, tag, func, *args):
+        if self._finished:
+            return func(*args)
+        if self.mode == "deterministic":
+            # Loaded on first use so that clients parsing --profile do not
+            # pay for cProfile and pstats.
+            import cProfile
+
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                # Python 3.12+ allows one active cProfile at a time; calls
+                # overlapping another profiled call run unprofiled.
+                self.skipped_calls += 1
+                return func(*args)
+            try:
+                return func(*args)
+            finally:
+                profile.disable()
+                self._add_profile(tag, profile)
+        ident = threading.get_ident()
+        self._active[ident] = tag
+        try:
+            return func(*args)
+        finally:
+            self._active.pop(ident, None)
+
+    def stop(self):
+        with self._lock:
+            if self._finished:
+                return self.files
+            self._finished = True
+        if self._timer:
+            self._timer.cancel()
+        self._stop_event.set()
+        if self._sampler and self._sampler is not threading.current_thread():
+            self._sampler.join(1.0)
+        self.files = self._write()
+        if self._on_finish:
+            self._on_finish(self)
+        return self.files
+
+    def _add_profile(self, tag, profile):
+        with self._lock:
+            if self._finished:
+                return
+            stats = self._stats.get(tag)
+            if stats is None:
+                import pstats
+
+                self._stats[tag] = pstats.Stats(profile)
+            else:
+                stats.add(profile)
+
+    def _sample_loop(self):
+        own_ident = threading.get_ident()
+        while not self._stop_event.wait(self._interval):
+            frames = sys._current_frames()
+            for ident, tag in list(self._active.items()):
+                if ident == own_ident:
+                    continue
+                frame = frames.get(ident)
+                if frame is None:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_key(frame.f_code))
+                    frame = frame.f_back
+                stack.reverse()
+                for index, frame_key in enumerate(stack):
+                    if frame_key[2] == "handle_message":
+                        stack = stack[index:]
+                        break
+                key = (tag, tuple(stack))
+                with self._lock:
+                    self._samples[key] = self._samples.get(key, 0) + 1
+                    self._sample_count += 1
+
+    def _write(self):
+        os.makedirs(self._output_dir, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(self._started_at))
+        base = os.path.join(self._output_dir, f"profile-{stamp}-{self.mode}")
+        if self.mode == "sampling":
+            stats, collapsed = self._sampling_output()
+        else:
+            stats, collapsed = self._deterministic_output()
+        files = []
+        pstats_path = f"{base}.pstats"
+        with open(pstats_path, "wb") as handle:
+            marshal.dump(stats, handle)
+        files.append(pstats_path)
+        collapsed_path = f"{base}.collapsed.txt"
+        with open(collapsed_path, "w", encoding="utf-8") as handle:
+            for stack, value in sorted(collapsed.items()):
+                if value > 0:
+                    handle.write(f"{stack} {int(round(value))}\n")
+        files.append(collapsed_path)
+        if self.mode == "deterministic":
+            for tag, tag_stats in sorted(self._stats.items()):
+                tag_path = f"{base}.{_safe_name(tag)}.pstats"
+                tag_stats.dump_stats(tag_path)
+                files.append(tag_path)
+        return files
+
+    def _sampling_output(self):
+        weight = self._interval
+        stats = {}
+        callers = {}
+        collapsed = {}
+        for (tag, stack), count in self._samples.items():
+            full_stack = (_tag_key(tag),) + stack
+            seconds = count * weight
+            seen = set()
+            for index, key in enumerate(full_stack):
+                entry = stats.setdefault(key, [0, 0, 0.0, 0.0])
+                if key not in seen:
+                    seen.add(key)
+                    entry[0] += count
+                    entry[1] += count
+                    entry[3] += seconds
+                if index:
+                    edge = callers.setdefault(key, {}).setdefault(full_stack[index - 1], [0, 0, 0.0, 0.0])
+                    edge[0] += count
+                    edge[1] += count
+                    edge[3] += seconds
+            stats[full_stack[-1]][2] += seconds
+            callers[full_stack[-1]][full_stack[-2]][2] += seconds
+            label = ";".join(
+                [f"handle_message[{tag}]"] + [_frame_label(key) for key in stack]
+            )
+            collapsed[label] = collapsed.get(label, 0) + count
+        output = {}
+        for key, (cc, nc, tt, ct) in stats.items():
+            key_callers = {
+                caller: tuple(value) for caller, value in callers.get(key, {}).items()
+            }
+            output[key] = (cc, nc, tt, ct, key_callers)
+        return output, collapsed
+
+    def _deterministic_output(self):
+        combined = {}
+        collapsed = {}
+        for tag, tag_stats in self._stats.items():
+            root = _tag_key(tag)
+            root_total = 0.0
+            for key, (cc, nc, tt, ct, key_callers) in tag_stats.stats.items():
+                key_callers = dict(key_callers)
+                if not key_callers:
+                    key_callers[root] = (nc, cc, tt, ct)
+                    root_total += ct
+                existing = combined.get(key)
+                if existing:
+                    merged_callers = dict(existing[4])
+                    for caller, value in key_callers.items():
+                        if caller in merged_callers:
+                            merged_callers[caller] = tuple(
+                                a + b for a, b in zip(merged_callers[caller], value)
+                            )
+                        else:
+                            merged_callers[caller] = value
+                    combined[key] = (
+                        existing[0] + cc, existing[1] + nc, existing[2] + tt,
+                        existing[3] + ct, merged_callers,
+                    )
+                else:
+                    combined[key] = (cc, nc, tt, ct, key_callers)
+            previous = combined.get(root, (0, 0, 0.0, 0.0, {}))
+            combined[root] = (
+                previous[0] + 1, previous[1] + 1, previous[2], previous[3] + root_total, {}
+            )
+            self._collapse(tag_stats.stats, f"handle_message[{tag}]", collapsed)
+        return combined, collapsed
+
+    def _collapse(self, stats, prefix, collapsed):
+        callees = {}
+        for key, entry in stats.items():
+            for caller, value in entry[4].items():
+                callees.setdefault(caller, []).append((key, value[3]))
+        roots = [key for key, entry in stats.items() if not entry[4]]
+
+        def walk(key, path, fraction):
+            entry = stats[key]
+            path = path + (_frame_label(key),)
+            self_us = entry[2] * fraction * 1e6
+            if self_us >= 0.5:
+                label = ";".join(path)
+                collapsed[label] = collapsed.get(label, 0) + self_us
+            if len(path) >= MAX_COLLAPSE_DEPTH:
+                return
+            for callee, edge_ct in callees.get(key, ()):
+                callee_ct = stats[callee][3]
+                share = fraction * edge_ct / callee_ct if callee_ct > 0 else 0.0
+                if share * callee_ct * 1e6 < 0.5 or _frame_label(callee) in path:
+                    continue
+                walk(callee, path, share)
+
+        for root in roots:
+            walk(root, (prefix,), 1.0)
@@ -1,4 +1,15 @@
+import hashlib
 import json
+import select
+import socket
+
+DEFAULT_HOST = "0.0.0.0"
+DEFAULT_PORT = 5000
+SCRIPT_PAGE_SIZE = 50
+ETAG_LENGTH = 16
+# Windows has no per-call non-blocking flag; there send_nowait relies on the
+# writability check alone and may wait briefly for the tail of one frame.
+SEND_NOWAIT_FLAGS = getattr(socket, "MSG_DONTWAIT", 0)
 
 
 def encode_message(message):
@@ -14,3 +25,73 @@ def decode_message(raw_line):
 def send_message(writer, message):
     writer.write(encode_message(message))
     writer.flush()
+
+
+def content_etag(value):
+    # Stable for equal JSON values regardless of key order, so a client can
+    # compare what it cached against what the server would send.
+    raw = json.dumps(value, ensure_ascii=False, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(raw).hexdigest()[:ETAG_LENGTH]
+
+
+class NowaitSender:
+    # Mixed into stream request handlers whose send_raw writes under
+    # _send_lock. send_raw must write _pending, the unsent tail of a frame
+    # from send_nowait, before its own data; at most one frame is held.
+    _pending = b""
+
+    def send_nowait(self, data):
+        # For frames that can be skipped or retried, such as asset chunks and
+        # spectator updates: never waits for the send lock or for a full
+        # socket buffer. Returns False, having taken nothing, if another send
+        # is in progress or an earlier frame is still draining; otherwise
+        # writes what the socket accepts and keeps the rest pending. An empty
+        # frame only drains the pending tail.
+        if not self._send_lock.acquire(blocking=False):
+            return False
+        try:
+            if not data and not self._pending:
+                return True
+            if not self._writable():
+                return False
+            if self._pending:
+                self._pending = self._pending[self._write_nowait(self._pending):]
+                if self._pending:
+                    return False
+            self._pending = data[self._write_nowait(data):]
+        except OSError:
+            # The reader thread sees the broken connection and ends the session.
+            self._pending = b""
+            self._send_failed()
+        finally:
+            self._send_lock.release()
+        self._sent(len(data))
+        return True
+
+    def disconnect(self):
+        # Wakes the reader thread, which then ends the session as usual.
+        try:
+            self.connection.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def _sent(self, size):
+        pass
+
+    def _send_failed(self):
+        pass
+
+    def _writable(self):
+        # Leaves the room the kernel keeps between "writable" and a full
+        # buffer to blocking sends, so skippable data never fills it.
+        try:
+            return bool(select.select((), (self.connection,), (), 0)[1])
+        except ValueError:
+            # A descriptor past FD_SETSIZE; the non-blocking write still holds.
+            return True
+
+    def _write_nowait(self, data):
+        try:
+            return self.connection.send(data, SEND_NOWAIT_FLAGS)
+        except BlockingIOError:
+            return 0
@@ -0,0 +1,107 @@
+import threading
+import time
+
+DEFAULT_LIMIT_KEY = "*"
+DEFAULT_RATE_LIMITS = {
+    DEFAULT_LIMIT_KEY: (20.0, 40),
+    "ping": (5.0, 10),
+    "request_clue": (5.0, 10),
+    "request_scripts": (1.0, 5),
+    "request_script_page": (10.0, 20),
+    "search_scripts": (5.0, 10),
+    "reload_scripts": (0.2, 2),
+    "request_asset": (10.0, 20),
+    "set_name": (1.0, 5),
+    "audience_vote": (2.0, 5),
+    "submit_vote": (5.0, 10),
+}
+DEFAULT_MAX_CONNECTIONS = 64
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate, capacity, now):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def take(self, now, cost=1):
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return True, 0.0
+        if self.rate <= 0:
+            return False, None
+        return False, (cost - self.tokens) / self.rate
+
+
+class RateLimiter:
+    def __init__(self, limits=None):
+        self._limits = dict(DEFAULT_RATE_LIMITS)
+        if limits:
+            self._limits.update(limits)
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._throttled = {}
+
+    def check(self, session_key, message_type, cost=1):
+        limit = self._limits.get(message_type) or self._limits.get(DEFAULT_LIMIT_KEY)
+        if not limit:
+            return True, 0.0
+        now = time.monotonic()
+        key = (session_key, message_type)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(limit[0], limit[1], now)
+            allowed, retry_after = bucket.take(now, cost)
+            if not allowed:
+                counters = self._throttled.setdefault(session_key, {})
+                counters[message_type] = counters.get(message_type, 0) + 1
+            return allowed, retry_after
+
+    def forget(self, session_key):
+        with self._lock:
+            for key in [key for key in self._buckets if key[0] == session_key]:
+                del self._buckets[key]
+            self._throttled.pop(session_key, None)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                str(session_key): dict(counters)
+                for session_key, counters in self._throttled.items()
+            }
+
+
+class ConnectionGate:
+    def __init__(self, max_connections=DEFAULT_MAX_CONNECTIONS):
+        self.max_connections = max_connections
+        self._lock = threading.Lock()
+        self._active = 0
+        self._rejected = 0
+
+    def admit(self):
+        with self._lock:
+            if self.max_connections and self._active >= self.max_connections:
+                self._rejected += 1
+                return False
+            self._active += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self._active = max(0, self._active - 1)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "active": self._active,
+                "max": self.max_connections,
+                "rejected": self._rejected,
+            }
@@ -0,0 +1,304 @@
+import argparse
+import json
+import socket
+import socketserver
+import sys
+import threading
+import time
+
+from backend.protocol import NowaitSender, decode_message, encode_message
+from backend.ratelimit import ConnectionGate, RateLimiter
+from backend.server import DEFAULT_HOST
+from backend.spectators import DEFAULT_MAX_SPECTATORS, SpectatorHub
+
+DEFAULT_RELAY_PORT = 5001
+RECONNECT_DELAY = 1.0
+MAX_RECONNECT_DELAY = 15.0
+FRAME_TYPE_PREFIX = b'{"type": "'
+RELAYED_CHANNELS = {
+    "state": "state",
+    "audience_votes": "audience",
+    "countdown": "countdown",
+}
+
+
+def frame_type(raw_line):
+    # encode_message always writes the type first, so big state frames can be
+    # classified without decoding them.
+    if raw_line.startswith(FRAME_TYPE_PREFIX):
+        end = raw_line.find(b'"', len(FRAME_TYPE_PREFIX))
+        if end > 0:
+            return raw_line[len(FRAME_TYPE_PREFIX):end].decode("utf-8", "replace")
+    try:
+        message = json.loads(raw_line)
+    except ValueError:
+        return None
+    return message.get("type") if isinstance(message, dict) else None
+
+
+class RelayRequestHandler(NowaitSender, socketserver.StreamRequestHandler):
+    def setup(self):
+        super().setup()
+        self.spectator = None
+        self._send_lock = threading.Lock()
+
+    def handle(self):
+        relay = self.server.relay
+        while True:
+            raw_line = self.rfile.readline()
+            if not raw_line:
+                break
+            try:
+                message = decode_message(raw_line.decode("utf-8").strip())
+            except Exception:
+                continue
+            if message:
+                relay.handle_message(self, message)
+
+    def finish(self):
+        try:
+            if self.spectator:
+                self.server.relay.remove_spectator(self.spectator)
+        finally:
+            self.server.relay.forget_client(self.client_address)
+            self.server.relay.release_connection()
+            super().finish()
+
+    def send(self, message):
+        self.send_raw(encode_message(message))
+
+    def send_raw(self, data):
+        try:
+            with self._send_lock:
+                if self._pending:
+                    data, self._pending = self._pending + data, b""
+                self.wfile.write(data)
+                self.wfile.flush()
+        except Exception:
+            pass
+
+
+class RelayTCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def verify_request(self, request, client_address):
+        return self.relay.admit_connection(request)
+
+
+class RelayServer:
+    def __init__(
+        self,
+        upstream_host,
+        upstream_port,
+        host=DEFAULT_HOST,
+        port=DEFAULT_RELAY_PORT,
+        max_spectators=DEFAULT_MAX_SPECTATORS,
+    ):
+        self._upstream = (upstream_host, upstream_port)
+        self._host = host
+        self._port = port
+        self._hub = SpectatorHub(max_spectators)
+        self._gate = ConnectionGate(max_spectators)
+        self._limiter = RateLimiter()
+        self._server = None
+        self._thread = None
+        self._upstream_thread = None
+        self._upstream_socket = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self.connected = threading.Event()
+        self.frames_received = 0
+        self.upstream_connects = 0
+
+    def start(self):
+        if self._server:
+            return
+        self._stop.clear()
+        self._hub.start()
+        self._server = RelayTCPServer((self._host, self._port), RelayRequestHandler)
+        self._server.relay = self
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        self._upstream_thread = threading.Thread(target=self._upstream_loop, daemon=True)
+        self._upstream_thread.start()
+
+    @property
+    def address(self):
+        if self._server:
+            return self._server.server_address
+        return (self._host, self._port)
+
+    def stop(self):
+        if not self._server:
+            return
+        self._stop.set()
+        self._close_upstream()
+        self._server.shutdown()
+        self._server.server_close()
+        self._server = None
+        self._hub.stop()
+        if self._upstream_thread:
+            self._upstream_thread.join(2.0)
+            self._upstream_thread = None
+
+    def admit_connection(self, request):
+        if self._gate.admit():
+            return True
+        try:
+            request.sendall(encode_message({
+                "type": "throttled",
+                "request_type": "connect",
+                "message": "Relay is full",
+            }))
+        except OSError:
+            pass
+        return False
+
+    def release_connection(self):
+        self._gate.release()
+
+    def forget_client(self, client_address):
+        # Requests sent before joining were limited by address.
+        self._limiter.forget(client_address)
+
+    def handle_message(self, handler, message):
+        message_type = message.get("type")
+        session_key = handler.spectator.key if handler.spectator else handler.client_address
+        allowed, retry_after = self._limiter.check(session_key, message_type)
+        if not allowed:
+            handler.send({
+                "type": "throttled",
+                "request_type": message_type,
+                "retry_after": round(retry_after, 3) if retry_after is not None else None,
+            })
+            return
+        if message_type == "ping":
+            handler.send({"type": "pong"})
+            return
+        if message_type == "connect" and handler.spectator is None:
+            greeting = encode_message({
+                "type": "welcome",
+                "player_id": None,
+                "is_host": False,
+                "spectator": True,
+                "relay": True,
+            })
+            session = self._hub.add(handler, greeting)
+            if session is None:
+                handler.send({
+                    "type": "throttled",
+                    "request_type": "connect",
+                    "message": "Relay is full",
+                })
+                return
+            handler.spectator = session
+            return
+        if handler.spectator is None:
+            handler.send({"type": "error", "message": "Not connected"})
+            return
+        handler.send({"type": "error", "message": "Relay sessions are read-only"})
+
+    def remove_spectator(self, session):
+        self._hub.remove(session)
+        self._limiter.forget(session.key)
+
+    def snapshot(self):
+        return {
+            "upstream": f"{self._upstream[0]}:{self._upstream[1]}",
+            "connected": self.connected.is_set(),
+            "upstream_connects": self.upstream_connects,
+            "frames_received": self.frames_received,
+            "spectators": self._hub.snapshot(),
+        }
+
+    def _upstream_loop(self):
+        delay = RECONNECT_DELAY
+        while not self._stop.is_set():
+            try:
+                sock = socket.create_connection(self._upstream, timeout=5)
+            except OSError:
+                self._stop.wait(delay)
+                delay = min(delay * 2, MAX_RECONNECT_DELAY)
+                continue
+            sock.settimeout(None)
+            with self._lock:
+                self._upstream_socket = sock
+            self.upstream_connects += 1
+            delay = RECONNECT_DELAY
+            try:
+                sock.sendall(encode_message({
+                    "type": "connect",
+                    "display_name": "Relay",
+                    "spectator": True,
+                }))
+                self._read_upstream(sock)
+            except OSError:
+                pass
+            finally:
+                self.connected.clear()
+                self._close_upstream()
+            self._stop.wait(delay)
+
+    def _read_upstream(self, sock):
+        reader = sock.makefile("rb")
+        for raw_line in reader:
+            if self._stop.is_set():
+                return
+            message_type = frame_type(raw_line)
+            if message_type == "welcome":
+                self.connected.set()
+                continue
+            channel = RELAYED_CHANNELS.get(message_type)
+            if channel is None:
+                continue
+            self.frames_received += 1
+            # Upstream frames are already encoded once by the host; the relay
+            # forwards the same bytes to every downstream spectator.
+            self._hub.publish(channel, raw_line)
+
+    def _close_upstream(self):
+        with self._lock:
+            sock, self._upstream_socket = self._upstream_socket, None
+        if sock is None:
+            return
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        sock.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-serve a host's table to many spectators")
+    parser.add_argument("--upstream", required=True, metavar="HOST:PORT",
+                        help="address of the GameServer (or another relay) to follow")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_RELAY_PORT)
+    parser.add_argument("--max-spectators", type=int, default=DEFAULT_MAX_SPECTATORS)
+    args = parser.parse_args(argv)
+    upstream_host, _, upstream_port = args.upstream.rpartition(":")
+    if not upstream_host or not upstream_port.isdigit():
+        parser.error("--upstream must look like HOST:PORT")
+
+    relay = RelayServer(
+        upstream_host,
+        int(upstream_port),
+        host=args.host,
+        port=args.port,
+        max_spectators=args.max_spectators,
+    )
+    relay.start()
+    print(f"Relaying {args.upstream} on {relay.address[0]}:{relay.address[1]}", flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        relay.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
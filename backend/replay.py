@@ -0,0 +1,148 @@
+import argparse
+import bisect
+import json
+import os
+import sys
+import time
+
+REPLAY_FORMAT = 1
+# A full state is written at least this often, so seeking never replays more
+# than this many deltas.
+KEYFRAME_INTERVAL = 20
+
+
+class ReplayRecorder:
+    # Writes one game as JSON lines: a header, then frames of
+    # {"t": seconds, "state": {...}} (a keyframe) or
+    # {"t": seconds, "set": {...}, "drop": [...]} (the top-level keys that
+    # changed since the previous frame). Every phase change starts with a
+    # keyframe. The file stays a .tmp until the game is kept.
+    def __init__(self, path, header, keyframe_interval=KEYFRAME_INTERVAL):
+        self.path = path
+        self.game_id = header["game_id"]
+        self.keyframe_interval = keyframe_interval
+        self.frames = 0
+        self._temporary = path + ".tmp"
+        self._previous = None
+        self._since_keyframe = 0
+        self._started = time.monotonic()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._handle = open(self._temporary, "w", encoding="utf-8")
+        self._write(dict(header, format=REPLAY_FORMAT, keyframe_interval=keyframe_interval))
+
+    def _write(self, data):
+        self._handle.write(json.dumps(data, ensure_ascii=False) + "\n")
+
+    def record(self, state):
+        seconds = round(time.monotonic() - self._started, 3)
+        previous = self._previous
+        if (
+            previous is None
+            or self._since_keyframe >= self.keyframe_interval
+            or previous.get("phase") != state.get("phase")
+        ):
+            frame = {"t": seconds, "state": state}
+            self._since_keyframe = 0
+        else:
+            changed = {
+                key: value
+                for key, value in state.items()
+                if key not in previous or previous[key] != value
+            }
+            dropped = [key for key in previous if key not in state]
+            if not changed and not dropped:
+                return False
+            frame = {"t": seconds, "set": changed}
+            if dropped:
+                frame["drop"] = dropped
+            self._since_keyframe += 1
+        self._previous = state
+        self._write(frame)
+        self.frames += 1
+        return True
+
+    def finish(self):
+        self._handle.close()
+        os.replace(self._temporary, self.path)
+
+    def discard(self):
+        self._handle.close()
+        try:
+            os.remove(self._temporary)
+        except OSError:
+            pass
+
+
+class Replay:
+    # A recorded game loaded for playback. Seeking finds the frame by time,
+    # then the keyframe at or before it, and applies the deltas in between.
+    # States share nested values with the recording and must not be mutated.
+    def __init__(self, header, frames):
+        if not frames or "state" not in frames[0]:
+            raise ValueError("Replay has no keyframe")
+        self.header = header
+        self._frames = frames
+        self.times = [frame["t"] for frame in frames]
+        self.keyframes = [index for index, frame in enumerate(frames) if "state" in frame]
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as handle:
+            lines = handle.readlines()
+        if not lines:
+            raise ValueError("Replay file is empty")
+        header = json.loads(lines[0])
+        if not isinstance(header, dict) or header.get("format") != REPLAY_FORMAT:
+            raise ValueError("Not a replay file")
+        frames = []
+        for line in lines[1:]:
+            try:
+                frames.append(json.loads(line))
+            except ValueError:
+                # A torn last line from a crash mid-write.
+                break
+        return cls(header, frames)
+
+    def __len__(self):
+        return len(self._frames)
+
+    @property
+    def duration(self):
+        return self.times[-1]
+
+    def index_at(self, seconds):
+        return max(0, bisect.bisect_right(self.times, seconds) - 1)
+
+    def state_at(self, index):
+        index = min(max(index, 0), len(self._frames) - 1)
+        start = self.keyframes[bisect.bisect_right(self.keyframes, index) - 1]
+        state = dict(self._frames[start]["state"])
+        for frame in self._frames[start + 1:index + 1]:
+            state.update(frame["set"])
+            for key in frame.get("drop", ()):
+                state.pop(key, None)
+        return state
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize or seek a recorded game replay")
+    parser.add_argument("path")
+    parser.add_argument("--at", type=float, help="print the state at this many seconds")
+    args = parser.parse_args(argv)
+
+    try:
+        replay = Replay.load(args.path)
+    except (OSError, ValueError) as exc:
+        print(f"{args.path}: {exc}")
+        return 1
+    if args.at is not None:
+        print(json.dumps(replay.state_at(replay.index_at(args.at)), ensure_ascii=False, indent=2))
+        return 0
+    header = replay.header
+    print(f"{header.get('title') or header.get('script_id')} ({header.get('game_id')}): "
+          f"{len(replay)} frames, {len(replay.keyframes)} keyframes, {replay.duration:.0f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
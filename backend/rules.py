@@ -0,0 +1,210 @@
+CLUE_TYPES = ("normal", "deep")
+
+
+class RulesError(ValueError):
+    pass
+
+
+def _popcount(mask):
+    return bin(mask).count("1")
+
+
+class CompiledRules:
+    __slots__ = (
+        "clue_ids",
+        "index",
+        "rounds",
+        "round_masks",
+        "deep_mask",
+        "normal_mask",
+        "requires",
+        "deep_requires",
+        "all_mask",
+    )
+
+    def __init__(self, clue_ids, rounds, round_masks, deep_mask, requires, deep_requires):
+        self.clue_ids = clue_ids
+        self.index = {clue_id: bit for bit, clue_id in enumerate(clue_ids)}
+        self.rounds = rounds
+        self.round_masks = round_masks
+        self.deep_mask = deep_mask
+        self.all_mask = (1 << len(clue_ids)) - 1
+        self.normal_mask = self.all_mask & ~deep_mask
+        self.requires = requires
+        self.deep_requires = deep_requires
+
+    def to_dict(self):
+        return {
+            "clue_ids": self.clue_ids,
+            "rounds": [dict(rules, types=list(rules["types"])) for rules in self.rounds],
+            "round_masks": self.round_masks,
+            "deep_mask": self.deep_mask,
+            "requires": self.requires,
+            "deep_requires": self.deep_requires,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data["clue_ids"],
+            [dict(rules, types=tuple(rules["types"])) for rules in data["rounds"]],
+            data["round_masks"],
+            data["deep_mask"],
+            data["requires"],
+            data["deep_requires"],
+        )
+
+    @property
+    def round_count(self):
+        return len(self.rounds)
+
+    def mask_of(self, clue_ids):
+        mask = 0
+        for clue_id in clue_ids:
+            bit = self.index.get(clue_id)
+            if bit is not None:
+                mask |= 1 << bit
+        return mask
+
+    def check(self, clue_id, round_index, visible_mask, found_mask, searches, round_searches):
+        bit = self.index.get(clue_id)
+        if bit is None:
+            return "Invalid clue"
+        flag = 1 << bit
+        if visible_mask & flag:
+            return None
+        rules = self.rounds[round_index]
+        if not self.round_masks[round_index] & flag:
+            return "Clue is not searchable this round"
+        if self.deep_mask & flag and self.deep_requires:
+            if _popcount(found_mask & self.normal_mask) < self.deep_requires:
+                return f"Deep search needs {self.deep_requires} normal clues first"
+        required = self.requires[bit]
+        if required and visible_mask & required != required:
+            return "Clue is locked"
+        if rules["clues_per_player"] is not None and searches >= rules["clues_per_player"]:
+            return "Search limit reached for this round"
+        if rules["clues_per_round"] is not None and round_searches >= rules["clues_per_round"]:
+            return "No searches left this round"
+        return None
+
+    def available(self, round_index, visible_mask, found_mask, searches, round_searches):
+        rules = self.rounds[round_index]
+        if rules["clues_per_player"] is not None and searches >= rules["clues_per_player"]:
+            return []
+        if rules["clues_per_round"] is not None and round_searches >= rules["clues_per_round"]:
+            return []
+        candidates = self.round_masks[round_index] & ~visible_mask
+        if self.deep_requires and _popcount(found_mask & self.normal_mask) < self.deep_requires:
+            candidates &= ~self.deep_mask
+        output = []
+        requires = self.requires
+        while candidates:
+            flag = candidates & -candidates
+            bit = flag.bit_length() - 1
+            candidates ^= flag
+            required = requires[bit]
+            if required and visible_mask & required != required:
+                continue
+            output.append(self.clue_ids[bit])
+        return output
+
+    def describe_round(self, round_index, round_searches):
+        rules = self.rounds[round_index]
+        per_round = rules["clues_per_round"]
+        return {
+            "round": round_index + 1,
+            "rounds": len(self.rounds),
+            "name": rules["name"],
+            "clues_per_player": rules["clues_per_player"],
+            "clues_per_round": per_round,
+            "round_remaining": None if per_round is None else max(0, per_round - round_searches),
+        }
+
+    def player_remaining(self, round_index, searches):
+        per_player = self.rounds[round_index]["clues_per_player"]
+        return None if per_player is None else max(0, per_player - searches)
+
+
+def _quota(value, name):
+    if value is None:
+        return None
+    if not isinstance(value, int) or isinstance(value, bool) or value < 0:
+        raise RulesError(f"{name} must be a non-negative integer")
+    return value
+
+
+def _is_clue_id(value):
+    return isinstance(value, (str, int)) and not isinstance(value, bool)
+
+
+def compile_rules(script):
+    clues = script.get("clues", [])
+    if not isinstance(clues, list) or not all(isinstance(clue, dict) for clue in clues):
+        raise RulesError("Clues must be a list of objects")
+    clue_ids = [clue.get("id") for clue in clues]
+    for clue_id in clue_ids:
+        if not _is_clue_id(clue_id):
+            raise RulesError(f"Invalid clue id {clue_id!r}")
+    index = {clue_id: bit for bit, clue_id in enumerate(clue_ids)}
+    if len(index) != len(clue_ids):
+        raise RulesError("Clue ids must be unique")
+    config = script.get("investigation") or {}
+    raw_rounds = config.get("rounds") or [{}]
+    rounds = []
+    for position, raw in enumerate(raw_rounds):
+        types = tuple(raw.get("types") or CLUE_TYPES)
+        for clue_type in types:
+            if clue_type not in CLUE_TYPES:
+                raise RulesError(f"Unknown clue type in round {position + 1}: {clue_type}")
+        rounds.append({
+            "name": raw.get("name") or "",
+            "clues_per_player": _quota(raw.get("clues_per_player"), "clues_per_player"),
+            "clues_per_round": _quota(raw.get("clues_per_round"), "clues_per_round"),
+            "types": types,
+        })
+    deep_mask = 0
+    type_masks = {clue_type: 0 for clue_type in CLUE_TYPES}
+    first_round = []
+    requires = []
+    for bit, clue in enumerate(clues):
+        clue_type = clue.get("type", "normal")
+        if clue_type not in CLUE_TYPES:
+            raise RulesError(f"Unknown clue type for {clue.get('id')}: {clue_type}")
+        type_masks[clue_type] |= 1 << bit
+        if clue_type == "deep":
+            deep_mask |= 1 << bit
+        try:
+            first_round.append(max(1, int(clue.get("round", 1))))
+        except (TypeError, ValueError):
+            raise RulesError(f"Invalid round for clue {clue.get('id')}") from None
+        required = 0
+        required_ids = clue.get("requires", [])
+        if not isinstance(required_ids, list):
+            raise RulesError(f"Requires of clue {clue.get('id')} must be a list")
+        for required_id in required_ids:
+            required_bit = index.get(required_id) if _is_clue_id(required_id) else None
+            if required_bit is None:
+                raise RulesError(f"Clue {clue.get('id')} requires unknown clue {required_id}")
+            if required_bit == bit:
+                raise RulesError(f"Clue {clue.get('id')} requires itself")
+            required |= 1 << required_bit
+        requires.append(required)
+    round_masks = []
+    for position, rules in enumerate(rounds):
+        mask = 0
+        for clue_type in rules["types"]:
+            mask |= type_masks[clue_type]
+        for bit, start in enumerate(first_round):
+            if start > position + 1:
+                mask &= ~(1 << bit)
+        round_masks.append(mask)
+    deep_requires = _quota(config.get("deep_requires", 0), "deep_requires") or 0
+    return CompiledRules(
+        clue_ids,
+        rounds,
+        round_masks,
+        deep_mask,
+        requires,
+        deep_requires,
+    )
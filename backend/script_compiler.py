@@ -0,0 +1,302 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from backend.dispatch import scalar_id
+from backend.rules import CLUE_TYPES, RulesError, compile_rules
+from backend.state import (
+    COMPILED_DIRNAME,
+    COMPILED_FORMAT,
+    COMPILED_INDEX,
+    MAX_PLAYER_COUNT,
+    MIN_PLAYER_COUNT,
+    script_listing,
+    source_signature,
+)
+
+CLUE_VISIBILITIES = ("public", "private")
+# Compiled bodies are named by the SHA-256 of their source; nothing else in
+# the output directory is ever deleted.
+COMPILED_BODY = re.compile(r"[0-9a-f]{64}\.json")
+ERROR = "error"
+WARNING = "warning"
+
+
+def _issue(severity, code, message, where=""):
+    return {"severity": severity, "code": code, "where": where, "message": message}
+
+
+def _check_ids(items, kind, issues):
+    seen = set()
+    for position, item in enumerate(items):
+        where = f"{kind}s[{position}]"
+        if not isinstance(item, dict):
+            issues.append(_issue(ERROR, f"{kind}_invalid", f"{kind} must be an object", where))
+            continue
+        item_id = item.get("id")
+        if item_id is None or item_id == "":
+            issues.append(_issue(ERROR, f"{kind}_missing_id", f"{kind} has no id", where))
+        elif not scalar_id(item_id):
+            issues.append(_issue(
+                ERROR, f"{kind}_id_invalid", f"{kind} id must be a string or an integer", where
+            ))
+        elif item_id in seen:
+            issues.append(_issue(
+                ERROR, f"{kind}_duplicate_id", f"Duplicate {kind} id {item_id}", where
+            ))
+        else:
+            seen.add(item_id)
+    return seen
+
+
+def validate_script(data):
+    issues = []
+    if not isinstance(data, dict):
+        return [_issue(ERROR, "not_object", "Script must be a JSON object")]
+    script_id = data.get("id")
+    if not isinstance(script_id, str) or not script_id:
+        issues.append(_issue(ERROR, "missing_id", "Script has no string id", "id"))
+    if not data.get("title"):
+        issues.append(_issue(WARNING, "missing_title", "Script has no title", "title"))
+    malformed = [
+        key for key in ("roles", "clues", "events") if not isinstance(data.get(key, []), list)
+    ]
+    for key in malformed:
+        issues.append(_issue(ERROR, f"{key}_invalid", f"{key} must be a list", key))
+    if malformed:
+        return issues
+    roles = data.get("roles", [])
+    clues = data.get("clues", [])
+    role_ids = _check_ids(roles, "role", issues)
+    culprit = data.get("culprit")
+    if culprit is not None and not scalar_id(culprit):
+        issues.append(_issue(
+            ERROR, "culprit_invalid", "Culprit must be a string or an integer", "culprit"
+        ))
+    elif culprit is not None and culprit not in role_ids:
+        issues.append(_issue(
+            ERROR, "culprit_unknown", f"Culprit {culprit} is not a role id", "culprit"
+        ))
+    clue_ids = _check_ids(clues, "clue", issues)
+    _check_ids(data.get("events", []), "event", issues)
+    if len(roles) < MIN_PLAYER_COUNT:
+        issues.append(_issue(
+            ERROR,
+            "too_few_roles",
+            f"{len(roles)} roles; a game needs at least {MIN_PLAYER_COUNT}",
+            "roles",
+        ))
+    elif len(roles) < MAX_PLAYER_COUNT:
+        issues.append(_issue(
+            WARNING,
+            "short_of_max_players",
+            f"{len(roles)} roles; tables of up to {MAX_PLAYER_COUNT} cannot be filled",
+            "roles",
+        ))
+    for position, clue in enumerate(clues):
+        if not isinstance(clue, dict):
+            continue
+        where = f"clues[{position}]"
+        if clue.get("type", "normal") not in CLUE_TYPES:
+            issues.append(_issue(
+                ERROR, "clue_type", f"Unknown clue type {clue.get('type')}", where
+            ))
+        if clue.get("visibility", "public") not in CLUE_VISIBILITIES:
+            issues.append(_issue(
+                ERROR, "clue_visibility", f"Unknown visibility {clue.get('visibility')}", where
+            ))
+        requires = clue.get("requires", [])
+        if not isinstance(requires, list):
+            issues.append(_issue(ERROR, "clue_requires", "requires must be a list", where))
+            continue
+        for required_id in requires:
+            if not scalar_id(required_id) or required_id not in clue_ids:
+                issues.append(_issue(
+                    ERROR,
+                    "dangling_reference",
+                    f"Clue {clue.get('id')} requires unknown clue {required_id}",
+                    where,
+                ))
+    if any(issue["severity"] == ERROR for issue in issues):
+        return issues
+    try:
+        compile_rules(data)
+    except RulesError as exc:
+        issues.append(_issue(ERROR, "rules", str(exc), "investigation"))
+    return issues
+
+
+def compile_source(task):
+    # Runs in a pool worker: parse, validate and write the compiled body. The
+    # output file is named by the source hash, so unchanged content is reused.
+    source_path, name, output_dir, signature = task
+    result = {"source": name, "issues": [], "signature": signature}
+    try:
+        with open(source_path, "rb") as handle:
+            raw = handle.read()
+    except OSError as exc:
+        result["issues"].append(_issue(ERROR, "unreadable", str(exc)))
+        return result
+    try:
+        data = json.loads(raw.decode("utf-8"))
+    except (UnicodeDecodeError, ValueError) as exc:
+        result["issues"].append(_issue(ERROR, "invalid_json", str(exc)))
+        return result
+    result["issues"] = validate_script(data)
+    if any(issue["severity"] == ERROR for issue in result["issues"]):
+        return result
+    digest = hashlib.sha256(raw).hexdigest()
+    file_name = f"{digest}.json"
+    path = os.path.join(output_dir, file_name)
+    if not os.path.exists(path):
+        payload = {"script": data, "rules": compile_rules(data).to_dict()}
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "w", encoding="utf-8") as handle:
+            json.dump(payload, handle, ensure_ascii=False)
+        os.replace(temporary, path)
+    result["entry"] = {
+        "id": data["id"],
+        "file": file_name,
+        "signature": signature,
+        "listing": script_listing(data["id"], data),
+        "role_names": [role.get("name", "") for role in data.get("roles", [])],
+        "clue_names": [clue.get("name", "") for clue in data.get("clues", [])],
+    }
+    return result
+
+
+def load_index(output_dir):
+    try:
+        with open(os.path.join(output_dir, COMPILED_INDEX), "r", encoding="utf-8") as handle:
+            index = json.load(handle)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(index, dict) or index.get("format") != COMPILED_FORMAT:
+        return {}
+    return index
+
+
+def compile_library(scripts_path, output_dir=None, jobs=None, force=False):
+    output_dir = output_dir or os.path.join(scripts_path, COMPILED_DIRNAME)
+    if os.path.realpath(output_dir) == os.path.realpath(scripts_path):
+        raise ValueError("The compiled output cannot be the scripts directory")
+    os.makedirs(output_dir, exist_ok=True)
+    previous = {} if force else load_index(output_dir)
+    previous_sources = previous.get("sources", {})
+    previous_issues = previous.get("issues", {})
+    previous_failed = previous.get("failed", {})
+    names = sorted(name for name in os.listdir(scripts_path) if name.endswith(".json"))
+    sources = {}
+    issues = {}
+    failed = {}
+    tasks = []
+    for name in names:
+        path = os.path.join(scripts_path, name)
+        try:
+            signature = source_signature(path)
+        except OSError:
+            continue
+        entry = previous_sources.get(name)
+        if entry and entry.get("signature") == signature:
+            sources[name] = entry
+            if previous_issues.get(name):
+                issues[name] = previous_issues[name]
+            continue
+        if previous_failed.get(name) == signature:
+            # Still broken in the same way; report it without re-parsing.
+            failed[name] = signature
+            issues[name] = previous_issues.get(name, [])
+            continue
+        tasks.append((path, name, output_dir, signature))
+    skipped = len(sources) + len(failed)
+    if len(tasks) > 1 and jobs != 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            chunksize = max(1, len(tasks) // (8 * (jobs or os.cpu_count() or 1)))
+            results = list(executor.map(compile_source, tasks, chunksize=chunksize))
+    else:
+        results = [compile_source(task) for task in tasks]
+    for result in results:
+        if result["issues"]:
+            issues[result["source"]] = result["issues"]
+        if "entry" in result:
+            sources[result["source"]] = result["entry"]
+        elif result.get("signature"):
+            failed[result["source"]] = result["signature"]
+    # Script ids must be unique across the library; the first file by name wins,
+    # matching what ScriptStore does for uncompiled sources.
+    owners = {}
+    for name in sorted(sources):
+        script_id = sources[name]["id"]
+        if script_id in owners:
+            issues.setdefault(name, []).append(_issue(
+                ERROR,
+                "duplicate_script_id",
+                f"Script id {script_id} is already used by {owners[script_id]}",
+                "id",
+            ))
+            del sources[name]
+        else:
+            owners[script_id] = name
+    index = {"format": COMPILED_FORMAT, "sources": sources, "issues": issues, "failed": failed}
+    temporary = os.path.join(output_dir, COMPILED_INDEX + ".tmp")
+    with open(temporary, "w", encoding="utf-8") as handle:
+        json.dump(index, handle, ensure_ascii=False)
+    os.replace(temporary, os.path.join(output_dir, COMPILED_INDEX))
+    live = {entry["file"] for entry in sources.values()}
+    for file_name in os.listdir(output_dir):
+        if COMPILED_BODY.fullmatch(file_name) and file_name not in live:
+            os.remove(os.path.join(output_dir, file_name))
+    return {
+        "scripts": len(names),
+        "compiled": len(tasks),
+        "skipped": skipped,
+        "valid": len(sources),
+        "errors": sum(
+            1 for found in issues.values() for issue in found if issue["severity"] == ERROR
+        ),
+        "warnings": sum(
+            1 for found in issues.values() for issue in found if issue["severity"] == WARNING
+        ),
+        "issues": issues,
+        "output": output_dir,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Validate a script library and write the compiled index the server loads"
+    )
+    parser.add_argument("scripts", nargs="?", default=os.path.join(os.getcwd(), "data", "scripts"))
+    parser.add_argument("--output", help=f"compiled output (default: SCRIPTS/{COMPILED_DIRNAME})")
+    parser.add_argument("--jobs", type=int, default=None, help="worker processes (default: CPUs)")
+    parser.add_argument("--force", action="store_true", help="recompile unchanged files too")
+    parser.add_argument("--json", metavar="PATH", help="also write the report as JSON")
+    parser.add_argument("--quiet", action="store_true", help="only print the summary")
+    args = parser.parse_args(argv)
+    if not os.path.isdir(args.scripts):
+        parser.error(f"{args.scripts} is not a directory")
+
+    try:
+        report = compile_library(args.scripts, args.output, args.jobs, args.force)
+    except ValueError as exc:
+        parser.error(str(exc))
+    if not args.quiet:
+        for name, found in sorted(report["issues"].items()):
+            for issue in found:
+                where = f" ({issue['where']})" if issue["where"] else ""
+                print(f"{name}{where}: {issue['severity']} {issue['code']}: {issue['message']}")
+    print(f"{report['scripts']} scripts: {report['compiled']} compiled, "
+          f"{report['skipped']} unchanged, {report['valid']} valid, "
+          f"{report['errors']} errors, {report['warnings']} warnings -> {report['output']}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, ensure_ascii=False, indent=2)
+    return 1 if report["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,194 @@
+import heapq
+import operator
+import re
+import threading
+from collections import OrderedDict
+
+FIELD_WEIGHTS = {"title": 8, "roles": 3, "clues": 2, "summary": 1}
+QUERY_CACHE_SIZE = 128
+# One-token queries over postings at least this long are ranked from tiers.
+TIER_MIN_POSTING = 256
+# Ranked results kept per cached query; later pages rank again past this.
+RANKED_PREFIX = 100
+# Kana, CJK ideographs (with extension A and compatibility forms) and hangul.
+_CJK = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff"
+# CJK text has no spaces, so it is kept as runs of characters; everything
+# else is split into words of letters and digits.
+_RUN = re.compile(f"([{_CJK}]+)|([^\\W_{_CJK}]+)")
+
+
+def _split_runs(text):
+    # Yields (is_cjk, run) pieces.
+    for cjk, word in _RUN.findall(text.lower()):
+        if cjk:
+            yield True, cjk
+        else:
+            yield False, word
+
+
+def index_tokens(text):
+    # Documents index every CJK character and every adjacent pair, so both
+    # one-character and longer queries find them.
+    tokens = set()
+    for cjk, run in _split_runs(text):
+        if not cjk:
+            tokens.add(run)
+            continue
+        tokens.update(run)
+        tokens.update(map(operator.add, run, run[1:]))
+    return tokens
+
+
+def query_tokens(text):
+    # Queries use pairs only; a lone CJK character falls back to its unigram.
+    tokens = []
+    for cjk, run in _split_runs(text):
+        if not cjk or len(run) == 1:
+            pieces = [run]
+        else:
+            pieces = [run[position:position + 2] for position in range(len(run) - 1)]
+        tokens.extend(piece for piece in pieces if piece not in tokens)
+    return tokens
+
+
+class SearchIndex:
+    # Inverted index from token to {doc id: weight}. Documents are added and
+    # removed one at a time, and the top of the ranking for recent queries is
+    # cached until the next change so paging through it is a slice. Long
+    # postings are also grouped by weight on first use, so a one-token query
+    # for a common character only ranks its best tiers.
+    def __init__(self):
+        self._postings = {}
+        self._tiers = {}
+        self._documents = {}
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self.version = 0
+
+    def __len__(self):
+        return len(self._documents)
+
+    def add(self, doc_id, fields):
+        weights = {}
+        for field, values in fields.items():
+            weight = FIELD_WEIGHTS.get(field, 1)
+            if isinstance(values, str):
+                values = (values,)
+            seen = set()
+            for value in values:
+                seen.update(index_tokens(value or ""))
+            for token in seen & weights.keys():
+                weights[token] += weight
+            weights.update(dict.fromkeys(seen - weights.keys(), weight))
+        with self._lock:
+            self._remove_locked(doc_id)
+            postings = self._postings
+            for token, weight in weights.items():
+                posting = postings.get(token)
+                if posting is None:
+                    postings[token] = {doc_id: weight}
+                else:
+                    posting[doc_id] = weight
+            if self._tiers:
+                for token in weights:
+                    self._tiers.pop(token, None)
+            self._documents[doc_id] = tuple(weights)
+            self._changed_locked()
+
+    def remove(self, doc_id):
+        with self._lock:
+            if self._remove_locked(doc_id):
+                self._changed_locked()
+
+    def _remove_locked(self, doc_id):
+        tokens = self._documents.pop(doc_id, None)
+        if tokens is None:
+            return False
+        for token in tokens:
+            posting = self._postings[token]
+            del posting[doc_id]
+            if not posting:
+                del self._postings[token]
+            self._tiers.pop(token, None)
+        return True
+
+    def _changed_locked(self):
+        self.version += 1
+        self._cache.clear()
+
+    def search(self, query, offset=0, limit=20):
+        # Returns (total, [(doc_id, score)]) for the requested page. Every query
+        # token must match; documents score the sum of their token weights and
+        # ties go to the lower id.
+        tokens = query_tokens(query)
+        if not tokens:
+            return 0, []
+        key = tuple(tokens)
+        wanted = offset + limit
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None and (cached[2] or len(cached[1]) >= wanted):
+                self._cache.move_to_end(key)
+                total, ranked, _ = cached
+            else:
+                total, ranked = self._rank_locked(tokens, max(wanted, RANKED_PREFIX))
+                self._cache[key] = (total, ranked, len(ranked) == total)
+                if len(self._cache) > QUERY_CACHE_SIZE:
+                    self._cache.popitem(last=False)
+        return total, [(doc_id, -score) for score, doc_id in ranked[offset:wanted]]
+
+    def _rank_locked(self, tokens, count):
+        postings = []
+        for token in tokens:
+            posting = self._postings.get(token)
+            if not posting:
+                return 0, []
+            postings.append(posting)
+        if len(postings) == 1 and len(postings[0]) >= TIER_MIN_POSTING:
+            return len(postings[0]), self._rank_tiers_locked(tokens[0], count)
+        # Intersections and scoring stay in set and map operations so a
+        # query over thousands of matches does not loop in Python.
+        postings.sort(key=len)
+        matches = postings[0].keys()
+        for posting in postings[1:]:
+            matches = matches & posting.keys()
+            if not matches:
+                return 0, []
+        matches = list(matches)
+        scores = map(sum, zip(*[map(posting.__getitem__, matches) for posting in postings]))
+        ranked = zip(map(operator.neg, scores), matches)
+        if count < len(matches):
+            return len(matches), heapq.nsmallest(count, ranked)
+        return len(matches), sorted(ranked)
+
+    def _rank_tiers_locked(self, token, count):
+        # Common characters appear in nearly every script; walking the tiers
+        # from the heaviest down stops once the wanted prefix is filled.
+        tiers = self._tiers.get(token)
+        if tiers is None:
+            grouped = {}
+            for doc_id, weight in self._postings[token].items():
+                docs = grouped.get(weight)
+                if docs is None:
+                    grouped[weight] = [doc_id]
+                else:
+                    docs.append(doc_id)
+            tiers = self._tiers[token] = sorted(grouped.items(), reverse=True)
+        ranked = []
+        for weight, docs in tiers:
+            wanted = count - len(ranked)
+            if wanted <= 0:
+                break
+            if wanted < len(docs):
+                ranked.extend((-weight, doc_id) for doc_id in heapq.nsmallest(wanted, docs))
+            else:
+                ranked.extend((-weight, doc_id) for doc_id in sorted(docs))
+        return ranked
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "documents": len(self._documents),
+                "tokens": len(self._postings),
+                "cached_queries": len(self._cache),
+            }
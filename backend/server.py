@@ -1,19 +1,76 @@
+import argparse
+import json
+import math
+import os
+import secrets
+import signal
+import socket
 import socketserver
+import sys
 import threading
+import time
 
-from backend.protocol import decode_message, send_message
-from backend.state import GameRoom, ScriptStore
+from backend.assets import AssetStore, AssetStreamer
+from backend.dispatch import (
+    DispatchContext,
+    Field,
+    MessageRegistry,
+    as_bool,
+    etag_map,
+    non_empty_str,
+    operation_list,
+    phase_timers,
+    scalar_id,
+)
+from backend.discovery import DISCOVERY_PORT, DiscoveryResponder, encode_beacon, local_address
+from backend.history import GameHistory
+from backend.metrics import MetricsDumper, NullMetrics, ServerMetrics
+from backend.profiling import DEFAULT_PROFILE_SECONDS, PROFILE_MODES, ProfileSession
+from backend.protocol import (
+    DEFAULT_HOST,
+    DEFAULT_PORT,
+    SCRIPT_PAGE_SIZE,
+    NowaitSender,
+    content_etag,
+    decode_message,
+    encode_message,
+)
+from backend.ratelimit import DEFAULT_MAX_CONNECTIONS, ConnectionGate, RateLimiter
+from backend.replay import ReplayRecorder
+from backend.spectators import DEFAULT_MAX_SPECTATORS, SpectatorHub
+from backend.state import (
+    MAX_PLAYER_COUNT,
+    MIN_PLAYER_COUNT,
+    VIEW_HOST,
+    VIEW_SPECTATOR,
+    GameRoom,
+    ScriptStore,
+)
+from backend.timers import TimerWheel
 
-DEFAULT_HOST = "0.0.0.0"
-DEFAULT_PORT = 5000
-MIN_PLAYER_COUNT = 4
-MAX_PLAYER_COUNT = 6
+DEFAULT_METRICS_INTERVAL = 10.0
+MAX_BATCH_OPS = 32
+AUDIENCE_BROADCAST_INTERVAL = 0.5
+COUNTDOWN_INTERVAL = 1.0
+MAX_PHASE_SECONDS = 24 * 60 * 60
+HISTORY_GAMES = 10
+MAX_HISTORY_GAMES = 200
+MAX_SCRIPT_PAGE_SIZE = 200
+SEARCH_PAGE_SIZE = 20
+MAX_SEARCH_PAGE_SIZE = 100
+MAX_SEARCH_QUERY = 200
+SCRIPTS_CACHE_FIELDS = (
+    Field("scripts_etag", non_empty_str, required=False),
+    Field("known_scripts", etag_map, required=False, error="Invalid known scripts"),
+)
 
 
-class GameRequestHandler(socketserver.StreamRequestHandler):
+class GameRequestHandler(NowaitSender, socketserver.StreamRequestHandler):
     def setup(self):
         super().setup()
         self.player_id = None
+        self.spectator = None
+        self._send_lock = threading.Lock()
 
     def handle(self):
         while True:
@@ -23,38 +80,167 @@ class GameRequestHandler(socketserver.StreamRequestHandler):
             try:
                 message = decode_message(raw_line.decode("utf-8").strip())
             except Exception:
+                self.server.game_server.metrics.record_error("decode")
                 continue
             if not message:
                 continue
             self.server.game_server.handle_message(self, message)
 
     def finish(self):
-        if self.player_id:
-            self.server.game_server.remove_session(self.player_id)
-        super().finish()
+        try:
+            if self.player_id:
+                self.server.game_server.remove_session(self.player_id)
+            elif self.spectator:
+                self.server.game_server.remove_spectator(self.spectator)
+        finally:
+            # Requests sent before joining were limited by address.
+            self.server.game_server.forget_client(self.client_address)
+            if not self.spectator:
+                self.server.game_server.release_connection()
+            super().finish()
 
     def send(self, message):
+        self.send_raw(encode_message(message))
+
+    def send_raw(self, data):
+        size = len(data)
         try:
-            send_message(self.wfile, message)
+            with self._send_lock:
+                if self._pending:
+                    data, self._pending = self._pending + data, b""
+                self.wfile.write(data)
+                self.wfile.flush()
         except Exception:
-            pass
+            self.server.game_server.metrics.record_error("send")
+            return
+        self.server.game_server.metrics.record_bytes(self.player_id, size)
+
+    def _sent(self, size):
+        self.server.game_server.metrics.record_bytes(self.player_id, size)
+
+    def _send_failed(self):
+        self.server.game_server.metrics.record_error("send")
+
+
+class HandoffListener:
+    # Stands in for the socketserver instance when a connection was accepted
+    # by another process and handed to GameServer.serve_connection.
+    def __init__(self, game_server):
+        self.game_server = game_server
 
 
 class ThreadedTCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
     daemon_threads = True
     allow_reuse_address = True
 
+    def verify_request(self, request, client_address):
+        if self.game_server.admit_connection():
+            return True
+        try:
+            request.sendall(encode_message({
+                "type": "throttled",
+                "request_type": "connect",
+                "message": "Server is full",
+            }))
+        except OSError:
+            pass
+        return False
+
 
 class GameServer:
-    def __init__(self, host, port, scripts_path):
+    def __init__(
+        self,
+        host,
+        port,
+        scripts_path,
+        enable_metrics=False,
+        metrics_path=None,
+        metrics_interval=DEFAULT_METRICS_INTERVAL,
+        profile_dir=None,
+        rate_limits=None,
+        max_connections=DEFAULT_MAX_CONNECTIONS,
+        max_spectators=DEFAULT_MAX_SPECTATORS,
+        script_store=None,
+        timer_wheel=None,
+        assets_path=None,
+        asset_store=None,
+        history_path=None,
+        history=None,
+        discovery_port=None,
+        host_token=None,
+        elect_host=False,
+    ):
         self._host = host
         self._port = port
-        self._scripts = ScriptStore(scripts_path)
-        self._room = GameRoom(self._scripts)
+        if enable_metrics or metrics_path:
+            self.metrics = ServerMetrics()
+        else:
+            self.metrics = NullMetrics()
+        self._metrics_dumper = None
+        if metrics_path:
+            self._metrics_dumper = MetricsDumper(self.metrics, metrics_path, metrics_interval)
+        self._scripts = script_store or ScriptStore(scripts_path)
+        if asset_store is None:
+            asset_store = AssetStore(assets_path or os.path.join(os.getcwd(), "assets"))
+        self._assets = asset_store
+        self._streamer = AssetStreamer(asset_store)
+        # Finished games are archived only when a history location is given;
+        # sharded workers pass one archive shared by their rooms.
+        if history is None and history_path:
+            history = GameHistory(history_path)
+        self._history = history
+        self._owns_history = history is not None and history_path is not None
+        self._replay = None
+        self._replay_version = None
+        self._replay_lock = threading.Lock()
+        self._room = GameRoom(
+            self._scripts,
+            lock=self.metrics.instrument_lock(threading.RLock(), "room"),
+            history=history,
+        )
         self._lock = threading.Lock()
         self._sessions = {}
         self._server = None
         self._thread = None
+        self._services_started = False
+        self._profile_dir = profile_dir or os.path.join(os.getcwd(), "profiles")
+        self._profiler = None
+        self._profile_requester = None
+        self._limiter = None if rate_limits is False else RateLimiter(rate_limits)
+        self._gate = ConnectionGate(max_connections)
+        self._spectators = SpectatorHub(max_spectators, self.metrics)
+        self._spectator_lock = threading.Lock()
+        self._view_lock = threading.Lock()
+        self._view_cache = {}
+        self._view_cache_version = None
+        self._view_encodes = 0
+        self._view_hits = 0
+        # One wheel drives every timer of the server; sharded workers pass a
+        # shared one so rooms do not each add a thread.
+        self._timers = timer_wheel or TimerWheel()
+        self._owns_timers = timer_wheel is None
+        self._timer_lock = threading.Lock()
+        self._phase_timer_key = None
+        self._phase_deadline = None
+        self._deadline_timer = None
+        self._countdown_timer = None
+        self._audience_timer = None
+        self._audience_sent_at = 0.0
+        # LAN discovery is opt-in: the GUI host answers probes, headless and
+        # sharded rooms do not unless given a port.
+        self._discovery = None
+        if discovery_port is not None:
+            self._discovery = DiscoveryResponder(self._beacon, discovery_port)
+        # Without a token the is_host flag of connect is trusted, as for the
+        # GUI host on loopback. A dedicated server sets one, and may elect the
+        # first player to join as host.
+        self._host_token = host_token
+        self._elect_host = elect_host
+        self._beacon_id = secrets.token_hex(4)
+        self._beacon_address = None
+        self._beacon_cache = None
+        self._registry = MessageRegistry()
+        self._register_builtin_messages()
 
     def start(self):
         if self._server:
@@ -63,148 +249,1190 @@ class GameServer:
         self._server.game_server = self
         self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
         self._thread.start()
+        self.start_services()
+
+    def start_services(self):
+        if self._services_started:
+            return
+        self._services_started = True
+        self._spectators.start()
+        self._streamer.start()
+        if self._owns_timers:
+            self._timers.start()
+        if self._metrics_dumper:
+            self._metrics_dumper.start()
+        if self._discovery:
+            try:
+                self._discovery.start()
+            except OSError:
+                self._discovery = None
+
+    def serve_connection(self, request, client_address):
+        if not self.admit_connection():
+            try:
+                request.sendall(encode_message({
+                    "type": "throttled",
+                    "request_type": "connect",
+                    "message": "Server is full",
+                }))
+            except OSError:
+                pass
+            request.close()
+            return
+        try:
+            GameRequestHandler(request, client_address, HandoffListener(self))
+        finally:
+            try:
+                request.shutdown(socket.SHUT_WR)
+            except OSError:
+                pass
+            request.close()
+
+    @property
+    def address(self):
+        if self._server:
+            return self._server.server_address
+        return (self._host, self._port)
+
+    def _beacon(self):
+        # Rebuilt only when the room changes; probes between changes are
+        # answered with the same bytes.
+        version = self._room.version
+        cached = self._beacon_cache
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        host, port = self.address
+        if self._beacon_address is None:
+            self._beacon_address = local_address() if host in ("", DEFAULT_HOST) else host
+        beacon = dict(
+            self._room.lobby_summary(),
+            id=self._beacon_id,
+            address=self._beacon_address,
+            port=port,
+        )
+        data = encode_beacon(beacon)
+        self._beacon_cache = (version, data)
+        return data
 
     def stop(self):
-        if not self._server:
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        elif not self._services_started:
             return
-        self._server.shutdown()
-        self._server.server_close()
-        self._server = None
+        self._services_started = False
+        self._spectators.stop()
+        self._streamer.stop()
+        self.stop_profile()
+        with self._lock:
+            timer, self._audience_timer = self._audience_timer, None
+        self._timers.cancel(timer)
+        with self._timer_lock:
+            self._timers.cancel(self._deadline_timer)
+            self._timers.cancel(self._countdown_timer)
+            self._deadline_timer = self._countdown_timer = None
+            self._phase_timer_key = None
+        if self._owns_timers:
+            self._timers.stop()
+        if self._metrics_dumper:
+            self._metrics_dumper.stop()
+        if self._discovery:
+            self._discovery.stop()
+        with self._replay_lock:
+            recorder, self._replay = self._replay, None
+        if recorder is not None:
+            recorder.discard()
+        if self._owns_history:
+            self._history.close()
+
+    def start_profile(self, mode, seconds=DEFAULT_PROFILE_SECONDS, requester=None):
+        if mode not in PROFILE_MODES:
+            return None, f"Profile mode must be one of: {', '.join(PROFILE_MODES)}"
+        with self._lock:
+            if self._profiler:
+                return None, "Profiling already running"
+            profiler = ProfileSession(
+                mode, seconds, self._profile_dir, on_finish=self._on_profile_finished
+            )
+            self._profiler = profiler
+            self._profile_requester = requester
+        profiler.start()
+        return profiler, None
+
+    def stop_profile(self):
+        profiler = self._profiler
+        if not profiler:
+            return []
+        return profiler.stop()
+
+    def _on_profile_finished(self, profiler):
+        with self._lock:
+            if self._profiler is profiler:
+                self._profiler = None
+            session = self._sessions.get(self._profile_requester)
+            self._profile_requester = None
+        if session:
+            session.send({
+                "type": "profile_finished",
+                "mode": profiler.mode,
+                "files": profiler.files,
+            })
 
     def handle_message(self, handler, message):
+        profiler = self._profiler
+        if profiler:
+            profiler.run(str(message.get("type")), self._handle_instrumented, handler, message)
+        else:
+            self._handle_instrumented(handler, message)
+
+    def _handle_instrumented(self, handler, message):
+        if not self.metrics.enabled:
+            self._handle_message(handler, message)
+            return
+        start = time.perf_counter()
+        try:
+            self._handle_message(handler, message)
+        except Exception:
+            self.metrics.record_error(f"exception:{message.get('type')}")
+            raise
+        finally:
+            self.metrics.record_message(str(message.get("type")), time.perf_counter() - start)
+
+    def admit_connection(self):
+        return self._gate.admit()
+
+    def release_connection(self):
+        self._gate.release()
+
+    def forget_client(self, client_address):
+        if self._limiter:
+            self._limiter.forget(client_address)
+
+    def _admit(self, handler, message_type, cost=1):
+        if not self._limiter:
+            return True
+        session_key = handler.player_id
+        if session_key is None:
+            spectator = getattr(handler, "spectator", None)
+            if spectator is not None:
+                session_key = spectator.key
+            else:
+                session_key = getattr(handler, "client_address", None)
+        allowed, retry_after = self._limiter.check(session_key, message_type, cost)
+        if allowed:
+            return True
+        if self.metrics.enabled:
+            self.metrics.record_error(f"throttled:{message_type}")
+        handler.send({
+            "type": "throttled",
+            "request_type": message_type,
+            "retry_after": round(retry_after, 3) if retry_after is not None else None,
+        })
+        return False
+
+    def register_message(self, message_type, handler=None, **options):
+        return self._registry.register(message_type, handler, **options)
+
+    def _handle_message(self, handler, message):
         message_type = message.get("type")
-        if message_type == "connect":
-            display_name = message.get("display_name", "")
-            is_host = bool(message.get("is_host"))
-            player_id = self._room.add_player(display_name, is_host)
-            handler.player_id = player_id
+        spec = self._registry.get(message_type)
+        if spec is None:
+            return
+        if not self._admit(handler, message_type):
+            return
+        spectator = getattr(handler, "spectator", None)
+        if spectator is not None and not spec.spectator:
+            self._send_error(handler, message_type, "Spectators are read-only")
+            return
+        if spec.requires_session and handler.player_id is None and spectator is None:
+            self._send_error(handler, message_type, "Not connected")
+            return
+        session_info = None
+        if spec.needs_session_info:
+            session_info = self._room.session_info(handler.player_id)
+        values, error = spec.validate(message, session_info)
+        if error:
+            self._send_error(handler, message_type, error)
+            return
+        context = DispatchContext(self, handler, message_type, values)
+        spec.handler(context)
+        self._finish_dispatch(context)
+
+    def _finish_dispatch(self, context):
+        if context.error:
+            self._send_error(context.handler, context.message_type, context.error)
+            return
+        for reply in context.replies:
+            context.handler.send(reply)
+        if context.outbox:
             with self._lock:
-                self._sessions[player_id] = handler
-            handler.send({"type": "welcome", "player_id": player_id, "is_host": is_host})
-            handler.send({"type": "scripts", "scripts": self._room.list_scripts()})
+                targets = [
+                    (self._sessions.get(player_id), message)
+                    for player_id, message in context.outbox
+                ]
+            for session, message in targets:
+                if session:
+                    session.send(message)
+        if context.changed:
             self.broadcast_state()
+
+    def _register_builtin_messages(self):
+        register = self._registry.register
+        register(
+            "connect",
+            self._on_connect,
+            fields=(
+                Field("display_name", str, required=False, default=""),
+                Field("is_host", as_bool, required=False, default=False),
+                Field("spectator", as_bool, required=False, default=False),
+                Field("resume_token", non_empty_str, required=False),
+                Field("host_token", non_empty_str, required=False),
+                Field("role_etag", non_empty_str, required=False),
+                Field(
+                    "scripts_page",
+                    int,
+                    required=False,
+                    error="Invalid script page size",
+                    check=lambda value: 0 <= value <= MAX_SCRIPT_PAGE_SIZE,
+                ),
+            ) + SCRIPTS_CACHE_FIELDS,
+            requires_session=False,
+            batchable=False,
+        )
+        register(
+            "set_name",
+            self._on_set_name,
+            fields=(
+                Field(
+                    "display_name",
+                    non_empty_str,
+                    required=False,
+                    default="",
+                    error="Invalid player name",
+                ),
+            ),
+        )
+        register(
+            "request_scripts",
+            self._on_request_scripts,
+            fields=SCRIPTS_CACHE_FIELDS,
+            spectator=True,
+        )
+        register(
+            "request_script_page",
+            self._on_request_script_page,
+            fields=(
+                Field("cursor", non_empty_str, required=False, error="Invalid cursor"),
+                Field(
+                    "limit",
+                    int,
+                    required=False,
+                    default=SCRIPT_PAGE_SIZE,
+                    error="Invalid script page size",
+                    check=lambda value: 0 < value <= MAX_SCRIPT_PAGE_SIZE,
+                ),
+                Field(
+                    "players",
+                    int,
+                    required=False,
+                    error="Invalid player count",
+                    check=lambda value: MIN_PLAYER_COUNT <= value <= MAX_PLAYER_COUNT,
+                ),
+            ),
+            spectator=True,
+        )
+        register(
+            "search_scripts",
+            self._on_search_scripts,
+            fields=(
+                Field(
+                    "query",
+                    non_empty_str,
+                    error="Invalid search",
+                    check=lambda value: len(value) <= MAX_SEARCH_QUERY,
+                ),
+                Field(
+                    "offset",
+                    int,
+                    required=False,
+                    default=0,
+                    error="Invalid search offset",
+                    check=lambda value: value >= 0,
+                ),
+                Field(
+                    "limit",
+                    int,
+                    required=False,
+                    default=SEARCH_PAGE_SIZE,
+                    error="Invalid search limit",
+                    check=lambda value: 0 < value <= MAX_SEARCH_PAGE_SIZE,
+                ),
+            ),
+            spectator=True,
+        )
+        register(
+            "reload_scripts",
+            self._on_reload_scripts,
+            fields=SCRIPTS_CACHE_FIELDS,
+            host_only=True,
+            batchable=False,
+        )
+        register(
+            "select_script",
+            self._on_select_script,
+            fields=(Field("script_id", non_empty_str, error="Invalid script"),),
+            host_only=True,
+        )
+        register(
+            "set_player_count",
+            self._on_set_player_count,
+            fields=(
+                Field(
+                    "player_count",
+                    int,
+                    error="Invalid player count",
+                    check=lambda value: MIN_PLAYER_COUNT <= value <= MAX_PLAYER_COUNT,
+                    check_error=f"Player count must be {MIN_PLAYER_COUNT}-{MAX_PLAYER_COUNT}",
+                ),
+            ),
+            host_only=True,
+        )
+        register("assign_roles", self._on_assign_roles, host_only=True)
+        register("advance_phase", self._on_advance_phase, host_only=True)
+        register(
+            "advance_round",
+            self._on_advance_round,
+            host_only=True,
+            phases=("Investigation",),
+            phase_error="Not in investigation phase",
+        )
+        register("reset_game", self._on_reset_game, host_only=True)
+        register(
+            "set_phase_timers",
+            self._on_set_phase_timers,
+            fields=(
+                Field(
+                    "timers",
+                    phase_timers,
+                    required=False,
+                    default={},
+                    error="Invalid phase timers",
+                    check=lambda timers: all(
+                        seconds <= MAX_PHASE_SECONDS for seconds in timers.values()
+                    ),
+                    check_error=f"Phase timers are limited to {MAX_PHASE_SECONDS} seconds",
+                ),
+                Field("auto_close_votes", as_bool, required=False, default=False),
+            ),
+            host_only=True,
+        )
+        register(
+            "request_clue",
+            self._on_request_clue,
+            fields=(
+                Field(
+                    "clue_id",
+                    error="Missing clue id",
+                    check=scalar_id,
+                    check_error="Invalid clue id",
+                ),
+            ),
+        )
+        register(
+            "submit_vote",
+            self._on_submit_vote,
+            fields=(Field("target_id", int, error="Invalid vote target"),),
+        )
+        register(
+            "batch",
+            self._on_batch,
+            fields=(
+                Field(
+                    "ops",
+                    operation_list,
+                    error="Invalid batch",
+                    check=lambda ops: len(ops) <= MAX_BATCH_OPS,
+                    check_error=f"Batch is limited to {MAX_BATCH_OPS} operations",
+                ),
+                Field("id", required=False),
+            ),
+            batchable=False,
+        )
+        register(
+            "set_audience_mode",
+            self._on_set_audience_mode,
+            fields=(Field("enabled", as_bool, required=False, default=False),),
+            host_only=True,
+        )
+        register(
+            "audience_vote",
+            self._on_audience_vote,
+            fields=(Field("target_id", int, error="Invalid vote target"),),
+            batchable=False,
+            spectator=True,
+        )
+        register("request_asset_index", self._on_request_asset_index, spectator=True)
+        register(
+            "request_asset",
+            self._on_request_asset,
+            fields=(
+                Field("hash", non_empty_str, error="Invalid asset"),
+                Field(
+                    "offset",
+                    int,
+                    required=False,
+                    default=0,
+                    error="Invalid asset offset",
+                    check=lambda value: value >= 0,
+                ),
+                Field(
+                    "length",
+                    int,
+                    required=False,
+                    error="Invalid asset length",
+                    check=lambda value: value > 0,
+                ),
+                Field("id", required=False),
+            ),
+            batchable=False,
+            spectator=True,
+        )
+        register(
+            "history_report",
+            self._on_history_report,
+            fields=(
+                Field("script_id", non_empty_str, required=False, error="Invalid script"),
+                Field(
+                    "games",
+                    int,
+                    required=False,
+                    default=HISTORY_GAMES,
+                    error="Invalid game count",
+                    check=lambda value: 0 <= value <= MAX_HISTORY_GAMES,
+                ),
+            ),
+            host_only=True,
+            batchable=False,
+        )
+        register("ping", self._on_ping, spectator=True)
+        register("stats", self._on_stats, host_only=True, batchable=False)
+        register(
+            "profile",
+            self._on_profile,
+            fields=(
+                Field("action", non_empty_str, required=False, default="start"),
+                Field("mode", non_empty_str, required=False, default="sampling"),
+                Field(
+                    "seconds",
+                    float,
+                    required=False,
+                    default=DEFAULT_PROFILE_SECONDS,
+                    error="Invalid profile duration",
+                ),
+            ),
+            host_only=True,
+            batchable=False,
+        )
+
+    def _on_connect(self, context):
+        if context.values["spectator"]:
+            self._join_spectator(context)
             return
+        handler = context.handler
+        values = context.values
+        player_id = None
+        if values["resume_token"]:
+            player_id = self._room.reclaim_player(values["resume_token"])
+        resumed = player_id is not None
+        if resumed:
+            is_host = self._room.is_host(player_id)
+        else:
+            is_host = values["is_host"] or values["host_token"] is not None
+            if is_host and self._host_token is not None:
+                if not secrets.compare_digest(
+                    (values["host_token"] or "").encode("utf-8"),
+                    self._host_token.encode("utf-8"),
+                ):
+                    context.fail("Invalid host token")
+                    return
+            player_id = self._room.add_player(
+                values["display_name"], is_host, elect=self._elect_host
+            )
+            is_host = self._room.is_host(player_id)
+        handler.player_id = player_id
+        context.player_id = player_id
+        with self._lock:
+            self._sessions[player_id] = handler
+        context.reply({
+            "type": "welcome",
+            "player_id": player_id,
+            "is_host": is_host,
+            "resumed": resumed,
+            "resume_token": self._room.player_token(player_id),
+        })
+        if values["scripts_page"] is None:
+            context.reply(self._scripts_reply(values["scripts_etag"], values["known_scripts"]))
+        elif values["scripts_page"]:
+            # Paging clients get the first page now and ask for the rest as
+            # they scroll; a page size of 0 skips the listing entirely.
+            context.reply(self._script_page(None, values["scripts_page"], None))
+        if resumed:
+            role = self._room.role_payload(player_id)
+            if role:
+                context.reply(self._role_message(role, values["role_etag"]))
+        countdown = self._countdown_message()
+        if countdown:
+            context.reply(countdown)
+        context.mark_changed()
 
-        if handler.player_id is None:
-            handler.send({"type": "error", "message": "Not connected"})
+    def _join_spectator(self, context):
+        handler = context.handler
+        greeting = encode_message({
+            "type": "welcome",
+            "player_id": None,
+            "is_host": False,
+            "spectator": True,
+        })
+        session = self._spectators.add(handler, greeting)
+        if session is None:
+            context.reply({
+                "type": "throttled",
+                "request_type": "connect",
+                "message": "Spectator seats are full",
+            })
             return
+        handler.spectator = session
+        # Spectators have their own cap, so they give back the connection slot.
+        self.release_connection()
+        with self._spectator_lock:
+            if not self._spectators.has_frame("state"):
+                self._spectators.publish("state", self._encode_view(VIEW_SPECTATOR))
 
-        if message_type == "set_name":
-            ok, error = self._room.set_name(
-                handler.player_id,
-                message.get("display_name", ""),
-            )
-            if not ok:
-                handler.send({"type": "error", "message": error})
-                return
-            self.broadcast_state()
+    def remove_spectator(self, session):
+        self._spectators.remove(session)
+        self._streamer.cancel_session(session.key)
+        if self._limiter:
+            self._limiter.forget(session.key)
+
+    def _on_set_name(self, context):
+        ok, error = self._room.set_name(context.player_id, context.values["display_name"])
+        if not ok:
+            context.fail(error)
             return
+        context.mark_changed()
+
+    def _on_request_scripts(self, context):
+        context.reply(
+            self._scripts_reply(context.values["scripts_etag"], context.values["known_scripts"])
+        )
+
+    def _on_request_script_page(self, context):
+        values = context.values
+        context.reply(self._script_page(values["cursor"], values["limit"], values["players"]))
+
+    def _script_page(self, cursor, limit, players):
+        page = self._scripts.list_page(cursor, limit, players)
+        return dict(page, type="script_page", cursor=cursor, players=players)
+
+    def _on_search_scripts(self, context):
+        values = context.values
+        total, results = self._scripts.search_scripts(
+            values["query"], values["offset"], values["limit"]
+        )
+        context.reply({
+            "type": "script_results",
+            "query": values["query"],
+            "offset": values["offset"],
+            "total": total,
+            "scripts": results,
+        })
+
+    def reload_scripts(self):
+        # Picks up added, edited and deleted script files; only those are
+        # re-read and re-indexed.
+        self._scripts.refresh()
+
+    def _on_reload_scripts(self, context):
+        self.reload_scripts()
+        self._on_request_scripts(context)
 
-        if message_type == "request_scripts":
-            handler.send({"type": "scripts", "scripts": self._room.list_scripts()})
+    def _scripts_reply(self, etag, known):
+        # Clients send what they cached; an unchanged listing costs one small
+        # frame and a changed one only carries the entries that differ.
+        listing = self._scripts.listing
+        current = listing.etag
+        if etag == current:
+            return {"type": "scripts", "etag": current, "not_modified": True}
+        scripts = listing.items
+        if known is None:
+            return {"type": "scripts", "etag": current, "scripts": scripts}
+        ids = {item["id"] for item in scripts}
+        return {
+            "type": "scripts",
+            "etag": current,
+            "delta": True,
+            "scripts": [item for item in scripts if known.get(item["id"]) != item["etag"]],
+            "removed": [script_id for script_id in known if script_id not in ids],
+        }
+
+    def _role_message(self, role, cached_etag=None):
+        etag = content_etag(role)
+        if etag == cached_etag:
+            return {"type": "role_assigned", "etag": etag, "not_modified": True}
+        return {"type": "role_assigned", "etag": etag, "role": role}
+
+    def _on_select_script(self, context):
+        if not self._room.select_script(context.values["script_id"]):
+            context.fail("Invalid script")
             return
+        context.mark_changed()
 
-        if message_type == "select_script":
-            if not self._room.is_host(handler.player_id):
-                handler.send({"type": "error", "message": "Host only"})
-                return
-            script_id = message.get("script_id")
-            if not script_id or not self._room.select_script(script_id):
-                handler.send({"type": "error", "message": "Invalid script"})
-                return
-            self.broadcast_state()
+    def _on_set_player_count(self, context):
+        self._room.set_player_count(context.values["player_count"])
+        context.mark_changed()
+
+    def _on_assign_roles(self, context):
+        assigned, error = self._room.assign_roles()
+        if error:
+            context.fail(error)
             return
+        for player_id, role in assigned.items():
+            context.send_to(player_id, self._role_message(role))
+        context.mark_changed()
 
-        if message_type == "set_player_count":
-            if not self._room.is_host(handler.player_id):
-                handler.send({"type": "error", "message": "Host only"})
-                return
-            try:
-                player_count = int(message.get("player_count"))
-            except (TypeError, ValueError):
-                handler.send({"type": "error", "message": "Invalid player count"})
-                return
-            if player_count < MIN_PLAYER_COUNT or player_count > MAX_PLAYER_COUNT:
-                handler.send({"type": "error", "message": "Player count must be 4-6"})
-                return
-            self._room.set_player_count(player_count)
-            self.broadcast_state()
+    def _on_advance_phase(self, context):
+        ok, error = self._room.advance_phase()
+        if not ok:
+            context.fail(error or "Cannot advance phase")
             return
+        context.mark_changed()
 
-        if message_type == "assign_roles":
-            if not self._room.is_host(handler.player_id):
-                handler.send({"type": "error", "message": "Host only"})
-                return
-            assigned, error = self._room.assign_roles()
-            if error:
-                handler.send({"type": "error", "message": error})
-                return
-            for player_id, role in assigned.items():
-                session = self._sessions.get(player_id)
-                if session:
-                    session.send({"type": "role_assigned", "role": role})
-            self.broadcast_state()
+    def _on_advance_round(self, context):
+        ok, error = self._room.advance_search_round()
+        if not ok:
+            context.fail(error)
             return
+        context.mark_changed()
 
-        if message_type == "advance_phase":
-            if not self._room.is_host(handler.player_id):
-                handler.send({"type": "error", "message": "Host only"})
-                return
-            ok, error = self._room.advance_phase()
-            if not ok:
-                handler.send({"type": "error", "message": error or "Cannot advance phase"})
-                return
-            self.broadcast_state()
+    def _on_reset_game(self, context):
+        self._room.reset_game()
+        context.mark_changed()
+
+    def _on_set_phase_timers(self, context):
+        ok, error = self._room.set_phase_timers(
+            context.values["timers"], context.values["auto_close_votes"]
+        )
+        if not ok:
+            context.fail(error)
             return
+        context.mark_changed()
 
-        if message_type == "reset_game":
-            if not self._room.is_host(handler.player_id):
-                handler.send({"type": "error", "message": "Host only"})
-                return
-            self._room.reset_game()
-            self.broadcast_state()
+    def _on_request_clue(self, context):
+        clue, error = self._room.reveal_clue(context.values["clue_id"], context.player_id)
+        if error:
+            context.fail(error)
             return
+        context.reply({"type": "clue_revealed", "clue": clue})
+        context.mark_changed()
 
-        if message_type == "request_clue":
-            clue_id = message.get("clue_id")
-            if not clue_id:
-                handler.send({"type": "error", "message": "Missing clue id"})
-                return
-            clue, error = self._room.reveal_clue(clue_id)
-            if error:
-                handler.send({"type": "error", "message": error})
-                return
-            handler.send({"type": "clue_revealed", "clue": clue})
-            self.broadcast_state()
+    def _on_submit_vote(self, context):
+        _, error = self._room.submit_vote(context.player_id, context.values["target_id"])
+        if error:
+            context.fail(error)
             return
+        context.mark_changed()
 
-        if message_type == "submit_vote":
-            try:
-                target_id = int(message.get("target_id"))
-            except (TypeError, ValueError):
-                handler.send({"type": "error", "message": "Invalid vote target"})
-                return
-            _, error = self._room.submit_vote(handler.player_id, target_id)
-            if error:
-                handler.send({"type": "error", "message": error})
-                return
-            self.broadcast_state()
+    def _on_batch(self, context):
+        results = []
+        applied = []
+        failed = False
+        with self._room.transaction() as transaction:
+            for index, operation in enumerate(context.values["ops"]):
+                operation_type = operation.get("type")
+                if failed:
+                    results.append({"type": operation_type, "ok": False, "error": "Skipped"})
+                    continue
+                operation_context, error = self._apply_operation(context, operation)
+                if error:
+                    failed = True
+                    results.append({"type": operation_type, "ok": False, "error": error})
+                    continue
+                applied.append(operation_context)
+                results.append({
+                    "type": operation_type,
+                    "ok": True,
+                    "replies": operation_context.replies,
+                })
+            if failed:
+                transaction.rollback()
+                for result in results[:len(applied)]:
+                    result.pop("replies", None)
+                    result.update(ok=False, error="Rolled back")
+        if not failed:
+            for operation_context in applied:
+                context.outbox.extend(operation_context.outbox)
+                if operation_context.changed:
+                    context.mark_changed()
+        context.reply({
+            "type": "batch_result",
+            "id": context.values["id"],
+            "ok": not failed,
+            "results": results,
+        })
+
+    def _apply_operation(self, context, operation):
+        spec = self._registry.get(operation.get("type"))
+        if spec is None or not spec.batchable:
+            return None, "Operation not allowed in batch"
+        if self._limiter:
+            allowed, _ = self._limiter.check(context.player_id, spec.message_type)
+            if not allowed:
+                return None, "Throttled"
+        session_info = None
+        if spec.needs_session_info:
+            session_info = self._room.session_info(context.player_id)
+        values, error = spec.validate(operation, session_info)
+        if error:
+            return None, error
+        operation_context = DispatchContext(self, context.handler, spec.message_type, values)
+        spec.handler(operation_context)
+        return operation_context, operation_context.error
+
+    def _on_set_audience_mode(self, context):
+        self._room.set_audience_mode(context.values["enabled"])
+        context.mark_changed()
+
+    def _on_audience_vote(self, context):
+        ok, error = self._room.submit_audience_vote(
+            self._session_key(context), context.values["target_id"]
+        )
+        if not ok:
+            context.fail(error)
+            return
+        self._schedule_audience_broadcast()
+
+    def _on_request_asset_index(self, context):
+        context.reply({"type": "asset_index", "assets": self._assets.index()})
+
+    def _on_request_asset(self, context):
+        values = context.values
+        _, error = self._streamer.open(
+            self._session_key(context),
+            context.handler,
+            values["hash"],
+            values["offset"],
+            values["length"],
+            values["id"],
+        )
+        if error:
+            # A typed reply carrying the hash, so the client can stop waiting
+            # for this asset and retry it later.
+            if self.metrics.enabled:
+                self.metrics.record_error("request_asset")
+            context.reply({
+                "type": "asset_error",
+                "id": values["id"],
+                "hash": values["hash"],
+                "message": error,
+            })
+
+    def _session_key(self, context):
+        if context.player_id is not None:
+            return context.player_id
+        return context.handler.spectator.key
+
+    def _on_history_report(self, context):
+        if self._history is None:
+            context.fail("Game history is off")
             return
+        script_id = context.values["script_id"]
+        context.reply({
+            "type": "history_report",
+            "script_id": script_id,
+            "report": self._history.report(script_id),
+            "latest": self._history.games(script_id, context.values["games"]),
+        })
+
+    def _on_ping(self, context):
+        context.reply({"type": "pong"})
+
+    def _on_stats(self, context):
+        stats = self.metrics.snapshot()
+        stats["connections"] = self._gate.snapshot()
+        stats["spectators"] = self._spectators.snapshot()
+        with self._view_lock:
+            stats["views"] = {
+                "encodes": self._view_encodes,
+                "cache_hits": self._view_hits,
+                "cached": len(self._view_cache),
+            }
+        stats["timers"] = self._timers.snapshot()
+        stats["assets"] = self._streamer.snapshot()
+        stats["search"] = self._scripts.search_stats()
+        stats["history"] = {"games": len(self._history)} if self._history is not None else None
+        stats["discovery"] = self._discovery.snapshot() if self._discovery else None
+        stats["throttled"] = self._limiter.snapshot() if self._limiter else {}
+        context.reply({"type": "stats", "stats": stats})
 
-        if message_type == "ping":
-            handler.send({"type": "pong"})
+    def _on_profile(self, context):
+        if context.values["action"] == "stop":
+            if not self.stop_profile():
+                context.fail("Profiling is not running")
             return
+        profiler, error = self.start_profile(
+            context.values["mode"], context.values["seconds"], requester=context.player_id
+        )
+        if error:
+            context.fail(error)
+            return
+        context.reply({
+            "type": "profile_started",
+            "mode": profiler.mode,
+            "seconds": profiler.duration,
+        })
 
     def broadcast_state(self):
-        state = self._room.get_state()
-        message = {"type": "state", "state": state}
         with self._lock:
-            sessions = list(self._sessions.values())
-        for session in sessions:
-            session.send(message)
+            sessions = list(self._sessions.items())
+        views = self._room.views_for([player_id for player_id, _ in sessions])
+        frames = {}
+        for view in set(views.values()):
+            frames[view] = self._encode_view(view)
+        if self.metrics.enabled:
+            start = time.perf_counter()
+        for player_id, session in sessions:
+            session.send_raw(frames[views[player_id]])
+        if self.metrics.enabled:
+            self.metrics.record_fanout(time.perf_counter() - start, len(sessions))
+        self.publish_spectator_state()
+        self._sync_phase_timer()
+        if self._history is not None:
+            self._record_replay()
+
+    def _record_replay(self):
+        # Each game is recorded from the host view while it runs. The file is
+        # kept next to the archive only if the game reached it; a reset game
+        # is discarded.
+        with self._replay_lock:
+            recorder = self._replay
+            if recorder is None and self._room.current_game_id is None:
+                return
+            game_id, version, state = self._room.game_view(VIEW_HOST)
+            if version == self._replay_version:
+                return
+            self._replay_version = version
+            if recorder is not None and recorder.game_id != game_id:
+                self._replay = None
+                try:
+                    if game_id is None:
+                        # The state the game ended in, such as Archived.
+                        recorder.record(state)
+                    if recorder.game_id in self._history:
+                        recorder.finish()
+                    else:
+                        recorder.discard()
+                except OSError:
+                    recorder.discard()
+                recorder = None
+            if game_id is None:
+                return
+            try:
+                if recorder is None:
+                    script = state.get("script") or {}
+                    recorder = self._replay = ReplayRecorder(
+                        self._history.replay_path(game_id),
+                        {"game_id": game_id, "script_id": script.get("id"),
+                         "title": script.get("title", ""), "started_at": time.time()},
+                    )
+                recorder.record(state)
+            except OSError:
+                if recorder is not None:
+                    recorder.discard()
+                self._replay = None
+
+    def _encode_view(self, view):
+        # Each visibility class is serialized once per room version, so the
+        # cost follows the number of distinct views rather than sessions.
+        version = self._room.version
+        with self._view_lock:
+            cached = self._view_cache.get(view)
+            if cached is not None and self._view_cache_version == version:
+                self._view_hits += 1
+                return cached
+        version, state = self._room.get_view(view)
+        if self.metrics.enabled:
+            start = time.perf_counter()
+            data = encode_message({"type": "state", "state": state})
+            self.metrics.record_serialize(time.perf_counter() - start, len(data))
+        else:
+            data = encode_message({"type": "state", "state": state})
+        with self._view_lock:
+            self._view_encodes += 1
+            if self._view_cache_version != version:
+                if self._view_cache_version is not None and version < self._view_cache_version:
+                    return data
+                self._view_cache = {}
+                self._view_cache_version = version
+            self._view_cache[view] = data
+        return data
+
+    def publish_spectator_state(self):
+        with self._spectator_lock:
+            if not self._spectators.count:
+                # Nobody is watching; drop the stale frame and skip the encode.
+                self._spectators.discard("state")
+                return
+            self._spectators.publish("state", self._encode_view(VIEW_SPECTATOR))
+
+    def _schedule_audience_broadcast(self):
+        with self._lock:
+            if self._audience_timer:
+                return
+            delay = self._audience_sent_at + AUDIENCE_BROADCAST_INTERVAL - time.monotonic()
+            self._audience_timer = self._timers.schedule(delay, self._broadcast_audience)
+
+    def _broadcast_audience(self):
+        with self._lock:
+            self._audience_timer = None
+            self._audience_sent_at = time.monotonic()
+        public, tally = self._room.get_audience_tally()
+        host_message = None
+        if tally is not public:
+            host_message = {"type": "audience_votes", "audience": tally}
+        self._broadcast_frame(
+            "audience", {"type": "audience_votes", "audience": public}, host_message, nowait=True
+        )
+
+    def _broadcast_frame(self, channel, message, host_message=None, nowait=False):
+        # Small out-of-band updates are encoded once and sent as-is, without
+        # rebuilding any state view. host_message, if given, replaces message
+        # for host sessions. Timer callbacks pass nowait: the wheel thread is
+        # shared by every room, so a session that cannot take the frame at
+        # once misses it and gets the next one instead.
+        data = encode_message(message)
+        host_data = data if host_message is None else encode_message(host_message)
+        with self._lock:
+            sessions = list(self._sessions.items())
+        for player_id, session in sessions:
+            frame = data
+            if host_data is not data and self._room.is_host(player_id):
+                frame = host_data
+            if nowait:
+                session.send_nowait(frame)
+            else:
+                session.send_raw(frame)
+        if self._spectators.count:
+            self._spectators.publish(channel, data)
+        else:
+            self._spectators.discard(channel)
+
+    def _sync_phase_timer(self):
+        epoch, phase, seconds = self._room.phase_timer()
+        key = (epoch, phase, seconds)
+        with self._timer_lock:
+            if key == self._phase_timer_key:
+                return
+            was_running = self._phase_deadline is not None
+            self._phase_timer_key = key
+            self._timers.cancel(self._deadline_timer)
+            self._timers.cancel(self._countdown_timer)
+            self._deadline_timer = self._countdown_timer = None
+            if seconds:
+                self._phase_deadline = time.monotonic() + seconds
+                self._deadline_timer = self._timers.schedule(
+                    seconds, self._on_phase_deadline, epoch
+                )
+                self._countdown_timer = self._timers.schedule(
+                    min(COUNTDOWN_INTERVAL, seconds), self._on_countdown_tick, epoch
+                )
+            else:
+                self._phase_deadline = None
+            message = self._countdown_message()
+        if message:
+            self._broadcast_frame("countdown", message)
+        elif was_running:
+            self._broadcast_frame(
+                "countdown", {"type": "countdown", "phase": phase, "remaining": None}
+            )
+
+    def _countdown_message(self):
+        key, deadline = self._phase_timer_key, self._phase_deadline
+        if key is None or deadline is None:
+            return None
+        remaining = max(0, math.ceil(deadline - time.monotonic()))
+        return {"type": "countdown", "phase": key[1], "remaining": remaining}
+
+    def _on_countdown_tick(self, epoch):
+        with self._timer_lock:
+            if not self._phase_timer_key or self._phase_timer_key[0] != epoch:
+                return
+            remaining = self._phase_deadline - time.monotonic()
+            if remaining <= 0:
+                self._countdown_timer = None
+                return
+            self._countdown_timer = self._timers.schedule(
+                min(COUNTDOWN_INTERVAL, remaining), self._on_countdown_tick, epoch
+            )
+            message = self._countdown_message()
+        self._broadcast_frame("countdown", message, nowait=True)
+
+    def _on_phase_deadline(self, epoch):
+        with self._timer_lock:
+            if not self._phase_timer_key or self._phase_timer_key[0] != epoch:
+                return
+            self._deadline_timer = None
+        ok, _ = self._room.advance_phase_if(epoch)
+        if ok:
+            # The new phase has to reach everyone, so it is a full blocking
+            # broadcast; it runs off the wheel thread.
+            threading.Thread(target=self.broadcast_state, daemon=True).start()
+
+    def _send_error(self, handler, message_type, text):
+        if self.metrics.enabled:
+            self.metrics.record_error(str(message_type))
+        handler.send({"type": "error", "request_type": message_type, "message": text})
 
     def remove_session(self, player_id):
+        self._streamer.cancel_session(player_id)
+        if self._limiter:
+            self._limiter.forget(player_id)
         self._room.remove_player(player_id)
         with self._lock:
             self._sessions.pop(player_id, None)
         self.broadcast_state()
+
+
+def load_config(path):
+    # A JSON object of option defaults keyed like the long flags, e.g.
+    # {"port": 5000, "max-connections": 32}; flags on the command line win.
+    with open(path, "r", encoding="utf-8") as handle:
+        config = json.load(handle)
+    if not isinstance(config, dict):
+        raise ValueError("config must be a JSON object")
+    return {key.replace("-", "_"): value for key, value in config.items()}
+
+
+def _build_parser():
+    parser = argparse.ArgumentParser(description="Run a dedicated game server without the GUI")
+    parser.add_argument("--config", metavar="PATH", help="JSON file of option defaults")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--scripts", default=os.path.join(os.getcwd(), "data", "scripts"))
+    parser.add_argument("--assets", default=os.path.join(os.getcwd(), "assets"))
+    parser.add_argument(
+        "--engine",
+        choices=("single", "sharded"),
+        default="single",
+        help="one room in this process, or rooms spread over worker processes",
+    )
+    parser.add_argument("--workers", type=int, default=None, help="sharded engine workers")
+    parser.add_argument("--history", help="archive finished games under this directory")
+    parser.add_argument("--max-connections", type=int, default=DEFAULT_MAX_CONNECTIONS)
+    parser.add_argument("--max-spectators", type=int, default=DEFAULT_MAX_SPECTATORS)
+    parser.add_argument("--no-rate-limits", action="store_true", help="turn off per-session limits")
+    parser.add_argument("--metrics", metavar="PATH", help="write server metrics here periodically")
+    parser.add_argument("--metrics-interval", type=float, default=DEFAULT_METRICS_INTERVAL)
+    parser.add_argument("--profile-dir", help="where on-demand profiles are written")
+    parser.add_argument(
+        "--host-token",
+        help="token a client sends to become host (default: a random one, printed at start)",
+    )
+    parser.add_argument(
+        "--elect-host",
+        action="store_true",
+        help="make a player host when they join while no host is connected",
+    )
+    parser.add_argument(
+        "--discovery",
+        action="store_true",
+        help=f"answer LAN discovery probes on UDP {DISCOVERY_PORT}",
+    )
+    return parser
+
+
+def parse_args(argv=None):
+    parser = _build_parser()
+    known, _ = parser.parse_known_args(argv)
+    if known.config:
+        try:
+            config = load_config(known.config)
+        except (OSError, ValueError) as exc:
+            parser.error(f"cannot read {known.config}: {exc}")
+        unknown = sorted(set(config) - set(vars(parser.parse_args([]))) - {"config"})
+        if unknown:
+            parser.error(f"unknown options in {known.config}: {', '.join(unknown)}")
+        parser.set_defaults(**config)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    host_token = args.host_token or secrets.token_urlsafe(12)
+    options = {
+        "rate_limits": False if args.no_rate_limits else None,
+        "max_connections": args.max_connections,
+        "max_spectators": args.max_spectators,
+        "history_path": args.history,
+        "host_token": host_token,
+        "elect_host": args.elect_host,
+    }
+    if args.engine == "sharded":
+        from backend.sharding import ShardedServer
+
+        server = ShardedServer(
+            args.host,
+            args.port,
+            args.scripts,
+            workers=args.workers,
+            assets_path=args.assets,
+            **options,
+        )
+    else:
+        server = GameServer(
+            args.host,
+            args.port,
+            args.scripts,
+            metrics_path=args.metrics,
+            metrics_interval=args.metrics_interval,
+            profile_dir=args.profile_dir,
+            assets_path=args.assets,
+            discovery_port=DISCOVERY_PORT if args.discovery else None,
+            **options,
+        )
+    stopping = threading.Event()
+    # Signals only set the event; the shutdown itself runs on the main thread.
+    signal.signal(signal.SIGINT, lambda signum, frame: stopping.set())
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopping.set())
+    reload = threading.Event()
+    if args.engine == "single" and hasattr(signal, "SIGHUP"):
+        signal.signal(signal.SIGHUP, lambda signum, frame: (reload.set(), stopping.set()))
+    try:
+        server.start()
+    except OSError as exc:
+        print(f"Cannot listen on {args.host}:{args.port}: {exc}", file=sys.stderr)
+        return 1
+    address = server.address
+    print(f"{args.engine.capitalize()} server on {address[0]}:{address[1]}", flush=True)
+    if not args.host_token:
+        print(f"Host token: {host_token}", flush=True)
+    if args.elect_host:
+        print("The first player to join while no host is connected becomes host", flush=True)
+    try:
+        while True:
+            stopping.wait()
+            if not reload.is_set():
+                break
+            # SIGHUP rescans the script library without dropping anyone.
+            reload.clear()
+            stopping.clear()
+            server.reload_scripts()
+            print("Script library reloaded", flush=True)
+    finally:
+        print("Shutting down", flush=True)
+        server.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,303 @@
+import argparse
+import gc
+import hashlib
+import json
+import multiprocessing
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+
+from backend.assets import AssetStore
+from backend.history import WORKER_PREFIX, GameHistory
+from backend.protocol import encode_message
+from backend.server import DEFAULT_HOST, DEFAULT_PORT, GameServer
+from backend.state import ScriptStore
+from backend.timers import TimerWheel
+
+DEFAULT_ROOM = "default"
+MAX_ROOM_ID_LENGTH = 64
+ROUTE_TIMEOUT = 5.0
+MAX_ROUTE_BYTES = 65536
+
+
+def shard_for(room_id, shard_count):
+    digest = hashlib.blake2b(room_id.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % shard_count
+
+
+def room_from_line(raw_line):
+    try:
+        message = json.loads(raw_line.decode("utf-8"))
+    except (UnicodeDecodeError, ValueError):
+        return DEFAULT_ROOM
+    if not isinstance(message, dict) or message.get("type") != "connect":
+        return DEFAULT_ROOM
+    room_id = message.get("room")
+    if not isinstance(room_id, str) or not room_id.strip():
+        return DEFAULT_ROOM
+    return room_id.strip()[:MAX_ROOM_ID_LENGTH]
+
+
+def peek_first_line(sock, timeout=ROUTE_TIMEOUT):
+    # MSG_PEEK leaves the bytes queued, so the worker's request handler still
+    # reads the connect message itself. Every peek waits only until the
+    # deadline, so a client that connects and sends nothing cannot hold an
+    # acceptor thread; that raises socket.timeout.
+    deadline = time.monotonic() + timeout
+    data = b""
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            if not data:
+                raise socket.timeout("No connect message")
+            return data
+        sock.settimeout(remaining)
+        try:
+            peeked = sock.recv(MAX_ROUTE_BYTES, socket.MSG_PEEK)
+        except socket.timeout:
+            if not data:
+                raise
+            return data
+        if not peeked:
+            return None
+        newline = peeked.find(b"\n")
+        if newline >= 0:
+            return peeked[:newline]
+        if len(peeked) >= MAX_ROUTE_BYTES:
+            return peeked
+        if len(peeked) == len(data):
+            # Nothing new arrived yet; wait briefly instead of spinning on the
+            # already-readable peeked bytes.
+            time.sleep(min(0.005, remaining))
+        data = peeked
+
+
+def _worker_main(index, conn, script_store, asset_store, paths, server_options):
+    scripts_path, assets_path = paths
+    if script_store is None:
+        script_store = ScriptStore(scripts_path)
+    if asset_store is None:
+        asset_store = AssetStore(assets_path)
+    rooms = {}
+    lock = threading.Lock()
+    timers = TimerWheel()
+    timers.start()
+    server_options = dict(server_options)
+    history_path = server_options.pop("history_path", None)
+    # Each worker appends to its own archive; reports merge them.
+    history = (
+        GameHistory(os.path.join(history_path, f"{WORKER_PREFIX}{index}"))
+        if history_path
+        else None
+    )
+
+    def room_server(room_id):
+        with lock:
+            server = rooms.get(room_id)
+            if server is None:
+                server = GameServer(
+                    DEFAULT_HOST,
+                    0,
+                    scripts_path,
+                    script_store=script_store,
+                    asset_store=asset_store,
+                    timer_wheel=timers,
+                    history=history,
+                    **server_options,
+                )
+                server.start_services()
+                rooms[room_id] = server
+            return server
+
+    while True:
+        try:
+            item = conn.recv()
+        except (EOFError, OSError):
+            break
+        if item is None:
+            break
+        if item == "stats":
+            with lock:
+                conn.send({"worker": index, "pid": os.getpid(), "rooms": sorted(rooms)})
+            continue
+        room_id, request, client_address = item
+        server = room_server(room_id)
+        thread = threading.Thread(
+            target=server.serve_connection,
+            args=(request, client_address),
+            daemon=True,
+        )
+        thread.start()
+    with lock:
+        servers = list(rooms.values())
+    for server in servers:
+        server.stop()
+    timers.stop()
+    if history is not None:
+        history.close()
+
+
+class _RouteHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        self.server.sharded.route(self.request, self.client_address)
+
+
+class _AcceptorServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def shutdown_request(self, request):
+        # The worker owns the connection now; shutting it down here would
+        # close it for the worker too.
+        self.close_request(request)
+
+
+class ShardedServer:
+    def __init__(self, host, port, scripts_path, workers=None, **server_options):
+        self._host = host
+        self._port = port
+        self._scripts_path = scripts_path
+        self._assets_path = server_options.pop("assets_path", None) or os.path.join(
+            os.getcwd(), "assets"
+        )
+        self._worker_count = max(1, workers or os.cpu_count() or 1)
+        self._server_options = server_options
+        self._workers = []
+        self._server = None
+        self._thread = None
+        self._routed = [0] * self._worker_count
+
+    def start(self):
+        if self._server:
+            return
+        if "fork" in multiprocessing.get_all_start_methods():
+            # Load scripts once; forked workers share the pages copy-on-write.
+            # gc.freeze keeps collections in the workers from touching them.
+            context = multiprocessing.get_context("fork")
+            script_store = ScriptStore(self._scripts_path)
+            asset_store = AssetStore(self._assets_path)
+            gc.freeze()
+        else:
+            context = multiprocessing.get_context()
+            script_store = None
+            asset_store = None
+        for index in range(self._worker_count):
+            parent_conn, child_conn = context.Pipe()
+            process = context.Process(
+                target=_worker_main,
+                args=(
+                    index,
+                    child_conn,
+                    script_store,
+                    asset_store,
+                    (self._scripts_path, self._assets_path),
+                    self._server_options,
+                ),
+                daemon=True,
+            )
+            process.start()
+            child_conn.close()
+            self._workers.append((process, parent_conn, threading.Lock()))
+        if script_store is not None:
+            gc.unfreeze()
+        self._server = _AcceptorServer((self._host, self._port), _RouteHandler)
+        self._server.sharded = self
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    @property
+    def address(self):
+        if self._server:
+            return self._server.server_address
+        return (self._host, self._port)
+
+    def route(self, request, client_address):
+        try:
+            line = peek_first_line(request)
+        except OSError:
+            # Includes the route timeout; the acceptor closes the socket.
+            return
+        if line is None:
+            return
+        # Workers serve the connection in blocking mode.
+        request.settimeout(None)
+        room_id = room_from_line(line)
+        index = shard_for(room_id, self._worker_count)
+        process, conn, lock = self._workers[index]
+        try:
+            with lock:
+                conn.send((room_id, request, client_address))
+                self._routed[index] += 1
+        except (OSError, ValueError):
+            try:
+                request.sendall(encode_message({"type": "error", "message": "Room unavailable"}))
+            except OSError:
+                pass
+
+    def stats(self):
+        workers = []
+        for (process, conn, lock), routed in zip(self._workers, self._routed):
+            with lock:
+                conn.send("stats")
+                info = conn.recv() if conn.poll(ROUTE_TIMEOUT) else {}
+            info["routed"] = routed
+            info["alive"] = process.is_alive()
+            workers.append(info)
+        return {"workers": workers}
+
+    def stop(self):
+        if not self._server:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._server = None
+        for process, conn, lock in self._workers:
+            with lock:
+                try:
+                    conn.send(None)
+                except OSError:
+                    pass
+        for process, conn, _ in self._workers:
+            process.join(2.0)
+            if process.is_alive():
+                process.terminate()
+            conn.close()
+        self._workers = []
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run rooms across several worker processes")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--scripts", default=os.path.join(os.getcwd(), "data", "scripts"))
+    parser.add_argument("--assets", default=os.path.join(os.getcwd(), "assets"))
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--history", help="archive finished games under this directory")
+    args = parser.parse_args(argv)
+
+    server = ShardedServer(
+        args.host,
+        args.port,
+        args.scripts,
+        workers=args.workers,
+        assets_path=args.assets,
+        history_path=args.history,
+    )
+    server.start()
+    print(f"Sharded server on {server.address[0]}:{server.address[1]} "
+          f"with {args.workers} workers", flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+import threading
+import time
+
+DEFAULT_MAX_SPECTATORS = 500
+# A spectator whose socket will not take frames is retried this often, and
+# disconnected once it has been behind for STALL_TIMEOUT seconds.
+RETRY_INTERVAL = 0.05
+STALL_TIMEOUT = 10.0
+
+
+class SpectatorSession:
+    __slots__ = ("key", "handler", "greeting", "sent", "behind_since")
+
+    def __init__(self, key, handler, greeting=None):
+        self.key = key
+        self.handler = handler
+        self.greeting = greeting
+        self.sent = {}
+        self.behind_since = None
+
+
+class SpectatorHub:
+    def __init__(self, max_spectators=DEFAULT_MAX_SPECTATORS, metrics=None):
+        self.max_spectators = max_spectators
+        self._metrics = metrics
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._sessions = {}
+        self._frames = {}
+        self._version = 0
+        self._next_key = 1
+        self._rejected = 0
+        self._frames_sent = 0
+        self._dropped = 0
+        self._lagging = False
+        self._thread = None
+
+    def start(self):
+        if self._thread:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if not self._thread:
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(1.0)
+        self._thread = None
+
+    @property
+    def count(self):
+        return len(self._sessions)
+
+    def add(self, handler, greeting=None):
+        with self._lock:
+            if self.max_spectators and len(self._sessions) >= self.max_spectators:
+                self._rejected += 1
+                return None
+            key = f"spectator-{self._next_key}"
+            self._next_key += 1
+            session = SpectatorSession(key, handler, greeting)
+            self._sessions[key] = session
+        self._wake.set()
+        return session
+
+    def remove(self, session):
+        with self._lock:
+            self._sessions.pop(session.key, None)
+
+    def has_frame(self, channel):
+        return channel in self._frames
+
+    def publish(self, channel, data):
+        # Only the latest frame per channel is kept, so publishes that land
+        # while the worker is sending collapse into one send per spectator.
+        with self._lock:
+            self._version += 1
+            self._frames[channel] = (self._version, data)
+        self._wake.set()
+
+    def discard(self, channel):
+        with self._lock:
+            self._frames.pop(channel, None)
+
+    def flush(self):
+        with self._lock:
+            frames = sorted(
+                (version, channel, data) for channel, (version, data) in self._frames.items()
+            )
+            sessions = list(self._sessions.values())
+        if not sessions:
+            self._lagging = False
+            return 0
+        start = time.perf_counter()
+        sent = 0
+        lagging = False
+        stalled = []
+        for session in sessions:
+            count, done = self._deliver(session, frames)
+            sent += count
+            if done:
+                session.behind_since = None
+                continue
+            # Skipped for now; it gets the latest frames once its socket
+            # drains, or is dropped if it never does.
+            lagging = True
+            if session.behind_since is None:
+                session.behind_since = start
+            elif start - session.behind_since > STALL_TIMEOUT:
+                stalled.append(session)
+        self._lagging = lagging
+        for session in stalled:
+            self.remove(session)
+            session.handler.disconnect()
+        if sent or stalled:
+            with self._lock:
+                self._frames_sent += sent
+                self._dropped += len(stalled)
+            if self._metrics is not None and self._metrics.enabled:
+                self._metrics.record_fanout(time.perf_counter() - start, len(sessions))
+        return sent
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "active": len(self._sessions),
+                "max": self.max_spectators,
+                "rejected": self._rejected,
+                "frames_sent": self._frames_sent,
+                "dropped": self._dropped,
+            }
+
+    def _deliver(self, session, frames):
+        # Sends what the spectator has not seen without ever blocking, so a
+        # stalled spectator cannot delay the others. Returns (frames sent,
+        # caught up).
+        handler = session.handler
+        sent = 0
+        if session.greeting is not None:
+            if not handler.send_nowait(session.greeting):
+                return sent, False
+            session.greeting = None
+            sent += 1
+        for version, channel, data in frames:
+            if session.sent.get(channel, 0) >= version:
+                continue
+            if not handler.send_nowait(data):
+                return sent, False
+            session.sent[channel] = version
+            sent += 1
+        return sent, handler.send_nowait(b"")
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(RETRY_INTERVAL if self._lagging else None)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            self.flush()
@@ -1,62 +1,396 @@
+import bisect
+import copy
 import json
 import os
 import random
+import secrets
 import threading
+import time
+
+from backend.protocol import content_etag
+from backend.rules import CompiledRules, RulesError, compile_rules
+from backend.search import SearchIndex
+
+
+VIEW_PUBLIC = "public"
+VIEW_HOST = "host"
+VIEW_SPECTATOR = "spectator"
+ROLE_VIEW = "role"
+TIMED_PHASES = ("Reading", "Investigation", "Voting", "ResultReview")
+MIN_PLAYER_COUNT = 4
+MAX_PLAYER_COUNT = 6
+COMPILED_DIRNAME = ".compiled"
+COMPILED_INDEX = "index.json"
+COMPILED_FORMAT = 1
+
+
+def role_view(role_id):
+    return (ROLE_VIEW, role_id)
+
+
+def script_listing(script_id, data):
+    item = {
+        "id": script_id,
+        "title": data.get("title", ""),
+        "summary": data.get("summary", ""),
+        "role_count": len(data["roles"]) if isinstance(data.get("roles"), list) else 0,
+        "cover": data.get("cover"),
+    }
+    item["etag"] = content_etag(item)
+    return item
+
+
+def _search_fields(data, problems):
+    # Only well-formed entries are indexed; anything else is reported so one
+    # malformed file cannot stop the library from loading.
+    fields = {}
+    for key in ("title", "summary"):
+        value = data.get(key, "")
+        if not isinstance(value, str):
+            problems.append(f"{key} must be a string")
+            value = ""
+        fields[key] = value
+    for key in ("roles", "clues"):
+        entries = data.get(key, [])
+        if not isinstance(entries, list):
+            problems.append(f"{key} must be a list")
+            entries = []
+        skipped = sum(1 for entry in entries if not isinstance(entry, dict))
+        if skipped:
+            problems.append(f"{skipped} {key} entries are not objects")
+        fields[key] = [
+            entry["name"]
+            for entry in entries
+            if isinstance(entry, dict) and isinstance(entry.get("name"), str)
+        ]
+    return fields
+
+
+def source_signature(path):
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def _decrement(counts, key):
+    remaining = counts.get(key, 0) - 1
+    if remaining > 0:
+        counts[key] = remaining
+    else:
+        counts.pop(key, None)
+
+
+class ScriptListing:
+    # One immutable version of the sorted listing. Refreshes swap in a new
+    # instance, so a client paging through it sees either the old or the new
+    # listing, never a half-updated one.
+    def __init__(self, version, items):
+        self.version = version
+        self.items = items
+        self.ids = [item["id"] for item in items]
+        self.etag = content_etag([[item["id"], item["etag"]] for item in items])
+        self._seating = {}
+
+    def seating(self, players):
+        # Scripts with enough roles for the given table size, built on first
+        # use for each size.
+        view = self._seating.get(players)
+        if view is None:
+            items = [item for item in self.items if item["role_count"] >= players]
+            view = self._seating[players] = (items, [item["id"] for item in items])
+        return view
+
+    def page(self, cursor=None, limit=50, players=None):
+        # Cursors are the id of the last script already sent; ids are unique
+        # and sorted, so a page resumes after it even if scripts were added
+        # or removed in between.
+        items, ids = (self.items, self.ids) if players is None else self.seating(players)
+        start = 0 if cursor is None else bisect.bisect_right(ids, cursor)
+        page = items[start:start + limit]
+        return {
+            "version": self.version,
+            "total": len(items),
+            "scripts": page,
+            "next_cursor": page[-1]["id"] if page and start + limit < len(items) else None,
+        }
 
 
 class ScriptStore:
-    def __init__(self, scripts_path):
+    def __init__(self, scripts_path, compiled_path=None):
         self._scripts_path = scripts_path
+        self._compiled_path = compiled_path or os.path.join(scripts_path, COMPILED_DIRNAME)
         self._scripts = {}
-        self._load_scripts()
+        self._compiled = {}
+        self._listing_items = {}
+        self._sources = {}
+        self._errors = {}
+        self._rules = {}
+        self._rules_lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._search = SearchIndex()
+        self._listing = ScriptListing(0, [])
+        self.refresh()
+
+    @property
+    def listing(self):
+        return self._listing
 
-    def _load_scripts(self):
-        if not os.path.isdir(self._scripts_path):
+    @property
+    def list_etag(self):
+        return self._listing.etag
+
+    @property
+    def load_errors(self):
+        return sorted(self._errors.items())
+
+    def _load_compiled_index(self):
+        path = os.path.join(self._compiled_path, COMPILED_INDEX)
+        try:
+            with open(path, "r", encoding="utf-8") as handle:
+                index = json.load(handle)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(index, dict) or index.get("format") != COMPILED_FORMAT:
+            return {}
+        return index.get("sources", {})
+
+    def refresh(self):
+        # Rescans the library and applies only the files that were added,
+        # changed or removed since the last scan; the listing and the search
+        # index are updated per script rather than rebuilt.
+        names = []
+        if os.path.isdir(self._scripts_path):
+            names = sorted(
+                name for name in os.listdir(self._scripts_path) if name.endswith(".json")
+            )
+        with self._load_lock:
+            compiled = self._load_compiled_index()
+            present = set(names)
+            changed = False
+            for name in [name for name in self._sources if name not in present]:
+                self._drop_source(name)
+                changed = True
+            for name in names:
+                path = os.path.join(self._scripts_path, name)
+                try:
+                    signature = source_signature(path)
+                except OSError:
+                    continue
+                known = self._sources.get(name)
+                if known is not None and known[0] == signature and (known[1] or not changed):
+                    continue
+                if known is not None:
+                    self._drop_source(name)
+                self._load_source(name, path, signature, compiled.get(name))
+                changed = True
+            if changed:
+                self._listing = ScriptListing(
+                    self._listing.version + 1,
+                    [self._listing_items[script_id] for script_id in sorted(self._listing_items)],
+                )
+        return changed
+
+    def _load_source(self, name, path, signature, entry):
+        # Failed sources are remembered with no id so an unchanged broken file
+        # is not parsed again; they are retried whenever another file changes,
+        # since that may have freed a duplicate id.
+        self._sources[name] = (signature, None)
+        self._errors.pop(name, None)
+        if (
+            entry is not None
+            and entry.get("signature") == signature
+            and entry["id"] not in self._listing_items
+        ):
+            # Unchanged since the last compile: keep the index entry and read
+            # the compiled body on first use.
+            script_id = entry["id"]
+            self._compiled[script_id] = entry
+            self._listing_items[script_id] = entry["listing"]
+            self._search.add(script_id, {
+                "title": entry["listing"]["title"],
+                "summary": entry["listing"]["summary"],
+                "roles": entry.get("role_names", []),
+                "clues": entry.get("clue_names", []),
+            })
+            self._sources[name] = (signature, script_id)
             return
-        for name in os.listdir(self._scripts_path):
-            if not name.endswith(".json"):
-                continue
-            path = os.path.join(self._scripts_path, name)
-            try:
-                with open(path, "r", encoding="utf-8") as handle:
-                    data = json.load(handle)
-            except (OSError, json.JSONDecodeError):
-                continue
-            script_id = data.get("id")
-            if not script_id:
-                continue
-            self._scripts[script_id] = data
+        try:
+            with open(path, "r", encoding="utf-8") as handle:
+                data = json.load(handle)
+        except (OSError, json.JSONDecodeError) as exc:
+            self._errors[name] = str(exc)
+            return
+        script_id = data.get("id") if isinstance(data, dict) else None
+        if not isinstance(script_id, str) or not script_id:
+            self._errors[name] = "Missing script id"
+            return
+        if script_id in self._listing_items:
+            self._errors[name] = f"Duplicate script id {script_id}"
+            return
+        problems = []
+        fields = _search_fields(data, problems)
+        if problems:
+            # Loaded as before, but the problems are kept for load_errors.
+            self._errors[name] = "; ".join(problems)
+        self._scripts[script_id] = data
+        self._listing_items[script_id] = script_listing(script_id, data)
+        self._search.add(script_id, fields)
+        self._sources[name] = (signature, script_id)
+
+    def _drop_source(self, name):
+        _, script_id = self._sources.pop(name)
+        self._errors.pop(name, None)
+        if script_id is None:
+            return
+        self._scripts.pop(script_id, None)
+        self._compiled.pop(script_id, None)
+        self._listing_items.pop(script_id, None)
+        self._search.remove(script_id)
+        with self._rules_lock:
+            self._rules.pop(script_id, None)
 
     def list_scripts(self):
-        output = []
-        for script_id, data in sorted(self._scripts.items()):
-            output.append({
-                "id": script_id,
-                "title": data.get("title", ""),
-                "summary": data.get("summary", ""),
-                "role_count": len(data.get("roles", [])),
-            })
-        return output
+        return self._listing.items
+
+    def list_page(self, cursor=None, limit=50, players=None):
+        return self._listing.page(cursor, limit, players)
+
+    def search_scripts(self, query, offset=0, limit=20):
+        total, page = self._search.search(query, offset, limit)
+        items = []
+        for script_id, score in page:
+            item = self._listing_items.get(script_id)
+            if item is not None:
+                items.append(dict(item, score=score))
+        return total, items
+
+    def search_stats(self):
+        return self._search.snapshot()
 
     def get_script(self, script_id):
-        return self._scripts.get(script_id)
+        script = self._scripts.get(script_id)
+        if script is not None or script_id not in self._compiled:
+            return script
+        with self._load_lock:
+            script = self._scripts.get(script_id)
+            entry = self._compiled.get(script_id)
+            if script is None and entry is not None:
+                try:
+                    with open(
+                        os.path.join(self._compiled_path, entry["file"]), "r", encoding="utf-8"
+                    ) as handle:
+                        payload = json.load(handle)
+                except (OSError, ValueError):
+                    return None
+                script = payload["script"]
+                if payload.get("rules") is not None:
+                    with self._rules_lock:
+                        self._rules.setdefault(script_id, CompiledRules.from_dict(payload["rules"]))
+                self._scripts[script_id] = script
+        return script
+
+    def get_rules(self, script_id):
+        rules = self._rules.get(script_id)
+        if rules is not None:
+            return rules
+        script = self.get_script(script_id)
+        if script is None:
+            return None
+        with self._rules_lock:
+            rules = self._rules.get(script_id)
+            if rules is None:
+                rules = self._rules[script_id] = compile_rules(script)
+        return rules
+
+
+class RoomTransaction:
+    def __init__(self, room):
+        self._room = room
+        self._snapshot = None
+
+    def __enter__(self):
+        self._room._lock.acquire()
+        self._snapshot = self._room._snapshot()
+        return self
+
+    def rollback(self):
+        self._room._restore(self._snapshot)
+
+    def __exit__(self, exc_type, exc, traceback):
+        try:
+            if exc_type is not None:
+                self.rollback()
+        finally:
+            self._room._lock.release()
 
 
 class GameRoom:
-    def __init__(self, script_store):
-        self._lock = threading.Lock()
+    _SNAPSHOT_FIELDS = (
+        "_players",
+        "_next_player_id",
+        "_phase",
+        "_phase_epoch",
+        "_phase_timers",
+        "_auto_close_votes",
+        "_script_id",
+        "_player_count",
+        "_revealed_clues",
+        "_private_clues",
+        "_search_round",
+        "_searches",
+        "_round_searches",
+        "_found_masks",
+        "_public_mask",
+        "_votes",
+        "_vote_counts",
+        "_connected_count",
+        "_result",
+        "_audience_mode",
+        "_audience_votes",
+        "_audience_counts",
+        "_game_log",
+    )
+
+    def __init__(self, script_store, lock=None, history=None):
+        self._lock = lock or threading.RLock()
         self._script_store = script_store
+        self._history = history
         self._players = {}
         self._next_player_id = 1
         self._phase = "Idle"
+        self._phase_epoch = 0
+        self._phase_timers = {}
+        self._auto_close_votes = False
         self._script_id = None
         self._player_count = 4
         self._revealed_clues = {}
+        self._private_clues = {}
+        self._search_round = 0
+        self._searches = {}
+        self._round_searches = 0
+        self._found_masks = {}
+        self._public_mask = 0
         self._votes = {}
+        self._vote_counts = {}
+        self._connected_count = 0
+        self._version = 0
         self._result = None
+        self._audience_mode = False
+        self._audience_votes = {}
+        self._audience_counts = {}
+        self._game_log = None
 
-    def add_player(self, display_name, is_host):
+    def add_player(self, display_name, is_host, elect=False):
         with self._lock:
+            if elect and not is_host:
+                # A table without a GUI host hands the role to whoever joins
+                # while no host is connected. The disconnected hosts give it
+                # up, so one coming back on its resume token is a player.
+                is_host = not any(
+                    player["is_host"] and player["connected"] for player in self._players.values()
+                )
+                if is_host:
+                    for player in self._players.values():
+                        player["is_host"] = False
             player_id = self._next_player_id
             self._next_player_id += 1
             self._players[player_id] = {
@@ -66,19 +400,56 @@ class GameRoom:
                 "is_host": is_host,
                 "connected": True,
                 "current_vote": None,
+                "token": secrets.token_hex(16),
             }
+            self._connected_count += 1
+            self._version += 1
             return player_id
 
+    def player_token(self, player_id):
+        with self._lock:
+            player = self._players.get(player_id)
+            return player["token"] if player else None
+
+    def reclaim_player(self, token):
+        with self._lock:
+            for player_id, player in self._players.items():
+                if player["token"] == token and not player["connected"]:
+                    player["connected"] = True
+                    self._connected_count += 1
+                    self._version += 1
+                    return player_id
+            return None
+
+    def role_payload(self, player_id):
+        with self._lock:
+            player = self._players.get(player_id)
+            script = self._script_store.get_script(self._script_id)
+            if not player or not script or player.get("role_id") is None:
+                return None
+            for role in script.get("roles", []):
+                if role.get("id") == player["role_id"]:
+                    return self._build_role_payload(role, player.get("display_name", ""))
+            return None
+
     def is_host(self, player_id):
         with self._lock:
             player = self._players.get(player_id)
             return bool(player and player.get("is_host"))
 
+    def session_info(self, player_id):
+        with self._lock:
+            player = self._players.get(player_id)
+            return bool(player and player.get("is_host")), self._phase
+
     def remove_player(self, player_id):
         with self._lock:
             player = self._players.get(player_id)
-            if player:
+            if player and player["connected"]:
                 player["connected"] = False
+                self._connected_count -= 1
+                self._close_voting_if_complete()
+                self._version += 1
 
     def set_name(self, player_id, display_name):
         with self._lock:
@@ -87,21 +458,28 @@ class GameRoom:
             player = self._players.get(player_id)
             if player and display_name:
                 player["display_name"] = display_name
+                self._version += 1
                 return True, None
             return False, "Invalid player name"
 
     def set_player_count(self, player_count):
         with self._lock:
             self._player_count = player_count
+            self._version += 1
 
     def select_script(self, script_id):
         with self._lock:
             script = self._script_store.get_script(script_id)
             if not script:
                 return False
+            try:
+                self._script_store.get_rules(script_id)
+            except RulesError:
+                return False
             self._script_id = script_id
             self._reset_round()
-            self._phase = "Configuring"
+            self._set_phase("Configuring")
+            self._version += 1
             return True
 
     def assign_roles(self):
@@ -125,7 +503,9 @@ class GameRoom:
                 player["role_id"] = role.get("id")
                 role_payload = self._build_role_payload(role, player.get("display_name", ""))
                 assigned[player["player_id"]] = role_payload
-            self._phase = "Reading"
+            self._set_phase("Reading")
+            self._game_log = self._start_game_log(script)
+            self._version += 1
             return assigned, None
 
     def advance_phase(self):
@@ -140,37 +520,101 @@ class GameRoom:
             next_phase = transitions.get(self._phase)
             if not next_phase:
                 return False, "Cannot advance phase"
+            if next_phase == "Investigation":
+                self._reset_search()
             if next_phase == "Voting":
                 self._reset_votes()
             if next_phase == "ResultReview":
                 self._result = self._build_result()
-            self._phase = next_phase
+            self._set_phase(next_phase)
+            self._version += 1
             return True, None
 
+    def advance_phase_if(self, epoch):
+        with self._lock:
+            if epoch != self._phase_epoch:
+                return False, "Phase already changed"
+            return self.advance_phase()
+
     def reset_game(self):
         with self._lock:
             self._reset_round()
-            self._phase = "Configuring" if self._script_id else "Idle"
+            self._set_phase("Configuring" if self._script_id else "Idle")
+            self._version += 1
             return True
 
-    def reveal_clue(self, clue_id):
+    def reveal_clue(self, clue_id, player_id=None):
         with self._lock:
             if self._phase != "Investigation":
                 return None, "Not in investigation phase"
             script = self._script_store.get_script(self._script_id)
             if not script:
                 return None, "No script selected"
-            for clue in script.get("clues", []):
-                if clue.get("id") == clue_id:
-                    clue_data = {
-                        "id": clue.get("id"),
-                        "name": clue.get("name", ""),
-                        "type": clue.get("type", "normal"),
-                        "content": clue.get("content", ""),
-                    }
-                    self._revealed_clues[clue_id] = clue_data
-                    return clue_data, None
-            return None, "Invalid clue"
+            rules = self._script_store.get_rules(self._script_id)
+            key = self._search_key(player_id)
+            found_mask = self._found_masks.get(key, 0)
+            visible_mask = self._public_mask | found_mask
+            error = rules.check(
+                clue_id,
+                self._search_round,
+                visible_mask,
+                found_mask,
+                self._searches.get(key, 0),
+                self._round_searches,
+            )
+            if error:
+                return None, error
+            flag = 1 << rules.index[clue_id]
+            if visible_mask & flag:
+                if clue_id in self._revealed_clues:
+                    return self._revealed_clues[clue_id], None
+                return self._private_clues.get(self._role_of(player_id), {}).get(clue_id), None
+            clue = script["clues"][rules.index[clue_id]]
+            clue_data = {
+                "id": clue.get("id"),
+                "name": clue.get("name", ""),
+                "type": clue.get("type", "normal"),
+                "content": clue.get("content", ""),
+            }
+            role_id = self._role_of(player_id)
+            if clue.get("visibility") == "private" and role_id is not None:
+                clue_data["private"] = True
+                self._private_clues.setdefault(role_id, {})[clue_id] = clue_data
+            else:
+                self._revealed_clues[clue_id] = clue_data
+                self._public_mask |= flag
+            self._found_masks[key] = found_mask | flag
+            if self._game_log is not None:
+                self._game_log["clues"].append({
+                    "clue_id": clue_id,
+                    "name": clue_data["name"],
+                    "round": self._search_round,
+                    "role_id": role_id,
+                    "private": bool(clue_data.get("private")),
+                    "at": round(time.time() - self._game_log["started_at"], 3),
+                })
+            self._searches[key] = self._searches.get(key, 0) + 1
+            self._round_searches += 1
+            self._version += 1
+            return clue_data, None
+
+    def advance_search_round(self):
+        with self._lock:
+            if self._phase != "Investigation":
+                return False, "Not in investigation phase"
+            rules = self._script_store.get_rules(self._script_id)
+            if not rules or self._search_round + 1 >= rules.round_count:
+                return False, "Already in the last search round"
+            self._search_round += 1
+            self._searches = {}
+            self._round_searches = 0
+            self._version += 1
+            return True, None
+
+    def available_clues(self, player_id):
+        with self._lock:
+            summary = self._search_summary(self._search_key(player_id))
+            return summary["available_clues"] if summary else []
 
     def submit_vote(self, player_id, target_id):
         with self._lock:
@@ -180,10 +624,147 @@ class GameRoom:
                 return None, "Unknown player"
             if target_id not in self._players:
                 return None, "Invalid vote target"
-            self._votes[player_id] = target_id
+            previous = self._votes.get(player_id)
+            if previous != target_id:
+                if previous is not None:
+                    _decrement(self._vote_counts, previous)
+                self._vote_counts[target_id] = self._vote_counts.get(target_id, 0) + 1
+                self._votes[player_id] = target_id
             self._players[player_id]["current_vote"] = target_id
+            self._close_voting_if_complete()
+            self._version += 1
             return self._build_vote_summary(), None
 
+    def set_phase_timers(self, timers, auto_close_votes):
+        with self._lock:
+            unknown = [phase for phase in timers if phase not in TIMED_PHASES]
+            if unknown:
+                return False, f"Phases cannot be timed: {', '.join(unknown)}"
+            self._phase_timers = {
+                phase: seconds for phase, seconds in timers.items() if seconds > 0
+            }
+            self._auto_close_votes = bool(auto_close_votes)
+            self._close_voting_if_complete()
+            self._version += 1
+            return True, None
+
+    def phase_timer(self):
+        with self._lock:
+            return self._phase_epoch, self._phase, self._phase_timers.get(self._phase)
+
+    def set_audience_mode(self, enabled):
+        with self._lock:
+            self._audience_mode = bool(enabled)
+            if not self._audience_mode:
+                self._audience_votes = {}
+                self._audience_counts = {}
+            self._version += 1
+            return True
+
+    def submit_audience_vote(self, voter_key, target_id):
+        with self._lock:
+            if not self._audience_mode:
+                return False, "Audience voting is off"
+            if self._phase != "Voting":
+                return False, "Not in voting phase"
+            player = self._players.get(voter_key)
+            if player and player.get("role_id") is not None:
+                return False, "Seated players vote with submit_vote"
+            if target_id not in self._players:
+                return False, "Invalid vote target"
+            previous = self._audience_votes.get(voter_key)
+            if previous == target_id:
+                return True, None
+            if previous is not None:
+                _decrement(self._audience_counts, previous)
+            self._audience_counts[target_id] = self._audience_counts.get(target_id, 0) + 1
+            self._audience_votes[voter_key] = target_id
+            self._version += 1
+            return True, None
+
+    def get_audience_tally(self):
+        # (everyone's summary, the host's summary): the counts stay with the
+        # host until the vote closes, like the players' own votes.
+        with self._lock:
+            tally = self._build_audience_summary(include_counts=True)
+            if self._phase != "Voting":
+                return tally, tally
+            return self._build_audience_summary(include_counts=False), tally
+
+    @property
+    def version(self):
+        return self._version
+
+    @property
+    def current_game_id(self):
+        log = self._game_log
+        return log["game_id"] if log is not None else None
+
+    def lobby_summary(self):
+        # What a LAN beacon advertises about the room.
+        with self._lock:
+            script = self._script_store.get_script(self._script_id) if self._script_id else None
+            return {
+                "title": script.get("title", "") if script else "",
+                "phase": self._phase,
+                "players": self._connected_count,
+                "seats": self._player_count,
+            }
+
+    def game_view(self, view):
+        # The view together with the id of the game in progress, read under
+        # one lock so a recorder never files a frame under the wrong game.
+        with self._lock:
+            version, state = self.get_view(view)
+            return self.current_game_id, version, state
+
+    def view_for(self, player_id):
+        with self._lock:
+            player = self._players.get(player_id)
+            if not player:
+                return VIEW_PUBLIC
+            if player.get("is_host"):
+                return VIEW_HOST
+            if player.get("role_id") is not None:
+                return role_view(player["role_id"])
+            return VIEW_PUBLIC
+
+    def views_for(self, player_ids):
+        with self._lock:
+            return {player_id: self.view_for(player_id) for player_id in player_ids}
+
+    def get_view(self, view):
+        with self._lock:
+            if view == VIEW_SPECTATOR:
+                return self._version, self.get_public_state()
+            state = self.get_state()
+            if view == VIEW_HOST:
+                if state["audience"] is not None:
+                    state["audience"] = self._build_audience_summary(include_counts=True)
+                host_id = next(
+                    (player_id for player_id, player in self._players.items() if player["is_host"]),
+                    None,
+                )
+                role_id = self._role_of(host_id)
+                state["private"] = {
+                    "role_id": role_id,
+                    "clues": list(self._private_clues.get(role_id, {}).values()),
+                    "clues_by_role": {
+                        str(role_id): list(clues.values())
+                        for role_id, clues in self._private_clues.items()
+                    },
+                    "search": self._search_summary(self._search_key(host_id)),
+                }
+            elif isinstance(view, tuple) and view[0] == ROLE_VIEW:
+                role_id = view[1]
+                clues = self._private_clues.get(role_id, {})
+                state["private"] = {
+                    "role_id": role_id,
+                    "clues": list(clues.values()),
+                    "search": self._search_summary(role_id),
+                }
+            return self._version, state
+
     def get_state(self):
         with self._lock:
             script = self._script_store.get_script(self._script_id)
@@ -193,6 +774,7 @@ class GameRoom:
                     "id": script.get("id"),
                     "title": script.get("title", ""),
                     "summary": script.get("summary", ""),
+                    "cover": script.get("cover"),
                 }
             clues = self._build_clue_overview(script) if script else []
             revealed_clues = list(self._revealed_clues.values())
@@ -201,6 +783,10 @@ class GameRoom:
             if self._phase in ("Voting", "ResultReview", "Archived"):
                 votes = self._build_vote_summary(include_counts=self._phase != "Voting")
             result = self._result if self._phase in ("ResultReview", "Archived") else None
+            investigation = self._build_investigation_summary()
+            audience = None
+            if self._audience_mode:
+                audience = self._build_audience_summary(include_counts=self._phase != "Voting")
             return {
                 "phase": self._phase,
                 "player_count": self._player_count,
@@ -209,23 +795,229 @@ class GameRoom:
                 "role_cards": role_cards,
                 "clues": clues,
                 "revealed_clues": revealed_clues,
+                "investigation": investigation,
                 "votes": votes,
+                "audience": audience,
                 "result": result,
+                "timers": {
+                    "durations": dict(self._phase_timers),
+                    "auto_close_votes": self._auto_close_votes,
+                },
+            }
+
+    def get_public_state(self):
+        with self._lock:
+            script = self._script_store.get_script(self._script_id)
+            script_info = None
+            if script:
+                script_info = {
+                    "id": script.get("id"),
+                    "title": script.get("title", ""),
+                    "summary": script.get("summary", ""),
+                    "cover": script.get("cover"),
+                }
+            players = [
+                {
+                    "player_id": player.get("player_id"),
+                    "display_name": player.get("display_name"),
+                    "is_host": player.get("is_host"),
+                    "connected": player.get("connected"),
+                }
+                for player in self._players.values()
+            ]
+            role_cards = [
+                {
+                    "player_id": card["player_id"],
+                    "display_name": card["display_name"],
+                    "role_name": card["role_name"],
+                    "role_intro": card["role_intro"],
+                }
+                for card in self._build_role_cards(script)
+            ]
+            votes = None
+            if self._phase in ("Voting", "ResultReview", "Archived"):
+                votes = self._build_vote_summary(include_counts=self._phase != "Voting")
+            audience = None
+            if self._audience_mode:
+                audience = self._build_audience_summary(include_counts=self._phase != "Voting")
+            return {
+                "phase": self._phase,
+                "player_count": self._player_count,
+                "players": players,
+                "script": script_info,
+                "role_cards": role_cards,
+                "revealed_clues": list(self._revealed_clues.values()),
+                "investigation": self._build_investigation_summary(),
+                "votes": votes,
+                "audience": audience,
+                "result": self._result if self._phase in ("ResultReview", "Archived") else None,
             }
 
     def list_scripts(self):
         return self._script_store.list_scripts()
 
+    def transaction(self):
+        return RoomTransaction(self)
+
+    def _snapshot(self):
+        return {name: copy.deepcopy(getattr(self, name)) for name in self._SNAPSHOT_FIELDS}
+
+    def _restore(self, snapshot):
+        for name, value in snapshot.items():
+            setattr(self, name, value)
+        self._version += 1
+
+    def _set_phase(self, phase):
+        log = self._game_log
+        if log is not None:
+            now = time.time()
+            log["phases"].append([self._phase, round(now - log["phase_started"], 3)])
+            log["phase_started"] = now
+        self._phase = phase
+        self._phase_epoch += 1
+        if phase == "Archived" and log is not None:
+            self._game_log = None
+            if self._history is not None:
+                self._history.append(self._finish_game_log(log))
+
+    def _start_game_log(self, script):
+        # What the history archive keeps of one game, filled in as it is
+        # played and written once it reaches Archived.
+        now = time.time()
+        roles = {role.get("id"): role.get("name", "") for role in script.get("roles", [])}
+        return {
+            "game_id": secrets.token_hex(8),
+            "script_id": self._script_id,
+            "title": script.get("title", ""),
+            "culprit": script.get("culprit"),
+            "started_at": now,
+            "phase_started": now,
+            "players": [
+                {
+                    "player_id": player["player_id"],
+                    "display_name": player["display_name"],
+                    "role_id": player["role_id"],
+                    "role_name": roles.get(player["role_id"], ""),
+                    "is_host": player["is_host"],
+                }
+                for player in self._players.values()
+                if player["role_id"] is not None
+            ],
+            "clues": [],
+            "phases": [],
+        }
+
+    def _finish_game_log(self, log):
+        record = dict(log)
+        record.pop("phase_started")
+        record["ended_at"] = time.time()
+        record["votes"] = {str(voter): target for voter, target in self._votes.items()}
+        record["tally"] = {str(target): count for target, count in self._vote_counts.items()}
+        if self._audience_mode:
+            record["audience"] = {
+                str(target): count for target, count in self._audience_counts.items()
+            }
+        top = max(self._vote_counts.values(), default=0)
+        accused = sorted(target for target, count in self._vote_counts.items() if count == top)
+        outcome = {"votes": len(self._votes), "accused": accused if top else []}
+        culprits = [
+            player["player_id"] for player in log["players"] if player["role_id"] == log["culprit"]
+        ]
+        if log["culprit"] is not None and culprits:
+            outcome["correct_votes"] = sum(
+                1 for target in self._votes.values() if target in culprits
+            )
+            # Solved only when the culprit alone drew the most votes.
+            outcome["solved"] = bool(top) and accused == culprits
+        else:
+            outcome["correct_votes"] = None
+            outcome["solved"] = None
+        record["outcome"] = outcome
+        return record
+
+    def _close_voting_if_complete(self):
+        # Vote lock: once every connected player has voted there is nothing
+        # left to wait for, so the room moves on without the host.
+        if self._phase != "Voting" or not self._auto_close_votes:
+            return False
+        if not self._connected_count or len(self._votes) < self._connected_count:
+            return False
+        for player_id, player in self._players.items():
+            if player["connected"] and player_id not in self._votes:
+                return False
+        self._result = self._build_result()
+        self._set_phase("ResultReview")
+        return True
+
     def _reset_round(self):
         self._revealed_clues = {}
+        self._private_clues = {}
+        self._reset_search()
         self._votes = {}
+        self._vote_counts = {}
+        self._audience_votes = {}
+        self._audience_counts = {}
         self._result = None
+        # A game that is reset or replaced before Archived is not recorded.
+        self._game_log = None
         for player in self._players.values():
             player["role_id"] = None
             player["current_vote"] = None
 
+    def _reset_search(self):
+        self._search_round = 0
+        self._searches = {}
+        self._round_searches = 0
+        self._found_masks = {}
+        self._public_mask = self._mask_of_revealed()
+
+    def _mask_of_revealed(self):
+        rules = self._script_store.get_rules(self._script_id) if self._script_id else None
+        if not rules:
+            return 0
+        return rules.mask_of(self._revealed_clues)
+
+    def _role_of(self, player_id):
+        player = self._players.get(player_id)
+        return player.get("role_id") if player else None
+
+    def _search_key(self, player_id):
+        role_id = self._role_of(player_id)
+        if role_id is not None:
+            return role_id
+        return ("player", player_id)
+
+    def _search_summary(self, key):
+        rules = self._script_store.get_rules(self._script_id)
+        if self._phase != "Investigation" or not rules:
+            return None
+        found_mask = self._found_masks.get(key, 0)
+        return {
+            "available_clues": rules.available(
+                self._search_round,
+                self._public_mask | found_mask,
+                found_mask,
+                self._searches.get(key, 0),
+                self._round_searches,
+            ),
+            "player_remaining": rules.player_remaining(
+                self._search_round, self._searches.get(key, 0)
+            ),
+        }
+
+    def _build_investigation_summary(self):
+        if self._phase != "Investigation":
+            return None
+        rules = self._script_store.get_rules(self._script_id)
+        if not rules:
+            return None
+        return rules.describe_round(self._search_round, self._round_searches)
+
     def _reset_votes(self):
         self._votes = {}
+        self._vote_counts = {}
+        self._audience_votes = {}
+        self._audience_counts = {}
         for player in self._players.values():
             player["current_vote"] = None
 
@@ -242,19 +1034,22 @@ class GameRoom:
         return output
 
     def _build_vote_summary(self, include_counts=True):
-        connected_players = [
-            player for player in self._players.values() if player["connected"]
-        ]
         summary = {
             "submitted": len(self._votes),
-            "eligible": len(connected_players),
+            "eligible": self._connected_count,
         }
         if include_counts:
-            counts = {}
-            for target_id in self._votes.values():
-                key = str(target_id)
-                counts[key] = counts.get(key, 0) + 1
-            summary["counts"] = counts
+            summary["counts"] = {
+                str(target_id): count for target_id, count in self._vote_counts.items()
+            }
+        return summary
+
+    def _build_audience_summary(self, include_counts=True):
+        summary = {"enabled": self._audience_mode, "total": len(self._audience_votes)}
+        if include_counts:
+            summary["counts"] = {
+                str(target_id): count for target_id, count in self._audience_counts.items()
+            }
         return summary
 
     def _build_clue_overview(self, script):
@@ -278,6 +1073,7 @@ class GameRoom:
             "truth": script.get("truth", ""),
             "events": script.get("events", []),
             "votes": self._build_vote_summary(include_counts=True),
+            "audience": self._build_audience_summary() if self._audience_mode else None,
         }
 
     def _build_role_payload(self, role, display_name):
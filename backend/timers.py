@@ -0,0 +1,137 @@
+import math
+import threading
+import time
+
+DEFAULT_TICK = 0.05
+DEFAULT_SLOTS = 512
+
+
+class TimerHandle:
+    __slots__ = ("tick", "callback", "args", "active")
+
+    def __init__(self, tick, callback, args):
+        self.tick = tick
+        self.callback = callback
+        self.args = args
+        self.active = True
+
+
+class TimerWheel:
+    # Hashed timing wheel: a timer lands in slot (due tick % slots), so
+    # scheduling and cancelling are O(1) and each tick only looks at one slot.
+    # Timers further out than one revolution simply wait for a later pass.
+    def __init__(self, tick=DEFAULT_TICK, slots=DEFAULT_SLOTS):
+        self.tick = tick
+        self._slots = [set() for _ in range(slots)]
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._origin = time.monotonic()
+        self._current = 0
+        self._pending = 0
+        self._fired = 0
+        self._cancelled = 0
+        self._errors = 0
+        self._thread = None
+
+    def start(self):
+        if self._thread:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if not self._thread:
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(1.0)
+        self._thread = None
+
+    @property
+    def pending(self):
+        return self._pending
+
+    def schedule(self, delay, callback, *args):
+        now = time.monotonic() - self._origin
+        due = now + max(0.0, delay)
+        with self._lock:
+            if not self._pending:
+                # An empty wheel has nothing to catch up on.
+                self._current = max(self._current, int(now / self.tick))
+            tick = max(self._current + 1, math.ceil(due / self.tick))
+            handle = TimerHandle(tick, callback, args)
+            self._slots[tick % len(self._slots)].add(handle)
+            self._pending += 1
+            idle = self._pending == 1
+        if idle:
+            self._wake.set()
+        return handle
+
+    def cancel(self, handle):
+        if handle is None:
+            return False
+        with self._lock:
+            if not handle.active:
+                return False
+            handle.active = False
+            self._slots[handle.tick % len(self._slots)].discard(handle)
+            self._pending -= 1
+            self._cancelled += 1
+        return True
+
+    def advance(self, now=None):
+        # Runs every tick up to `now` and fires what is due; returns the number
+        # of callbacks run.
+        now = time.monotonic() if now is None else now
+        target = int((now - self._origin) / self.tick)
+        fired = 0
+        while True:
+            with self._lock:
+                if self._current >= target:
+                    break
+                if not self._pending:
+                    self._current = target
+                    break
+                self._current += 1
+                slot = self._slots[self._current % len(self._slots)]
+                due = [handle for handle in slot if handle.tick <= self._current]
+                for handle in due:
+                    slot.discard(handle)
+                    handle.active = False
+                self._pending -= len(due)
+                self._fired += len(due)
+            for handle in due:
+                try:
+                    handle.callback(*handle.args)
+                except Exception:
+                    self._errors += 1
+            fired += len(due)
+        return fired
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "pending": self._pending,
+                "fired": self._fired,
+                "cancelled": self._cancelled,
+                "errors": self._errors,
+                "tick": self.tick,
+                "slots": len(self._slots),
+            }
+
+    def _run(self):
+        while not self._stop.is_set():
+            if not self._pending:
+                # Nothing scheduled: sleep until schedule() wakes us instead
+                # of ticking an empty wheel.
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            next_tick = self._origin + (self._current + 1) * self.tick
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                self._wake.wait(delay)
+                self._wake.clear()
+            self.advance()
@@ -0,0 +1,58 @@
+import argparse
+import json
+import sys
+
+DEFAULT_THRESHOLD = 0.10
+
+
+def _key(result):
+    params = ",".join(f"{key}={value}" for key, value in sorted(result["params"].items()))
+    return f"{result['name']}[{params}]"
+
+
+def load_results(path):
+    with open(path, "r", encoding="utf-8") as handle:
+        report = json.load(handle)
+    return report, {_key(result): result for result in report.get("results", [])}
+
+
+def compare(baseline, candidate, metric="best_us"):
+    rows = []
+    for key, new in candidate.items():
+        old = baseline.get(key)
+        if not old or not old.get(metric):
+            continue
+        rows.append((key, old[metric], new[metric], new[metric] / old[metric] - 1.0))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--metric", default="best_us", choices=("best_us", "median_us"))
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="relative slowdown that counts as a regression (default 0.10)")
+    args = parser.parse_args(argv)
+
+    base_report, baseline = load_results(args.baseline)
+    new_report, candidate = load_results(args.candidate)
+    print(f"baseline {base_report.get('revision')}  candidate {new_report.get('revision')}")
+    regressions = 0
+    for key, old, new, change in compare(baseline, candidate, args.metric):
+        flag = ""
+        if change > args.threshold:
+            flag = "REGRESSION"
+            regressions += 1
+        elif change < -args.threshold:
+            flag = "faster"
+        print(f"{key:<80} {old:>12.2f} -> {new:>12.2f} us  {change * 100:+7.1f}%  {flag}")
+    missing = sorted(set(baseline) - set(candidate))
+    for key in missing:
+        print(f"{key:<80} missing from candidate")
+    print(f"{regressions} regression(s) over {args.threshold * 100:.0f}%")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+import argparse
+import json
+import sys
+import threading
+import time
+
+from backend.discovery import MULTICAST_GROUP, discover_hosts
+from backend.server import GameServer
+from benchmarks.search_bench import _percentile
+
+
+def run(clients, seconds, timeout, scripts_path):
+    server = GameServer("127.0.0.1", 0, scripts_path, discovery_port=0)
+    server.start()
+    port = server._discovery.port
+    latencies = []
+    misses = [0]
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def prober():
+        # Each scan is a fresh socket, as a start page opening would be.
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            first = []
+            discover_hosts(
+                timeout=timeout,
+                port=port,
+                targets=(MULTICAST_GROUP, "127.0.0.1"),
+                on_found=lambda _beacon: first.append(time.perf_counter() - start),
+            )
+            with lock:
+                if first:
+                    latencies.append(first[0])
+                else:
+                    misses[0] += 1
+
+    threads = [threading.Thread(target=prober, daemon=True) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = server._discovery.snapshot()
+    server.stop()
+    return {
+        "clients": clients,
+        "seconds": seconds,
+        "scans": len(latencies) + misses[0],
+        "missed": misses[0],
+        "first_reply_p50_ms": _percentile(latencies, 0.5) * 1000,
+        "first_reply_p99_ms": _percentile(latencies, 0.99) * 1000,
+        "probes": stats["probes"],
+        "replies": stats["replies"],
+        "responder_us_per_probe": stats["busy_ms"] * 1000 / max(1, stats["probes"]),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="LAN discovery under many probing clients")
+    parser.add_argument("--clients", type=int, default=40)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--timeout", type=float, default=0.05, help="per-scan wait")
+    parser.add_argument("--scripts", default="data/scripts")
+    parser.add_argument("--json", metavar="PATH", help="also write the result as JSON")
+    args = parser.parse_args(argv)
+
+    result = run(args.clients, args.seconds, args.timeout, args.scripts)
+    print(f"{result['clients']} clients, {result['scans']} scans in {result['seconds']:.0f}s, "
+          f"{result['missed']} without a reply")
+    print(f"first reply p50 {result['first_reply_p50_ms']:.2f} ms  "
+          f"p99 {result['first_reply_p99_ms']:.2f} ms")
+    print(f"responder: {result['probes']} probes, {result['replies']} replies, "
+          f"{result['responder_us_per_probe']:.1f} us per probe")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump(result, handle, indent=2)
+    return 0 if not result["missed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+from backend.server import GameServer
+from benchmarks.state_bench import _format_line, _git_revision, measure
+from benchmarks.synthetic import load_sample_script
+
+MESSAGES = [
+    ("noop", {"type": "noop"}),
+    ("unknown", {"type": "no_such_message"}),
+    ("ping", {"type": "ping"}),
+    ("stats", {"type": "stats"}),
+    ("set_player_count", {"type": "set_player_count", "player_count": 5}),
+    ("set_player_count:invalid", {"type": "set_player_count", "player_count": "x"}),
+    ("submit_vote:wrong_phase", {"type": "submit_vote", "target_id": 1}),
+    ("request_clue:missing", {"type": "request_clue"}),
+    ("select_script:not_host", {"type": "select_script", "script_id": "script_001"}),
+]
+
+
+class NullHandler:
+    def __init__(self):
+        self.player_id = None
+        self.frames = 0
+
+    def send(self, message):
+        self.frames += 1
+
+    def send_raw(self, data):
+        self.frames += 1
+
+    def send_nowait(self, data):
+        self.frames += 1
+        return True
+
+
+def build_server(scripts_path):
+    server = GameServer("127.0.0.1", 0, scripts_path)
+    server.register_message("noop", lambda context: None)
+    host = NullHandler()
+    player = NullHandler()
+    server.handle_message(host, {"type": "connect", "display_name": "Host", "is_host": True})
+    server.handle_message(player, {"type": "connect", "display_name": "Player"})
+    return server, host, player
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-message dispatch cost of GameServer")
+    parser.add_argument("--output", help="write results as JSON (benchmarks.compare format)")
+    args = parser.parse_args(argv)
+
+    results = []
+    with tempfile.TemporaryDirectory() as path:
+        with open(os.path.join(path, "sample.json"), "w", encoding="utf-8") as handle:
+            json.dump(load_sample_script(), handle, ensure_ascii=False)
+        server, host, player = build_server(path)
+        for name, message in MESSAGES:
+            sender = player if name.endswith("not_host") else host
+            stats = measure(lambda: server.handle_message(sender, message))
+            params = {"message": name}
+            results.append({"name": "GameServer.handle_message", "params": params, **stats})
+            print(_format_line("GameServer.handle_message", params, stats), flush=True)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump({"revision": _git_revision(), "results": results}, handle, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,449 @@
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import socket
+import sys
+import threading
+import time
+from collections import deque
+
+from backend.protocol import encode_message
+
+DEFAULT_SCRIPTS_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "scripts"
+)
+RESPONSE_TIMEOUT = 10.0
+PING = encode_message({"type": "ping"})
+# Pending entries answered by a pong: plain pings, the ping fencing a state
+# request, and a fenced request that failed and records no sample.
+PONG_EXPECTS = ("pong", "fence", "failed")
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def summarize(values):
+    return {
+        "count": len(values),
+        "p50_ms": percentile(values, 0.50) * 1000.0,
+        "p95_ms": percentile(values, 0.95) * 1000.0,
+        "p99_ms": percentile(values, 0.99) * 1000.0,
+        "max_ms": (max(values) if values else 0.0) * 1000.0,
+    }
+
+
+def _serve(
+    scripts_path,
+    conn,
+    enable_metrics=False,
+    rate_limits=False,
+    max_connections=0,
+    max_spectators=0,
+):
+    from backend.server import GameServer
+
+    server = GameServer(
+        "127.0.0.1",
+        0,
+        scripts_path,
+        enable_metrics=enable_metrics,
+        rate_limits=None if rate_limits else False,
+        max_connections=max_connections,
+        max_spectators=max_spectators,
+    )
+    server.start()
+    conn.send(server.address[1])
+    conn.recv()
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    conn.send("measuring")
+    conn.recv()
+    conn.send({
+        "cpu_seconds": time.process_time() - cpu_start,
+        "wall_seconds": time.perf_counter() - wall_start,
+    })
+    server.stop()
+
+
+class BotClient:
+    def __init__(self, host, port, name, is_host=False):
+        self.name = name
+        self.is_host = is_host
+        self.player_id = None
+        self.scripts = []
+        self.state = {}
+        self.stats = None
+        self.frames = 0
+        self.bytes_received = 0
+        self.bytes_sent = 0
+        self.errors = 0
+        self.throttled = 0
+        self.latencies = {}
+        self._pending = deque()
+        self._state_at = 0.0
+        self._cond = threading.Condition()
+        self._socket = socket.create_connection((host, port), timeout=RESPONSE_TIMEOUT)
+        self._socket.settimeout(None)
+        self._reader = threading.Thread(target=self._read_loop, daemon=True)
+        self._reader.start()
+
+    def request(self, message, expect="state"):
+        raw = encode_message(message)
+        if expect == "state":
+            # Other bots' requests broadcast state too, so a state frame does
+            # not say whose request it answers. The server handles a
+            # connection's requests in order and sends this bot the resulting
+            # state before reading further, so the pong to a ping sent right
+            # behind the request closes the sample: it is taken at the last
+            # state frame before that pong, which is this request's or later.
+            raw += PING
+            expect = "fence"
+        with self._cond:
+            self._pending.append((message.get("type"), expect, time.perf_counter()))
+        self._socket.sendall(raw)
+        self.bytes_sent += len(raw)
+
+    def sync(self, timeout=RESPONSE_TIMEOUT):
+        # Requests on one connection are handled in order, so a pong means
+        # every earlier request has been processed by the server.
+        with self._cond:
+            self._pending.append((None, "pong", time.perf_counter()))
+        self._socket.sendall(PING)
+        return self.wait_idle(timeout)
+
+    def wait_idle(self, timeout=RESPONSE_TIMEOUT):
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def wait_for(self, predicate, timeout=RESPONSE_TIMEOUT):
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while not predicate(self):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self):
+        try:
+            self._socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._socket.close()
+
+    def _read_loop(self):
+        buffer = b""
+        while True:
+            try:
+                data = self._socket.recv(65536)
+            except OSError:
+                break
+            if not data:
+                break
+            self.bytes_received += len(data)
+            buffer += data
+            while b"\n" in buffer:
+                line, buffer = buffer.split(b"\n", 1)
+                if line:
+                    self._on_frame(json.loads(line.decode("utf-8")))
+        with self._cond:
+            self._pending.clear()
+            self._cond.notify_all()
+
+    def _on_frame(self, message):
+        now = time.perf_counter()
+        message_type = message.get("type")
+        with self._cond:
+            self.frames += 1
+            if message_type == "welcome":
+                self.player_id = message.get("player_id")
+            elif message_type == "scripts":
+                self.scripts = message.get("scripts", [])
+            elif message_type == "state":
+                self.state = message.get("state", {})
+                self._state_at = now
+            elif message_type == "stats":
+                self.stats = message.get("stats")
+            if message_type == "error":
+                self.errors += 1
+                self._fail(message.get("request_type"))
+            elif message_type == "throttled":
+                self.throttled += 1
+                self._drop(message.get("request_type"))
+            elif message_type == "pong":
+                self._complete_pong(now)
+            elif message_type != "state":
+                self._complete(message_type, now)
+            self._cond.notify_all()
+
+    def _complete(self, expect, now):
+        for index, entry in enumerate(self._pending):
+            if entry[1] == expect:
+                del self._pending[index]
+                self._record(entry, now)
+                return
+
+    def _complete_pong(self, now):
+        # Pongs come back in the order the pings were sent.
+        for index, entry in enumerate(self._pending):
+            if entry[1] in PONG_EXPECTS:
+                del self._pending[index]
+                if entry[1] == "fence" and self._state_at > entry[2]:
+                    self._record(entry, self._state_at)
+                elif entry[1] != "failed":
+                    self._record(entry, now)
+                return
+
+    def _fail(self, request_type):
+        # Errors name the request they answer, and a connection's replies
+        # come in order, so the oldest open request of that type failed. A
+        # fenced one still gets its ping answered; only the sample is dropped.
+        # An error without a type cannot be placed and fails nothing.
+        if request_type is None:
+            return
+        for index, entry in enumerate(self._pending):
+            if entry[0] != request_type or entry[1] == "failed":
+                continue
+            if entry[1] == "fence":
+                self._pending[index] = (entry[0], "failed", entry[2])
+            else:
+                del self._pending[index]
+            return
+
+    def _drop(self, request_type):
+        if request_type != "ping":
+            self._fail(request_type)
+            return
+        for index, entry in enumerate(self._pending):
+            # Refusing a fence ping loses the sample of its request too.
+            if entry[1] in PONG_EXPECTS:
+                del self._pending[index]
+                return
+
+    def _record(self, entry, now):
+        request_type, _, sent_at = entry
+        if request_type is not None:
+            self.latencies.setdefault(request_type, []).append(now - sent_at)
+
+
+def _in_phase(phase):
+    return lambda bot: bot.state.get("phase") == phase
+
+
+def _player_actions(bot, clue_requests, pings, clues_done, vote_ready, rng):
+    bot.wait_for(_in_phase("Investigation"))
+    clues = [clue.get("id") for clue in bot.state.get("clues", [])]
+    for _ in range(clue_requests):
+        if clues:
+            bot.request({"type": "request_clue", "clue_id": rng.choice(clues)})
+        for _ in range(pings):
+            bot.request({"type": "ping"}, expect="pong")
+    bot.sync()
+    clues_done.set()
+    vote_ready.wait(RESPONSE_TIMEOUT)
+    bot.wait_for(_in_phase("Voting"))
+    targets = [player.get("player_id") for player in bot.state.get("players", [])]
+    if targets:
+        bot.request({"type": "submit_vote", "target_id": rng.choice(targets)})
+    bot.sync()
+
+
+def run_game(host, port, player_count, clue_requests, pings, seed, room=None):
+    rng = random.Random(seed)
+    extra = {"room": room} if room else {}
+    host_bot = BotClient(host, port, "Host bot", is_host=True)
+    host_bot.request(
+        {"type": "connect", "display_name": host_bot.name, "is_host": True, **extra}
+    )
+    host_bot.wait_idle()
+    bots = [host_bot]
+    for index in range(1, player_count):
+        bot = BotClient(host, port, f"Bot {index}")
+        bot.request({"type": "connect", "display_name": bot.name, "is_host": False, **extra})
+        bot.request({"type": "set_name", "display_name": f"{bot.name}*"})
+        bots.append(bot)
+    for bot in bots:
+        bot.sync()
+    host_bot.wait_for(lambda bot: len(bot.state.get("players", [])) >= player_count)
+
+    scripts = [item for item in host_bot.scripts if item.get("role_count", 0) >= 4]
+    if not scripts:
+        raise RuntimeError("No playable script available on the server")
+    script = scripts[0]
+    seats = max(4, min(6, player_count, script.get("role_count", 0)))
+    host_bot.request({"type": "select_script", "script_id": script["id"]})
+    host_bot.request({"type": "set_player_count", "player_count": seats})
+    host_bot.request({"type": "assign_roles"})
+    host_bot.request({"type": "advance_phase"})
+    host_bot.sync()
+
+    vote_ready = threading.Event()
+    workers = []
+    clues_done = []
+    for bot in bots:
+        done = threading.Event()
+        worker = threading.Thread(
+            target=_player_actions,
+            args=(bot, clue_requests, pings, done, vote_ready, random.Random(rng.random())),
+            daemon=True,
+        )
+        worker.start()
+        workers.append(worker)
+        clues_done.append(done)
+    for done in clues_done:
+        done.wait(RESPONSE_TIMEOUT * 2)
+    host_bot.request({"type": "advance_phase"})
+    host_bot.sync()
+    vote_ready.set()
+    for worker in workers:
+        worker.join(RESPONSE_TIMEOUT * 2)
+    for _ in ("ResultReview", "Archived"):
+        host_bot.request({"type": "advance_phase"})
+        host_bot.sync()
+    host_bot.request({"type": "stats"}, expect="stats")
+    host_bot.sync()
+    return bots
+
+
+def build_report(bots, server_stats, elapsed):
+    latencies = {}
+    for bot in bots:
+        for request_type, values in bot.latencies.items():
+            latencies.setdefault(request_type, []).extend(values)
+    all_values = [value for values in latencies.values() for value in values]
+    report = {
+        "clients": len(bots),
+        "elapsed_seconds": elapsed,
+        "latency": {"all": summarize(all_values)},
+        "per_client": {
+            "frames_mean": sum(bot.frames for bot in bots) / len(bots),
+            "frames_max": max(bot.frames for bot in bots),
+            "bytes_received_mean": sum(bot.bytes_received for bot in bots) / len(bots),
+            "bytes_received_max": max(bot.bytes_received for bot in bots),
+            "bytes_sent_mean": sum(bot.bytes_sent for bot in bots) / len(bots),
+        },
+        "errors": sum(bot.errors for bot in bots),
+        "throttled": sum(bot.throttled for bot in bots),
+    }
+    for request_type, values in sorted(latencies.items()):
+        if request_type == "stats":
+            continue
+        report["latency"][request_type] = summarize(values)
+    if bots[0].stats and bots[0].stats.get("enabled"):
+        report["server_metrics"] = bots[0].stats
+    if bots[0].stats and bots[0].stats.get("throttled"):
+        report["server_throttled"] = bots[0].stats["throttled"]
+    if server_stats:
+        wall = server_stats["wall_seconds"] or 1.0
+        report["server_cpu"] = {
+            "cpu_seconds": server_stats["cpu_seconds"],
+            "wall_seconds": server_stats["wall_seconds"],
+            "utilization": server_stats["cpu_seconds"] / wall,
+        }
+    return report
+
+
+def print_report(report):
+    print(f"clients: {report['clients']}  elapsed: {report['elapsed_seconds']:.2f}s  "
+          f"errors: {report['errors']}  throttled: {report['throttled']}")
+    print(f"{'request':>18} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for request_type, stats in report["latency"].items():
+        print(f"{request_type:>18} {stats['count']:>7} {stats['p50_ms']:>9.2f} "
+              f"{stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f} {stats['max_ms']:>9.2f}")
+    per_client = report["per_client"]
+    print(f"frames/client: mean {per_client['frames_mean']:.1f}, max {per_client['frames_max']}")
+    print(f"bytes/client: received mean {per_client['bytes_received_mean']:.0f}, "
+          f"max {per_client['bytes_received_max']}, sent mean {per_client['bytes_sent_mean']:.0f}")
+    metrics = report.get("server_metrics")
+    if metrics:
+        print(f"{'server handle':>18} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+        rows = dict(metrics["messages"])
+        rows["lock wait"] = metrics["locks"].get("room", {}).get("wait", {})
+        rows["lock hold"] = metrics["locks"].get("room", {}).get("hold", {})
+        rows["serialize"] = metrics["serialize"]
+        rows["fanout"] = metrics["fanout"]
+        for name, stats in rows.items():
+            if not stats:
+                continue
+            print(f"{name:>18} {stats['count']:>7} {stats['p50'] * 1000:>9.3f} "
+                  f"{stats['p95'] * 1000:>9.3f} {stats['p99'] * 1000:>9.3f} {stats['max'] * 1000:>9.3f}")
+    for session_key, counters in sorted(report.get("server_throttled", {}).items()):
+        text = ", ".join(f"{name}={count}" for name, count in sorted(counters.items()))
+        print(f"throttled session {session_key}: {text}")
+    if "server_cpu" in report:
+        cpu = report["server_cpu"]
+        print(f"server cpu: {cpu['cpu_seconds']:.3f}s over {cpu['wall_seconds']:.3f}s "
+              f"({cpu['utilization'] * 100:.1f}%)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulated-player load test for GameServer")
+    parser.add_argument("--clients", type=int, default=6)
+    parser.add_argument("--clue-requests", type=int, default=20)
+    parser.add_argument("--pings", type=int, default=2)
+    parser.add_argument("--scripts", default=DEFAULT_SCRIPTS_PATH)
+    parser.add_argument("--connect", metavar="HOST:PORT",
+                        help="target an already running server instead of spawning one")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--server-metrics", action="store_true",
+                        help="enable server instrumentation and include its stats in the report")
+    parser.add_argument("--rate-limits", action="store_true",
+                        help="run the spawned server with its default per-session rate limits")
+    parser.add_argument("--json", metavar="PATH", help="also write the report as JSON")
+    args = parser.parse_args(argv)
+    if args.clients < 4:
+        parser.error("--clients must be at least 4")
+
+    server_process = None
+    parent_conn = None
+    if args.connect:
+        host, _, port = args.connect.rpartition(":")
+        port = int(port)
+    else:
+        host = "127.0.0.1"
+        parent_conn, child_conn = multiprocessing.Pipe()
+        server_process = multiprocessing.Process(
+            target=_serve,
+            args=(args.scripts, child_conn, args.server_metrics, args.rate_limits),
+            daemon=True,
+        )
+        server_process.start()
+        port = parent_conn.recv()
+        parent_conn.send("start")
+        parent_conn.recv()
+
+    start = time.perf_counter()
+    bots = run_game(host, port, args.clients, args.clue_requests, args.pings, args.seed)
+    elapsed = time.perf_counter() - start
+    server_stats = None
+    if server_process:
+        parent_conn.send("stop")
+        server_stats = parent_conn.recv()
+        server_process.join(5)
+    for bot in bots:
+        bot.close()
+
+    report = build_report(bots, server_stats, elapsed)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
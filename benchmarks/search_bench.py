@@ -0,0 +1,151 @@
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+from backend.state import ScriptStore
+from benchmarks.synthetic import load_sample_script, make_script
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def _alphabet(base, size):
+    # Characters of the sample script first, most frequent first, then the
+    # rest of the common ideograph block, so drawing with Zipf weights gives
+    # a library whose character frequencies look like real prose.
+    counts = {}
+    texts = [base.get("summary", ""), base.get("truth", "")]
+    texts.extend(role.get("story", "") for role in base.get("roles", []))
+    for text in texts:
+        for char in text:
+            if "一" <= char <= "鿿":
+                counts[char] = counts.get(char, 0) + 1
+    alphabet = sorted(counts, key=lambda char: -counts[char])
+    seen = set(alphabet)
+    code = 0x4E00
+    while len(alphabet) < size:
+        if chr(code) not in seen:
+            alphabet.append(chr(code))
+        code += 1
+    return alphabet[:size]
+
+
+class _Text:
+    def __init__(self, rng, alphabet):
+        self._rng = rng
+        self._alphabet = alphabet
+        self._weights = [1.0 / (rank + 1) for rank in range(len(alphabet))]
+
+    def __call__(self, low, high):
+        length = self._rng.randint(low, high)
+        return "".join(self._rng.choices(self._alphabet, self._weights, k=length))
+
+
+def write_varied_library(path, script_count, seed, alphabet_size=3500):
+    # Returns the titles and names written, which queries are drawn from.
+    base = load_sample_script()
+    text = _Text(random.Random(seed), _alphabet(base, alphabet_size))
+    names = []
+    os.makedirs(path, exist_ok=True)
+    for index in range(script_count):
+        script_id = f"search_{index:05d}"
+        script = make_script(script_id=script_id, clue_count=8, event_count=2, base=base)
+        script["title"] = text(4, 10)
+        script["summary"] = text(40, 120)
+        for role in script["roles"]:
+            role["name"] = text(2, 4)
+        for clue in script["clues"]:
+            clue["name"] = text(3, 6)
+        names.append(script["title"])
+        names.extend(role["name"] for role in script["roles"])
+        names.extend(clue["name"] for clue in script["clues"])
+        with open(os.path.join(path, f"{script_id}.json"), "w", encoding="utf-8") as handle:
+            json.dump(script, handle, ensure_ascii=False)
+    return names
+
+
+def _query(rng, names):
+    name = rng.choice(names)
+    length = rng.randint(1, min(4, len(name)))
+    start = rng.randrange(0, len(name) - length + 1)
+    return name[start:start + length]
+
+
+def run(script_count, queries, seed):
+    rng = random.Random(seed + 1)
+    with tempfile.TemporaryDirectory() as path:
+        names = write_varied_library(path, script_count, seed)
+        start = time.perf_counter()
+        store = ScriptStore(path)
+        load_seconds = time.perf_counter() - start
+        terms = [_query(rng, names) for _ in range(queries)]
+        hits = 0
+        cold = []
+        paged = []
+        for term in terms:
+            start = time.perf_counter()
+            total, _ = store.search_scripts(term)
+            cold.append(time.perf_counter() - start)
+            hits += bool(total)
+            start = time.perf_counter()
+            store.search_scripts(term, offset=20)
+            paged.append(time.perf_counter() - start)
+        # One edited file: only that script is re-read and re-indexed.
+        target = os.path.join(path, "search_00000.json")
+        with open(target, "r", encoding="utf-8") as handle:
+            script = json.load(handle)
+        script["title"] = "重新命名的剧本"
+        with open(target, "w", encoding="utf-8") as handle:
+            json.dump(script, handle, ensure_ascii=False)
+        os.utime(target, ns=(time.time_ns(), time.time_ns() + 1))
+        start = time.perf_counter()
+        store.refresh()
+        refresh_seconds = time.perf_counter() - start
+        found = store.search_scripts("重新命名")[1]
+        stats = store.search_stats()
+    return {
+        "scripts": script_count,
+        "tokens": stats["tokens"],
+        "load_ms": load_seconds * 1000,
+        "queries": queries,
+        "hit_rate": hits / max(1, queries),
+        "query_p50_us": _percentile(cold, 0.5) * 1e6,
+        "query_p99_us": _percentile(cold, 0.99) * 1e6,
+        "page_p50_us": _percentile(paged, 0.5) * 1e6,
+        "refresh_ms": refresh_seconds * 1000,
+        "refresh_found": bool(found) and found[0]["id"] == "search_00000",
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Script library search index latency")
+    parser.add_argument("--scripts", type=int, default=10000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", metavar="PATH", help="also write the result as JSON")
+    args = parser.parse_args(argv)
+
+    result = run(args.scripts, args.queries, args.seed)
+    print(f"{result['scripts']} scripts, {result['tokens']} tokens, "
+          f"loaded and indexed in {result['load_ms']:.0f} ms")
+    print(f"{result['queries']} queries ({result['hit_rate']:.0%} with hits): "
+          f"p50 {result['query_p50_us']:.1f} us  p99 {result['query_p99_us']:.1f} us  "
+          f"next page p50 {result['page_p50_us']:.1f} us")
+    print(f"refresh after one edit {result['refresh_ms']:.1f} ms "
+          f"({'indexed' if result['refresh_found'] else 'NOT indexed'})")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump(result, handle, indent=2)
+    return 0 if result["refresh_found"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
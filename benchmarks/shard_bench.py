@@ -0,0 +1,93 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.loadtest import run_game
+from benchmarks.synthetic import write_library
+
+
+def _serve_sharded(scripts_path, workers, conn):
+    from backend.sharding import ShardedServer
+
+    server = ShardedServer("127.0.0.1", 0, scripts_path, workers=workers, rate_limits=False)
+    server.start()
+    conn.send(server.address[1])
+    conn.recv()
+    conn.send(server.stats())
+    server.stop()
+
+
+def _play_room(task):
+    port, room, clients, clue_requests, seed = task
+    start = time.perf_counter()
+    bots = run_game("127.0.0.1", port, clients, clue_requests, 0, seed, room=room)
+    elapsed = time.perf_counter() - start
+    errors = sum(bot.errors for bot in bots)
+    phase = bots[0].state.get("phase")
+    for bot in bots:
+        bot.close()
+    return {"room": room, "seconds": elapsed, "errors": errors, "phase": phase}
+
+
+def run(scripts_path, workers, rooms, clients, clue_requests):
+    parent_conn, child_conn = multiprocessing.Pipe()
+    server_process = multiprocessing.Process(
+        target=_serve_sharded, args=(scripts_path, workers, child_conn)
+    )
+    server_process.start()
+    port = parent_conn.recv()
+    tasks = [(port, f"room-{index}", clients, clue_requests, index) for index in range(rooms)]
+    with multiprocessing.Pool(min(rooms, os.cpu_count() or 1)) as pool:
+        start = time.perf_counter()
+        games = pool.map(_play_room, tasks)
+        elapsed = time.perf_counter() - start
+    parent_conn.send("stop")
+    stats = parent_conn.recv()
+    server_process.join(5)
+    return {
+        "workers": workers,
+        "rooms": rooms,
+        "elapsed_seconds": elapsed,
+        "games_per_second": rooms / elapsed if elapsed else 0.0,
+        "errors": sum(game["errors"] for game in games),
+        "unfinished": sum(1 for game in games if game["phase"] != "Archived"),
+        "rooms_per_worker": [len(worker.get("rooms", [])) for worker in stats["workers"]],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent rooms on a sharded server")
+    parser.add_argument("--workers", type=int, action="append",
+                        help="worker counts to compare (default: 1 and the CPU count)")
+    parser.add_argument("--rooms", type=int, default=8)
+    parser.add_argument("--clients", type=int, default=6)
+    parser.add_argument("--clue-requests", type=int, default=40)
+    parser.add_argument("--clues", type=int, default=200,
+                        help="clues per synthetic script, to make state serialization heavier")
+    parser.add_argument("--json", metavar="PATH", help="also write the results as JSON")
+    args = parser.parse_args(argv)
+    worker_counts = args.workers or sorted({1, os.cpu_count() or 1})
+
+    results = []
+    with tempfile.TemporaryDirectory() as path:
+        write_library(path, 1, role_count=6, clue_count=args.clues)
+        for workers in worker_counts:
+            result = run(path, workers, args.rooms, args.clients, args.clue_requests)
+            results.append(result)
+            print(f"workers {workers:>3}  rooms {args.rooms:>3}  "
+                  f"elapsed {result['elapsed_seconds']:.2f}s  "
+                  f"games/s {result['games_per_second']:.2f}  "
+                  f"errors {result['errors']}  unfinished {result['unfinished']}  "
+                  f"rooms/worker {result['rooms_per_worker']}", flush=True)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump({"results": results}, handle, indent=2)
+    return 0 if all(not result["errors"] and not result["unfinished"] for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+import argparse
+import json
+import multiprocessing
+import sys
+import time
+
+from benchmarks.loadtest import (
+    DEFAULT_SCRIPTS_PATH,
+    RESPONSE_TIMEOUT,
+    BotClient,
+    _serve,
+    build_report,
+    run_game,
+)
+
+
+def _serve_relay(upstream_port, conn):
+    from backend.relay import RelayServer
+
+    relay = RelayServer("127.0.0.1", upstream_port, host="127.0.0.1", port=0, max_spectators=0)
+    relay.start()
+    relay.connected.wait(RESPONSE_TIMEOUT)
+    conn.send(relay.address[1])
+    conn.recv()
+    conn.send(relay.snapshot())
+    relay.stop()
+
+
+def connect_watchers(host, port, count, as_players):
+    watchers = []
+    for index in range(count):
+        bot = BotClient(host, port, f"Watcher {index + 1}")
+        if as_players:
+            message = {"type": "connect", "display_name": bot.name}
+        else:
+            message = {"type": "connect", "display_name": bot.name, "spectator": True}
+        bot.request(message, expect="welcome")
+        watchers.append(bot)
+    for bot in watchers:
+        bot.wait_idle()
+    return watchers
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fan-out cost of many read-only watchers")
+    parser.add_argument("--spectators", type=int, default=300)
+    parser.add_argument("--clients", type=int, default=6, help="seated players (host included)")
+    parser.add_argument("--clue-requests", type=int, default=20)
+    parser.add_argument("--scripts", default=DEFAULT_SCRIPTS_PATH)
+    parser.add_argument("--as-players", action="store_true",
+                        help="connect watchers as ordinary players for comparison")
+    parser.add_argument("--relay", action="store_true",
+                        help="attach spectators to a relay process instead of the host")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", metavar="PATH", help="also write the report as JSON")
+    args = parser.parse_args(argv)
+    if args.clients < 4:
+        parser.error("--clients must be at least 4")
+    if args.relay and args.as_players:
+        parser.error("--relay only carries spectators")
+
+    parent_conn, child_conn = multiprocessing.Pipe()
+    server_process = multiprocessing.Process(
+        target=_serve,
+        args=(args.scripts, child_conn, True, False, 0, 0),
+        daemon=True,
+    )
+    server_process.start()
+    host = "127.0.0.1"
+    port = parent_conn.recv()
+    watch_port = port
+    relay_process = None
+    if args.relay:
+        relay_conn, relay_child_conn = multiprocessing.Pipe()
+        relay_process = multiprocessing.Process(
+            target=_serve_relay, args=(port, relay_child_conn), daemon=True
+        )
+        relay_process.start()
+        watch_port = relay_conn.recv()
+    watchers = connect_watchers(host, watch_port, args.spectators, args.as_players)
+    parent_conn.send("start")
+    parent_conn.recv()
+
+    start = time.perf_counter()
+    bots = run_game(host, port, args.clients, args.clue_requests, 0, args.seed)
+    elapsed = time.perf_counter() - start
+    finished = time.perf_counter()
+    caught_up = sum(
+        1 for bot in watchers
+        if bot.wait_for(lambda bot: bot.state.get("phase") == "Archived", RESPONSE_TIMEOUT)
+    )
+    lag = time.perf_counter() - finished
+    parent_conn.send("stop")
+    server_stats = parent_conn.recv()
+    server_process.join(5)
+    relay_stats = None
+    if relay_process:
+        relay_conn.send("stop")
+        relay_stats = relay_conn.recv()
+        relay_process.join(5)
+    for bot in bots + watchers:
+        bot.close()
+
+    report = build_report(bots, server_stats, elapsed)
+    report["watchers"] = {
+        "count": len(watchers),
+        "mode": "players" if args.as_players else "relay" if args.relay else "spectators",
+        "caught_up": caught_up,
+        "catch_up_seconds": lag,
+        "frames_mean": sum(bot.frames for bot in watchers) / max(1, len(watchers)),
+        "bytes_received_mean": sum(bot.bytes_received for bot in watchers) / max(1, len(watchers)),
+        "errors": sum(bot.errors for bot in watchers),
+    }
+    if relay_stats:
+        report["watchers"]["relay"] = relay_stats
+    if bots[0].stats:
+        report["watchers"]["server"] = bots[0].stats.get("spectators")
+        report["watchers"]["state_bytes_p50"] = bots[0].stats["state_bytes"]["p50"]
+
+    watchers_report = report["watchers"]
+    latency = report["latency"]["all"]
+    cpu = report["server_cpu"]
+    print(f"{watchers_report['count']} watchers as {watchers_report['mode']}, "
+          f"{report['clients']} players, elapsed {elapsed:.2f}s")
+    print(f"player latency: p50 {latency['p50_ms']:.2f} ms  p95 {latency['p95_ms']:.2f} ms  "
+          f"p99 {latency['p99_ms']:.2f} ms")
+    print(f"server cpu: {cpu['cpu_seconds']:.3f}s ({cpu['utilization'] * 100:.1f}%)")
+    print(f"watchers caught up: {caught_up}/{len(watchers)} after {lag * 1000:.1f} ms; "
+          f"frames mean {watchers_report['frames_mean']:.1f}, "
+          f"bytes mean {watchers_report['bytes_received_mean']:.0f}, "
+          f"errors {watchers_report['errors'] + report['errors']}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+    return 0 if caught_up == len(watchers) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
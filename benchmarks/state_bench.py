@@ -0,0 +1,265 @@
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+
+from backend.rules import compile_rules
+from backend.state import GameRoom, ScriptStore
+from benchmarks.synthetic import make_script, write_library
+
+FULL_MATRIX = {
+    "players": [4, 6, 50],
+    "clues": [10, 100, 500],
+    "story": [1_000, 100_000],
+    "library": [10, 100, 1000],
+}
+QUICK_MATRIX = {
+    "players": [4, 6],
+    "clues": [10, 100],
+    "story": [1_000],
+    "library": [10, 100],
+}
+REPEAT = 5
+MIN_RUN_SECONDS = 0.2
+
+
+class StaticStore:
+    def __init__(self, script):
+        self._script = script
+        self._rules = compile_rules(script)
+
+    def get_script(self, script_id):
+        if script_id == self._script.get("id"):
+            return self._script
+        return None
+
+    def get_rules(self, script_id):
+        if script_id == self._script.get("id"):
+            return self._rules
+        return None
+
+    def list_scripts(self):
+        return []
+
+
+def add_investigation_rules(script):
+    clues = script["clues"]
+    for index, clue in enumerate(clues):
+        clue["type"] = "deep" if index % 4 == 3 else "normal"
+        clue["round"] = 1 if index < len(clues) // 2 else 2
+        if index >= 2 and index % 3 == 0:
+            clue["requires"] = [clues[index - 2]["id"]]
+    script["investigation"] = {
+        "rounds": [
+            {"clues_per_player": 3, "clues_per_round": len(clues)},
+            {"clues_per_player": 3},
+        ],
+        "deep_requires": 1,
+    }
+    return script
+
+
+def build_room(players, clues, story, phase="Configuring", rules=False):
+    script = make_script(
+        role_count=players,
+        clue_count=clues,
+        story_length=story,
+    )
+    if rules:
+        add_investigation_rules(script)
+    room = GameRoom(StaticStore(script))
+    for index in range(players):
+        room.add_player(f"Player {index + 1}", index == 0)
+    room.select_script(script["id"])
+    room.set_player_count(players)
+    if phase == "Configuring":
+        return room, script
+    random.seed(1)
+    room.assign_roles()
+    while room.get_state()["phase"] != phase:
+        ok, _ = room.advance_phase()
+        if not ok:
+            raise ValueError(f"Cannot reach phase {phase}")
+    return room, script
+
+
+def bench_get_state(players, clues, story):
+    room, _ = build_room(players, clues, story, phase="Voting")
+    for voter in range(1, players + 1):
+        room.submit_vote(voter, (voter % players) + 1)
+    return room.get_state
+
+
+def bench_submit_vote(players, clues, story):
+    room, _ = build_room(players, clues, story, phase="Voting")
+    voters = itertools.cycle(range(1, players + 1))
+    return lambda: room.submit_vote(next(voters), 1)
+
+
+def bench_audience_vote(players, clues, story):
+    room, _ = build_room(players, clues, story, phase="Voting")
+    room.set_audience_mode(True)
+    voters = itertools.cycle(range(1000))
+    targets = itertools.cycle(range(1, players + 1))
+    return lambda: room.submit_audience_vote(f"spectator-{next(voters)}", next(targets))
+
+
+def bench_reveal_clue(players, clues, story):
+    room, script = build_room(players, clues, story, phase="Investigation")
+    clue_ids = itertools.cycle([clue["id"] for clue in script["clues"]])
+    return lambda: room.reveal_clue(next(clue_ids))
+
+
+def bench_assign_roles(players, clues, story):
+    room, _ = build_room(players, clues, story)
+    return room.assign_roles
+
+
+def bench_available_clues(players, clues, story):
+    room, script = build_room(players, clues, story, phase="Investigation", rules=True)
+    room.reveal_clue(script["clues"][0]["id"], 1)
+    return lambda: room.available_clues(1)
+
+
+def bench_reveal_clue_rules(players, clues, story):
+    room, script = build_room(players, clues, story, phase="Investigation", rules=True)
+    clue_ids = itertools.cycle([clue["id"] for clue in script["clues"]])
+    players_cycle = itertools.cycle(range(1, players + 1))
+    return lambda: room.reveal_clue(next(clue_ids), next(players_cycle))
+
+
+def bench_build_role_cards(players, clues, story):
+    room, script = build_room(players, clues, story, phase="Reading")
+    return lambda: room._build_role_cards(script)
+
+
+ROOM_BENCHMARKS = [
+    ("GameRoom.get_state", bench_get_state),
+    ("GameRoom.submit_vote", bench_submit_vote),
+    ("GameRoom.submit_audience_vote", bench_audience_vote),
+    ("GameRoom.reveal_clue", bench_reveal_clue),
+    ("GameRoom.reveal_clue:rules", bench_reveal_clue_rules),
+    ("GameRoom.available_clues", bench_available_clues),
+    ("GameRoom.assign_roles", bench_assign_roles),
+    ("GameRoom._build_role_cards", bench_build_role_cards),
+]
+
+
+def measure(func):
+    timer = timeit.Timer(func)
+    number, elapsed = timer.autorange()
+    while elapsed < MIN_RUN_SECONDS and number < 1_000_000:
+        number *= 2
+        elapsed = timer.timeit(number)
+    runs = [timer.timeit(number) / number for _ in range(REPEAT)]
+    return {
+        "number": number,
+        "best_us": min(runs) * 1e6,
+        "median_us": statistics.median(runs) * 1e6,
+    }
+
+
+def run_room_benchmarks(matrix, selected):
+    results = []
+    for name, factory in ROOM_BENCHMARKS:
+        if selected and not any(token in name for token in selected):
+            continue
+        for players, clues, story in itertools.product(
+            matrix["players"], matrix["clues"], matrix["story"]
+        ):
+            params = {"players": players, "clues": clues, "story": story}
+            stats = measure(factory(players, clues, story))
+            results.append({"name": name, "params": params, **stats})
+            print(_format_line(name, params, stats), flush=True)
+    return results
+
+
+def run_store_benchmarks(matrix, selected):
+    results = []
+    wanted = [
+        name for name in ("ScriptStore.refresh", "ScriptStore.list_scripts")
+        if not selected or any(token in name for token in selected)
+    ]
+    if not wanted:
+        return results
+    for library, story in itertools.product(matrix["library"], matrix["story"]):
+        params = {"library": library, "story": story}
+        with tempfile.TemporaryDirectory() as path:
+            write_library(path, library, story_length=story)
+            store = ScriptStore(path)
+            for name in wanted:
+                if name == "ScriptStore.refresh":
+                    func = _reload(store)
+                else:
+                    func = store.list_scripts
+                stats = measure(func)
+                results.append({"name": name, "params": params, **stats})
+                print(_format_line(name, params, stats), flush=True)
+    return results
+
+
+def _reload(store):
+    # A full scan: with the known sources forgotten, refresh parses and
+    # indexes every file again instead of skipping unchanged ones.
+    def run():
+        for name in list(store._sources):
+            store._drop_source(name)
+        store.refresh()
+    return run
+
+
+def _format_line(name, params, stats):
+    param_text = ",".join(f"{key}={value}" for key, value in params.items())
+    return f"{name:<30} {param_text:<36} best {stats['best_us']:>12.2f} us  median {stats['median_us']:>12.2f} us"
+
+
+def _git_revision():
+    try:
+        output = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.stdout.strip()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Microbenchmarks for GameRoom and ScriptStore")
+    parser.add_argument("--quick", action="store_true", help="run a reduced parameter matrix")
+    parser.add_argument("--only", action="append", default=[],
+                        help="run benchmarks whose name contains this text (repeatable)")
+    parser.add_argument("--output", default="benchmark-results.json")
+    args = parser.parse_args(argv)
+
+    matrix = QUICK_MATRIX if args.quick else FULL_MATRIX
+    started = time.time()
+    results = run_room_benchmarks(matrix, args.only)
+    results.extend(run_store_benchmarks(matrix, args.only))
+    report = {
+        "revision": _git_revision(),
+        "timestamp": started,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "matrix": matrix,
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as handle:
+        json.dump(report, handle, indent=2)
+    print(f"wrote {len(results)} results to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
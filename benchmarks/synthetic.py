@@ -0,0 +1,92 @@
+import copy
+import json
+import os
+
+SAMPLE_SCRIPT_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "data",
+    "scripts",
+    "sample-script.json",
+)
+
+
+def load_sample_script():
+    with open(SAMPLE_SCRIPT_PATH, "r", encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+def repeat_text(text, length):
+    if not text or length <= 0:
+        return ""
+    repeats = length // len(text) + 1
+    return (text * repeats)[:length]
+
+
+def make_story(base_story, length, chapter_size=4000):
+    if length <= 0:
+        return ""
+    paragraphs = []
+    total = 0
+    chapter = 1
+    while total < length:
+        heading = f"第{chapter}章"
+        body = repeat_text(base_story, min(chapter_size, length - total))
+        paragraphs.append(heading)
+        for start in range(0, len(body), 200):
+            paragraphs.append(body[start:start + 200])
+        total += len(body)
+        chapter += 1
+    return "\n".join(paragraphs)
+
+
+def make_script(
+    script_id="synthetic",
+    role_count=6,
+    clue_count=10,
+    event_count=10,
+    story_length=None,
+    base=None,
+):
+    base = base or load_sample_script()
+    script = copy.deepcopy(base)
+    script["id"] = script_id
+    script["title"] = f"{base.get('title', '')} #{script_id}"
+    base_roles = base.get("roles", [])
+    roles = []
+    for index in range(role_count):
+        role = dict(base_roles[index % len(base_roles)])
+        role["id"] = index + 1
+        role["name"] = f"{role.get('name', '')}{index + 1}"
+        if story_length is not None:
+            role["story"] = make_story(role.get("story", ""), story_length)
+        roles.append(role)
+    script["roles"] = roles
+    base_clues = base.get("clues", [])
+    clues = []
+    for index in range(clue_count):
+        clue = dict(base_clues[index % len(base_clues)])
+        clue["id"] = f"c{index + 1}"
+        clue["name"] = f"{clue.get('name', '')}{index + 1}"
+        clues.append(clue)
+    script["clues"] = clues
+    base_events = base.get("events", [])
+    events = []
+    for index in range(event_count):
+        event = dict(base_events[index % len(base_events)])
+        event["id"] = f"e{index + 1}"
+        events.append(event)
+    script["events"] = events
+    if story_length is not None:
+        script["truth"] = make_story(base.get("truth", ""), story_length)
+    return script
+
+
+def write_library(path, script_count, **script_kwargs):
+    os.makedirs(path, exist_ok=True)
+    base = script_kwargs.pop("base", None) or load_sample_script()
+    for index in range(script_count):
+        script_id = f"synthetic_{index:05d}"
+        script = make_script(script_id=script_id, base=base, **script_kwargs)
+        with open(os.path.join(path, f"{script_id}.json"), "w", encoding="utf-8") as handle:
+            json.dump(script, handle, ensure_ascii=False)
+    return path
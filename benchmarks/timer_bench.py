@@ -0,0 +1,80 @@
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+
+from backend.timers import TimerWheel
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run(count, horizon, cancel_fraction, seed):
+    rng = random.Random(seed)
+    threads_before = threading.active_count()
+    wheel = TimerWheel()
+    wheel.start()
+    lateness = []
+
+    def fire(due):
+        lateness.append(time.monotonic() - due)
+
+    start = time.perf_counter()
+    handles = []
+    for _ in range(count):
+        delay = rng.uniform(0.0, horizon)
+        handles.append(wheel.schedule(delay, fire, time.monotonic() + delay))
+    schedule_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    attempts = int(count * cancel_fraction)
+    cancelled = sum(1 for handle in rng.sample(handles, attempts) if wheel.cancel(handle))
+    cancel_seconds = time.perf_counter() - start
+    threads = threading.active_count() - threads_before
+    deadline = time.monotonic() + horizon + 5.0
+    while len(lateness) < count - cancelled and time.monotonic() < deadline:
+        time.sleep(0.05)
+    snapshot = wheel.snapshot()
+    wheel.stop()
+    return {
+        "timers": count,
+        "cancelled": cancelled,
+        "fired": len(lateness),
+        "threads": threads,
+        "schedule_us": schedule_seconds / count * 1e6,
+        "cancel_us": cancel_seconds / max(1, attempts) * 1e6,
+        "late_p50_ms": _percentile(lateness, 0.5) * 1000,
+        "late_p99_ms": _percentile(lateness, 0.99) * 1000,
+        "errors": snapshot["errors"],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Timer wheel scheduling cost and accuracy")
+    parser.add_argument("--timers", type=int, default=10000)
+    parser.add_argument("--horizon", type=float, default=3.0,
+                        help="timers are spread uniformly over this many seconds")
+    parser.add_argument("--cancel", type=float, default=0.5,
+                        help="fraction of timers cancelled before they fire")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", metavar="PATH", help="also write the result as JSON")
+    args = parser.parse_args(argv)
+
+    result = run(args.timers, args.horizon, args.cancel, args.seed)
+    print(f"{result['timers']} timers, {result['cancelled']} cancelled, "
+          f"{result['fired']} fired on {result['threads']} thread(s)")
+    print(f"schedule {result['schedule_us']:.2f} us  cancel {result['cancel_us']:.2f} us  "
+          f"late p50 {result['late_p50_ms']:.1f} ms  p99 {result['late_p99_ms']:.1f} ms")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump(result, handle, indent=2)
+    return 0 if result["fired"] == result["timers"] - result["cancelled"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,70 @@
+import argparse
+import os
+import sys
+import time
+
+from benchmarks.synthetic import make_script
+
+DEFAULT_STORY_LENGTH = 2_000_000
+DEFAULT_EVENT_COUNT = 5000
+DEFAULT_BUDGET_MS = 250.0
+
+
+def _time_call(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return (time.perf_counter() - start) * 1000.0
+
+
+def run(story_length, event_count, budget_ms):
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5 import QtWidgets
+
+    from frontend.main import MainPage
+
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv)
+    script = make_script(story_length=story_length, event_count=event_count)
+    role = dict(script["roles"][0])
+    role["role_name"] = role["name"]
+    result = {"truth": script["truth"], "events": script["events"], "votes": {"counts": {}}}
+
+    page = MainPage()
+    page.resize(1000, 700)
+    page.show()
+    app.processEvents()
+
+    timings = {
+        "show_role_ms": _time_call(page.show_role, role),
+        "update_result_ms": _time_call(page._update_result, result, []),
+    }
+    page.phase_stack.setCurrentIndex(3)
+    start = time.perf_counter()
+    app.processEvents()
+    timings["first_paint_ms"] = (time.perf_counter() - start) * 1000.0
+    chapters = page.role_story.chapters()
+    if chapters:
+        timings["jump_last_chapter_ms"] = _time_call(
+            page.role_story.jump_to_chapter, len(chapters) - 1
+        )
+    page.close()
+
+    failed = False
+    for name, value in timings.items():
+        status = "ok" if value <= budget_ms else "SLOW"
+        failed = failed or value > budget_ms
+        print(f"{name:>24}: {value:9.2f} ms  [{status}]")
+    print(f"{'chapters':>24}: {len(chapters)}")
+    return 1 if failed else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless timing check for large script viewers")
+    parser.add_argument("--story-length", type=int, default=DEFAULT_STORY_LENGTH)
+    parser.add_argument("--events", type=int, default=DEFAULT_EVENT_COUNT)
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    args = parser.parse_args(argv)
+    return run(args.story_length, args.events, args.budget_ms)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,5 @@
+import time
+
+# Taken before PyQt5 and the backend load, so the client's startup report can
+# time module imports.
+IMPORTED_AT = time.perf_counter()
@@ -0,0 +1,139 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+DEFAULT_CACHE_BYTES = 256 * 1024 * 1024
+PARTIAL_SUFFIX = ".part"
+
+
+def default_cache_dir():
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "who-is-the-murderer", "assets")
+
+
+def is_digest(name):
+    return (
+        isinstance(name, str)
+        and len(name) == 64
+        and all(char in "0123456789abcdef" for char in name)
+    )
+
+
+class AssetCache:
+    # Files are stored under their sha256, so an asset is fetched once per
+    # machine no matter how many games or servers reference it. The index is
+    # kept in least-recently-used order and trimmed to max_bytes.
+    def __init__(self, root=None, max_bytes=DEFAULT_CACHE_BYTES):
+        self.root = root or default_cache_dir()
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._total = 0
+        self._load()
+
+    def _load(self):
+        if not os.path.isdir(self.root):
+            return
+        found = []
+        for prefix in os.listdir(self.root):
+            directory = os.path.join(self.root, prefix)
+            if not os.path.isdir(directory):
+                continue
+            for name in os.listdir(directory):
+                if not is_digest(name):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(directory, name))
+                except OSError:
+                    continue
+                found.append((stat.st_mtime, name, stat.st_size))
+        for _, digest, size in sorted(found):
+            self._entries[digest] = size
+            self._total += size
+
+    def path_for(self, digest):
+        # Digests arrive from the server; anything else could name a path
+        # outside the cache.
+        if not is_digest(digest):
+            raise ValueError(f"Invalid asset digest: {digest!r}")
+        return os.path.join(self.root, digest[:2], digest)
+
+    def get(self, digest):
+        with self._lock:
+            if digest not in self._entries:
+                return None
+            self._entries.move_to_end(digest)
+        path = self.path_for(digest)
+        try:
+            # The mtime carries the LRU order across restarts.
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self._total -= self._entries.pop(digest, 0)
+            return None
+        return path
+
+    def partial_size(self, digest):
+        try:
+            return os.path.getsize(self.path_for(digest) + PARTIAL_SUFFIX)
+        except OSError:
+            return 0
+
+    def write_chunk(self, digest, offset, data):
+        path = self.path_for(digest) + PARTIAL_SUFFIX
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        size = self.partial_size(digest)
+        if offset > size:
+            return False
+        with open(path, "r+b" if size else "wb") as handle:
+            handle.seek(offset)
+            handle.write(data)
+        return True
+
+    def finish(self, digest):
+        partial = self.path_for(digest) + PARTIAL_SUFFIX
+        digest_check = hashlib.sha256()
+        try:
+            with open(partial, "rb") as handle:
+                for block in iter(lambda: handle.read(1024 * 1024), b""):
+                    digest_check.update(block)
+        except OSError:
+            return None
+        if digest_check.hexdigest() != digest:
+            os.remove(partial)
+            return None
+        path = self.path_for(digest)
+        os.replace(partial, path)
+        size = os.path.getsize(path)
+        with self._lock:
+            self._total += size - self._entries.pop(digest, 0)
+            self._entries[digest] = size
+        self._evict(keep=digest)
+        return path
+
+    def discard_partial(self, digest):
+        try:
+            os.remove(self.path_for(digest) + PARTIAL_SUFFIX)
+        except OSError:
+            pass
+
+    @property
+    def total_bytes(self):
+        return self._total
+
+    def _evict(self, keep=None):
+        removed = []
+        with self._lock:
+            for digest in list(self._entries):
+                if self._total <= self.max_bytes:
+                    break
+                if digest == keep:
+                    continue
+                self._total -= self._entries.pop(digest)
+                removed.append(digest)
+        for digest in removed:
+            try:
+                os.remove(self.path_for(digest))
+            except OSError:
+                pass
@@ -0,0 +1,93 @@
+import json
+import os
+import threading
+
+from frontend.asset_cache import default_cache_dir
+
+
+def default_sessions_dir():
+    return os.path.join(os.path.dirname(default_cache_dir()), "servers")
+
+
+class ServerCache:
+    # What this machine last learned from one server: the scripts listing,
+    # the seat token and the role payload. It is sent back as etags on connect
+    # so an unchanged listing or role story is not transferred again.
+    def __init__(self, host, port, root=None):
+        self._root = root or default_sessions_dir()
+        safe_host = "".join(char if char.isalnum() or char in ".-" else "_" for char in host)
+        self.path = os.path.join(self._root, f"{safe_host}_{port}.json")
+        self._lock = threading.Lock()
+        self.data = {"scripts_etag": None, "scripts": [], "resume_token": None, "role": None}
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as handle:
+                data = json.load(handle)
+        except (OSError, ValueError):
+            return
+        if isinstance(data, dict):
+            self.data.update(data)
+
+    def save(self):
+        with self._lock:
+            raw = json.dumps(self.data, ensure_ascii=False)
+        try:
+            os.makedirs(self._root, exist_ok=True)
+            temporary = self.path + ".tmp"
+            with open(temporary, "w", encoding="utf-8") as handle:
+                handle.write(raw)
+            os.replace(temporary, self.path)
+        except OSError:
+            pass
+
+    def connect_fields(self, scripts=True):
+        fields = {}
+        with self._lock:
+            if scripts and self.data["scripts_etag"]:
+                fields["scripts_etag"] = self.data["scripts_etag"]
+                fields["known_scripts"] = {
+                    item["id"]: item.get("etag", "") for item in self.data["scripts"]
+                }
+            if self.data["resume_token"]:
+                fields["resume_token"] = self.data["resume_token"]
+                role = self.data["role"]
+                if role:
+                    fields["role_etag"] = role["etag"]
+        return fields
+
+    def apply_scripts(self, message):
+        with self._lock:
+            if message.get("not_modified"):
+                scripts = list(self.data["scripts"])
+            elif message.get("delta"):
+                merged = {item["id"]: item for item in self.data["scripts"]}
+                for script_id in message.get("removed", []):
+                    merged.pop(script_id, None)
+                for item in message.get("scripts", []):
+                    merged[item["id"]] = item
+                scripts = [merged[script_id] for script_id in sorted(merged)]
+            else:
+                scripts = list(message.get("scripts", []))
+            self.data["scripts"] = scripts
+            self.data["scripts_etag"] = message.get("etag")
+        self.save()
+        return dict(message, scripts=scripts)
+
+    def apply_welcome(self, message):
+        with self._lock:
+            if not message.get("resumed"):
+                # A fresh seat: any cached role belonged to the old one.
+                self.data["role"] = None
+            self.data["resume_token"] = message.get("resume_token")
+        self.save()
+
+    def apply_role(self, message):
+        with self._lock:
+            role = self.data["role"]
+            if message.get("not_modified") and role and role["etag"] == message.get("etag"):
+                return dict(message, role=role["payload"])
+            self.data["role"] = {"etag": message.get("etag"), "payload": message.get("role")}
+        self.save()
+        return message
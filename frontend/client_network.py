@@ -1,23 +1,124 @@
+import base64
+import binascii
 import json
 import socket
 import threading
 
 from PyQt5 import QtCore
 
+from frontend.asset_cache import AssetCache, is_digest
+from frontend.client_cache import ServerCache
+
+ASSET_CHUNK_PREFIX = b'{"type": "asset_chunk"'
+
+
+class BatchBuilder:
+    def __init__(self, client, batch_id):
+        self._client = client
+        self.batch_id = batch_id
+        self.ops = []
+
+    def add(self, message_type, **fields):
+        operation = {"type": message_type}
+        operation.update(fields)
+        self.ops.append(operation)
+        return self
+
+    def select_script(self, script_id):
+        return self.add("select_script", script_id=script_id)
+
+    def set_player_count(self, player_count):
+        return self.add("set_player_count", player_count=player_count)
+
+    def assign_roles(self):
+        return self.add("assign_roles")
+
+    def advance_phase(self):
+        return self.add("advance_phase")
+
+    def advance_round(self):
+        return self.add("advance_round")
+
+    def reset_game(self):
+        return self.add("reset_game")
+
+    def message(self):
+        return {"type": "batch", "id": self.batch_id, "ops": list(self.ops)}
+
+    def send(self):
+        if not self.ops:
+            return None
+        self._client.send(self.message())
+        return self.batch_id
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.send()
+
 
 class NetworkClient(QtCore.QObject):
     connected = QtCore.pyqtSignal()
     disconnected = QtCore.pyqtSignal()
     message_received = QtCore.pyqtSignal(dict)
     error = QtCore.pyqtSignal(str)
+    asset_ready = QtCore.pyqtSignal(str, str)
+    asset_failed = QtCore.pyqtSignal(str)
 
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, asset_cache=None, server_cache_root=None):
         super().__init__(parent)
         self._socket = None
         self._thread = None
         self._lock = threading.Lock()
+        self._next_batch_id = 1
+        self._asset_cache = asset_cache
+        self._asset_lock = threading.Lock()
+        self._downloads = set()
+        self._server_cache_root = server_cache_root
+        self._server_cache = None
+
+    @property
+    def asset_cache(self):
+        if self._asset_cache is None:
+            self._asset_cache = AssetCache()
+        return self._asset_cache
 
-    def connect_to_host(self, host, port, display_name, is_host=False):
+    def request_asset(self, digest):
+        if not is_digest(digest):
+            if isinstance(digest, str):
+                self.asset_failed.emit(digest)
+            return None
+        path = self.asset_cache.get(digest)
+        if path:
+            self.asset_ready.emit(digest, path)
+            return path
+        with self._asset_lock:
+            if digest in self._downloads:
+                return None
+            self._downloads.add(digest)
+        # A partial file left by an earlier connection is resumed, not restarted.
+        offset = self.asset_cache.partial_size(digest)
+        self.send({"type": "request_asset", "hash": digest, "offset": offset, "id": digest})
+        return None
+
+    def batch(self):
+        with self._lock:
+            batch_id = self._next_batch_id
+            self._next_batch_id += 1
+        return BatchBuilder(self, batch_id)
+
+    def connect_to_host(
+        self,
+        host,
+        port,
+        display_name,
+        is_host=False,
+        spectator=False,
+        scripts_page=None,
+        host_token=None,
+    ):
         if self._socket:
             return False
         try:
@@ -27,9 +128,21 @@ class NetworkClient(QtCore.QObject):
             return False
         sock.settimeout(None)
         self._socket = sock
+        self._server_cache = ServerCache(host, port, self._server_cache_root)
+        message = {"type": "connect", "display_name": display_name, "is_host": is_host}
+        if host_token:
+            message["host_token"] = host_token
+        if spectator:
+            message["spectator"] = True
+        else:
+            # A paging client never holds the whole listing, so it has no
+            # cached listing to revalidate.
+            message.update(self._server_cache.connect_fields(scripts=scripts_page is None))
+        if scripts_page is not None:
+            message["scripts_page"] = scripts_page
         self._thread = threading.Thread(target=self._read_loop, daemon=True)
         self._thread.start()
-        self.send({"type": "connect", "display_name": display_name, "is_host": is_host})
+        self.send(message)
         self.connected.emit()
         return True
 
@@ -55,8 +168,59 @@ class NetworkClient(QtCore.QObject):
         except OSError:
             pass
         self._socket = None
+        with self._asset_lock:
+            self._downloads.clear()
         self.disconnected.emit()
 
+    def _apply_server_cache(self, message):
+        # Conditional replies are expanded from the cache here, so the rest of
+        # the client always sees complete scripts and role messages.
+        cache = self._server_cache
+        message_type = message.get("type")
+        if cache is None:
+            return message
+        if message_type == "welcome" and not message.get("spectator"):
+            cache.apply_welcome(message)
+        elif message_type == "scripts" and "etag" in message:
+            return cache.apply_scripts(message)
+        elif message_type == "role_assigned" and "etag" in message:
+            return cache.apply_role(message)
+        return message
+
+    def _on_asset_chunk(self, message):
+        digest = message.get("hash")
+        if not is_digest(digest):
+            return
+        with self._asset_lock:
+            if digest not in self._downloads:
+                return
+        try:
+            data = base64.b64decode(message.get("data", ""))
+            written = self.asset_cache.write_chunk(digest, int(message.get("offset", 0)), data)
+        except (OSError, ValueError, TypeError, binascii.Error):
+            written = False
+        if written and not message.get("final"):
+            return
+        path = self.asset_cache.finish(digest) if written else None
+        with self._asset_lock:
+            self._downloads.discard(digest)
+        if path:
+            self.asset_ready.emit(digest, path)
+        else:
+            self.asset_cache.discard_partial(digest)
+            self.asset_failed.emit(digest)
+
+    def _on_asset_error(self, message):
+        # The server refused the request; a later request_asset asks again.
+        digest = message.get("hash")
+        if not is_digest(digest):
+            return
+        with self._asset_lock:
+            if digest not in self._downloads:
+                return
+            self._downloads.discard(digest)
+        self.asset_failed.emit(digest)
+
     def _read_loop(self):
         buffer = b""
         while self._socket:
@@ -75,5 +239,13 @@ class NetworkClient(QtCore.QObject):
                     message = json.loads(line.decode("utf-8"))
                 except json.JSONDecodeError:
                     continue
-                self.message_received.emit(message)
+                if line.startswith(ASSET_CHUNK_PREFIX):
+                    # Chunks are written to disk here and never reach the UI
+                    # thread, so they do not delay state handling.
+                    self._on_asset_chunk(message)
+                    continue
+                if message.get("type") == "asset_error":
+                    self._on_asset_error(message)
+                    continue
+                self.message_received.emit(self._apply_server_cache(message))
         self.close()
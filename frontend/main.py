@@ -1,39 +1,48 @@
+import argparse
 import os
-import socket
 import sys
+import threading
+import time
 
 from PyQt5 import QtCore, QtGui, QtWidgets
 
-from backend.server import GameServer, DEFAULT_HOST, DEFAULT_PORT
+from backend.discovery import DISCOVERY_PORT, discover_hosts, local_address
+from backend.history import REPLAY_DIR, default_history_dir
+from backend.profiling import DEFAULT_PROFILE_SECONDS, PROFILE_MODES
+from backend.protocol import DEFAULT_HOST, DEFAULT_PORT, SCRIPT_PAGE_SIZE
+from backend.replay import Replay
+from frontend import IMPORTED_AT
 from frontend.client_network import NetworkClient
+from frontend.viewers import LazyListView, LazyTextView
 
 
-def get_local_ip():
-    try:
-        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        sock.connect(("8.8.8.8", 80))
-        ip_address = sock.getsockname()[0]
-        sock.close()
-        return ip_address
-    except OSError:
-        return "127.0.0.1"
+def get_base_path():
+    if hasattr(sys, "_MEIPASS"):
+        return sys._MEIPASS
+    return os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 
 
 def get_scripts_path():
-    if hasattr(sys, "_MEIPASS"):
-        base_path = sys._MEIPASS
-    else:
-        base_path = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
-    return os.path.join(base_path, "data", "scripts")
+    return os.path.join(get_base_path(), "data", "scripts")
+
+
+def get_assets_path():
+    return os.path.join(get_base_path(), "assets")
 
 
 class StartPage(QtWidgets.QWidget):
     host_requested = QtCore.pyqtSignal(str, int)
-    client_requested = QtCore.pyqtSignal(str, int, str)
+    client_requested = QtCore.pyqtSignal(str, int, str, bool, str)
+    replay_requested = QtCore.pyqtSignal(str)
+    host_found = QtCore.pyqtSignal(dict)
+    scan_finished = QtCore.pyqtSignal()
 
     def __init__(self, parent=None):
         super().__init__(parent)
+        self._scanning = False
         self._build_ui()
+        self.host_found.connect(self._add_host)
+        self.scan_finished.connect(self._on_scan_finished)
 
     def _build_ui(self):
         layout = QtWidgets.QVBoxLayout(self)
@@ -50,7 +59,7 @@ class StartPage(QtWidgets.QWidget):
         host_group = QtWidgets.QGroupBox("Host (start server)")
         host_group.setProperty("card", "primary")
         host_layout = QtWidgets.QFormLayout(host_group)
-        self.host_ip_label = QtWidgets.QLabel(get_local_ip())
+        self.host_ip_label = QtWidgets.QLabel(local_address())
         self.host_name_input = QtWidgets.QLineEdit()
         self.host_name_input.setPlaceholderText("Host name")
         self.host_port_input = QtWidgets.QSpinBox()
@@ -74,11 +83,27 @@ class StartPage(QtWidgets.QWidget):
         self.client_port_input = QtWidgets.QSpinBox()
         self.client_port_input.setRange(1, 65535)
         self.client_port_input.setValue(DEFAULT_PORT)
+        self.client_spectator_check = QtWidgets.QCheckBox("Watch only (spectator)")
+        self.client_token_input = QtWidgets.QLineEdit()
+        self.client_token_input.setPlaceholderText("Only to host on a dedicated server")
+        self.client_token_input.setEchoMode(QtWidgets.QLineEdit.Password)
         client_button = QtWidgets.QPushButton("Connect")
         client_button.clicked.connect(self._on_client_clicked)
+        # Hosts on the LAN answer a discovery probe; picking one fills in the
+        # address and double-clicking connects.
+        self.hosts_list = QtWidgets.QListWidget()
+        self.hosts_list.setMaximumHeight(110)
+        self.hosts_list.itemClicked.connect(self._on_host_picked)
+        self.hosts_list.itemDoubleClicked.connect(self._on_host_activated)
+        self.scan_button = QtWidgets.QPushButton("Scan LAN")
+        self.scan_button.clicked.connect(self.scan_hosts)
+        client_layout.addRow("LAN hosts", self.hosts_list)
+        client_layout.addRow(self.scan_button)
         client_layout.addRow("Name", self.client_name_input)
         client_layout.addRow("Host IP", self.client_host_input)
         client_layout.addRow("Port", self.client_port_input)
+        client_layout.addRow("Host token", self.client_token_input)
+        client_layout.addRow(self.client_spectator_check)
         client_layout.addRow(client_button)
 
         cards_layout = QtWidgets.QHBoxLayout()
@@ -86,6 +111,9 @@ class StartPage(QtWidgets.QWidget):
         cards_layout.addWidget(host_group, 1)
         cards_layout.addWidget(client_group, 1)
         layout.addLayout(cards_layout)
+        replay_button = QtWidgets.QPushButton("Open replay…")
+        replay_button.clicked.connect(self._on_replay_clicked)
+        layout.addWidget(replay_button, 0, QtCore.Qt.AlignLeft)
         layout.addStretch(1)
 
     def _on_host_clicked(self):
@@ -97,7 +125,61 @@ class StartPage(QtWidgets.QWidget):
         name = self.client_name_input.text().strip() or "Player"
         host = self.client_host_input.text().strip() or "127.0.0.1"
         port = int(self.client_port_input.value())
-        self.client_requested.emit(host, port, name)
+        spectator = self.client_spectator_check.isChecked()
+        host_token = self.client_token_input.text().strip()
+        self.client_requested.emit(host, port, name, spectator, host_token)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.scan_hosts()
+
+    def scan_hosts(self):
+        if self._scanning:
+            return
+        self._scanning = True
+        self.scan_button.setEnabled(False)
+        self.hosts_list.clear()
+        threading.Thread(target=self._scan, daemon=True).start()
+
+    def _scan(self):
+        # Runs off the UI thread; signals carry each beacon back as it lands.
+        try:
+            discover_hosts(port=DISCOVERY_PORT, on_found=self.host_found.emit)
+        finally:
+            self.scan_finished.emit()
+
+    def _add_host(self, beacon):
+        title = beacon.get("title") or "No script yet"
+        item = QtWidgets.QListWidgetItem(
+            f"{title} — {beacon['host']}:{beacon.get('port')} · {beacon.get('phase')} · "
+            f"{beacon.get('players', 0)}/{beacon.get('seats', 0)}"
+        )
+        item.setData(QtCore.Qt.UserRole, (beacon["host"], beacon.get("port")))
+        self.hosts_list.addItem(item)
+
+    def _on_scan_finished(self):
+        self._scanning = False
+        self.scan_button.setEnabled(True)
+
+    def _on_host_picked(self, item):
+        host, port = item.data(QtCore.Qt.UserRole)
+        self.client_host_input.setText(host)
+        if isinstance(port, int):
+            self.client_port_input.setValue(port)
+
+    def _on_host_activated(self, item):
+        self._on_host_picked(item)
+        self._on_client_clicked()
+
+    def _on_replay_clicked(self):
+        path, _ = QtWidgets.QFileDialog.getOpenFileName(
+            self,
+            "Open replay",
+            os.path.join(default_history_dir(), REPLAY_DIR),
+            "Replays (*.jsonl)",
+        )
+        if path:
+            self.replay_requested.emit(path)
 
 
 class MainPage(QtWidgets.QWidget):
@@ -106,21 +188,37 @@ class MainPage(QtWidgets.QWidget):
     assign_roles = QtCore.pyqtSignal()
     rename_requested = QtCore.pyqtSignal(str)
     advance_phase = QtCore.pyqtSignal()
+    advance_round = QtCore.pyqtSignal()
     reset_game = QtCore.pyqtSignal()
     request_clue = QtCore.pyqtSignal(str)
     submit_vote = QtCore.pyqtSignal(int)
+    audience_vote = QtCore.pyqtSignal(int)
+    set_audience_mode = QtCore.pyqtSignal(bool)
+    set_phase_timers = QtCore.pyqtSignal(dict, bool)
+    search_scripts = QtCore.pyqtSignal(str)
+    request_script_page = QtCore.pyqtSignal(str, int)
+    request_history = QtCore.pyqtSignal()
 
     def __init__(self, parent=None):
         super().__init__(parent)
         self._scripts = {}
+        self._listed_scripts = []
+        self._page_request = None
+        self._page_version = None
+        self._next_cursor = None
         self._player_id = None
         self._name_dirty = False
         self._clues = []
         self._revealed_clues = {}
+        self._available_clues = None
         self._current_vote = None
+        self._players = []
+        self._audience_enabled = False
+        self._timer_settings = None
         self._role_data = {}
         self._role_cards = {}
         self._current_phase = "Idle"
+        self._result_content = None
         self._build_ui()
 
     def _build_ui(self):
@@ -133,9 +231,14 @@ class MainPage(QtWidgets.QWidget):
         status_layout = QtWidgets.QHBoxLayout(status_frame)
         status_layout.setContentsMargins(16, 12, 16, 12)
         self.phase_label = QtWidgets.QLabel("Phase: Idle")
+        self.countdown_label = QtWidgets.QLabel("")
         self.script_label = QtWidgets.QLabel("Script: -")
+        self.cover_label = QtWidgets.QLabel()
+        self.cover_label.setVisible(False)
         self.count_label = QtWidgets.QLabel("Players: 0")
         status_layout.addWidget(self.phase_label)
+        status_layout.addWidget(self.countdown_label)
+        status_layout.addWidget(self.cover_label)
         status_layout.addWidget(self.script_label)
         status_layout.addWidget(self.count_label)
         status_layout.addStretch(1)
@@ -197,8 +300,7 @@ class MainPage(QtWidgets.QWidget):
         self.role_title = QtWidgets.QLabel("Role: -")
         self.role_intro = QtWidgets.QLabel("")
         self.role_intro.setWordWrap(True)
-        self.role_story = QtWidgets.QTextEdit()
-        self.role_story.setReadOnly(True)
+        self.role_story = LazyTextView()
         role_layout.addWidget(self.role_title)
         role_layout.addWidget(self.role_intro)
         role_layout.addWidget(self.role_story)
@@ -213,6 +315,8 @@ class MainPage(QtWidgets.QWidget):
         self.reveal_clue_button.clicked.connect(self._on_reveal_clue)
         clue_list_layout.addWidget(self.clue_list)
         clue_list_layout.addWidget(self.reveal_clue_button)
+        self.search_status = QtWidgets.QLabel("")
+        clue_list_layout.addWidget(self.search_status)
         self.clue_detail = QtWidgets.QTextEdit()
         self.clue_detail.setReadOnly(True)
         investigation_layout.addLayout(clue_list_layout)
@@ -229,6 +333,9 @@ class MainPage(QtWidgets.QWidget):
         vote_list_layout.addWidget(self.vote_list)
         vote_list_layout.addWidget(self.vote_button)
         vote_list_layout.addWidget(self.vote_status)
+        self.audience_status = QtWidgets.QLabel("")
+        self.audience_status.setVisible(False)
+        vote_list_layout.addWidget(self.audience_status)
         self.vote_results = QtWidgets.QListWidget()
         self.vote_results.setVisible(False)
         voting_layout.addLayout(vote_list_layout)
@@ -237,9 +344,8 @@ class MainPage(QtWidgets.QWidget):
 
         result_page = QtWidgets.QWidget()
         result_layout = QtWidgets.QVBoxLayout(result_page)
-        self.truth_text = QtWidgets.QTextEdit()
-        self.truth_text.setReadOnly(True)
-        self.events_list = QtWidgets.QListWidget()
+        self.truth_text = LazyTextView()
+        self.events_list = LazyListView()
         self.result_votes = QtWidgets.QListWidget()
         result_layout.addWidget(QtWidgets.QLabel("Truth"))
         result_layout.addWidget(self.truth_text)
@@ -259,7 +365,21 @@ class MainPage(QtWidgets.QWidget):
         self.host_controls = QtWidgets.QGroupBox("Host controls")
         self.host_controls.setProperty("card", "primary")
         host_layout = QtWidgets.QFormLayout(self.host_controls)
+        self.script_search = QtWidgets.QLineEdit()
+        self.script_search.setPlaceholderText("Search titles, roles and clues")
+        self.script_search.setClearButtonEnabled(True)
+        self.script_search.textChanged.connect(self._on_search_edited)
+        # Wait for a pause in typing so each keystroke is not a server query.
+        self._search_timer = QtCore.QTimer(self)
+        self._search_timer.setSingleShot(True)
+        self._search_timer.setInterval(200)
+        self._search_timer.timeout.connect(self._on_search_timeout)
         self.script_combo = QtWidgets.QComboBox()
+        # Further pages of the listing are requested as the popup list nears
+        # its end.
+        self.script_combo.view().verticalScrollBar().valueChanged.connect(self._on_script_scroll)
+        self.seating_check = QtWidgets.QCheckBox("Only scripts for this player count")
+        self.seating_check.toggled.connect(lambda _checked: self.reload_script_pages())
         self.select_script_button = QtWidgets.QPushButton("Select script")
         self.select_script_button.clicked.connect(self._on_select_script)
         self.player_count_spin = QtWidgets.QSpinBox()
@@ -270,26 +390,69 @@ class MainPage(QtWidgets.QWidget):
         self.assign_roles_button.clicked.connect(self.assign_roles.emit)
         self.advance_phase_button = QtWidgets.QPushButton("Next phase")
         self.advance_phase_button.clicked.connect(self.advance_phase.emit)
+        self.advance_round_button = QtWidgets.QPushButton("Next search round")
+        self.advance_round_button.clicked.connect(self.advance_round.emit)
         self.reset_game_button = QtWidgets.QPushButton("Reset game")
         self.reset_game_button.clicked.connect(self.reset_game.emit)
+        self.audience_mode_check = QtWidgets.QCheckBox("Audience voting")
+        self.audience_mode_check.toggled.connect(self.set_audience_mode.emit)
+        timers_layout = QtWidgets.QHBoxLayout()
+        self.timer_spins = {}
+        for phase in ("Reading", "Investigation", "Voting"):
+            spin = QtWidgets.QSpinBox()
+            spin.setRange(0, 3600)
+            spin.setSingleStep(30)
+            spin.setSuffix(" s")
+            spin.setSpecialValueText("Off")
+            spin.setToolTip(f"{phase} timer")
+            self.timer_spins[phase] = spin
+            timers_layout.addWidget(spin)
+        self.auto_close_check = QtWidgets.QCheckBox("Close voting when all votes are in")
+        self.apply_timers_button = QtWidgets.QPushButton("Apply timers")
+        self.apply_timers_button.clicked.connect(self._on_apply_timers)
+        self.history_button = QtWidgets.QPushButton("Game history")
+        self.history_button.clicked.connect(self.request_history.emit)
+        host_layout.addRow("Search", self.script_search)
         host_layout.addRow("Script", self.script_combo)
+        host_layout.addRow(self.seating_check)
         host_layout.addRow(self.select_script_button)
         host_layout.addRow("Player count", self.player_count_spin)
         host_layout.addRow(self.assign_roles_button)
         host_layout.addRow(self.advance_phase_button)
+        host_layout.addRow(self.advance_round_button)
         host_layout.addRow(self.reset_game_button)
+        host_layout.addRow(self.audience_mode_check)
+        host_layout.addRow("Timers", timers_layout)
+        host_layout.addRow(self.auto_close_check)
+        host_layout.addRow(self.apply_timers_button)
+        host_layout.addRow(self.history_button)
         layout.addWidget(self.host_controls)
 
     def set_host_mode(self, is_host):
         self.host_controls.setVisible(is_host)
 
+    def set_spectator_mode(self, spectator):
+        self.name_input.setEnabled(not spectator)
+        self.name_button.setEnabled(not spectator)
+        self.reveal_clue_button.setEnabled(not spectator)
+
     def set_player_id(self, player_id):
         self._player_id = player_id
 
     def update_state(self, state):
         phase = state.get("phase", "-")
         self._current_phase = phase
-        self.phase_label.setText(f"Phase: {phase}")
+        investigation = state.get("investigation")
+        if investigation:
+            round_text = f"round {investigation.get('round')}/{investigation.get('rounds')}"
+            if investigation.get("name"):
+                round_text = f"{round_text} {investigation['name']}"
+            self.phase_label.setText(f"Phase: {phase} ({round_text})")
+        else:
+            self.phase_label.setText(f"Phase: {phase}")
+        self.advance_round_button.setEnabled(
+            bool(investigation) and investigation.get("round", 0) < investigation.get("rounds", 0)
+        )
         script = state.get("script")
         if script:
             self.script_label.setText(f"Script: {script.get('title', '-')}")
@@ -299,6 +462,7 @@ class MainPage(QtWidgets.QWidget):
         role_cards = state.get("role_cards", [])
         self._update_role_cards(role_cards)
         players = state.get("players", [])
+        self._players = players
         self.players_list.clear()
         for player in players:
             name = player.get("display_name") or "Player"
@@ -310,17 +474,119 @@ class MainPage(QtWidgets.QWidget):
             self.players_list.addItem(f"{name}{role_text}{host_flag} - {status}")
         self._update_name_from_players(players)
         self._update_phase_view(phase)
-        self._update_clues(state.get("clues", []), state.get("revealed_clues", []))
+        private = state.get("private") or {}
+        private_clues = list(private.get("clues", []))
+        for clues in private.get("clues_by_role", {}).values():
+            private_clues.extend(clues)
+        self._update_search_status(private.get("search"), investigation)
+        self._update_clues(
+            state.get("clues", []), state.get("revealed_clues", []) + private_clues
+        )
         self._update_votes(state.get("votes"), players)
+        self.update_audience(state.get("audience"))
+        self._update_timers(state.get("timers"))
         self._update_result(state.get("result"), players)
 
     def update_scripts(self, scripts):
+        self._listed_scripts = list(scripts)
+        self._page_request = None
+        self._next_cursor = None
+        if not self.script_search.text().strip():
+            self._fill_script_combo(self._listed_scripts)
+
+    def begin_script_paging(self):
+        # The server sends the first unfiltered page right after connect.
+        self._listed_scripts = []
+        self._page_version = None
+        self._next_cursor = None
+        self._page_request = ("", 0)
+
+    def reload_script_pages(self):
+        self._listed_scripts = []
+        self._page_version = None
+        self._next_cursor = None
+        self._request_script_page("")
+
+    def add_script_page(self, message):
+        cursor = message.get("cursor") or ""
+        if self._page_request != (cursor, message.get("players") or 0):
+            return
+        self._page_request = None
+        if cursor and message.get("version") != self._page_version:
+            # The library changed between pages; start over so removed
+            # scripts do not linger in the list.
+            self.reload_script_pages()
+            return
+        scripts = message.get("scripts", [])
+        self._page_version = message.get("version")
+        self._next_cursor = message.get("next_cursor")
+        if not cursor:
+            self._listed_scripts = []
+        self._listed_scripts.extend(scripts)
+        if self.script_search.text().strip():
+            return
+        if cursor:
+            for item in scripts:
+                self._scripts[item["id"]] = item
+                self.script_combo.addItem(item.get("title", item["id"]), item["id"])
+        else:
+            self._fill_script_combo(scripts)
+        self.script_combo.setToolTip(
+            f"{len(self._listed_scripts)} of {message.get('total', 0)} scripts loaded"
+        )
+
+    def _request_script_page(self, cursor):
+        players = self.player_count_spin.value() if self.seating_check.isChecked() else 0
+        self._page_request = (cursor, players)
+        self.request_script_page.emit(cursor, players)
+
+    def _on_script_scroll(self, value):
+        scroll_bar = self.script_combo.view().verticalScrollBar()
+        if (
+            self._next_cursor
+            and self._page_request is None
+            and not self.script_search.text().strip()
+            and value >= scroll_bar.maximum() - 5
+        ):
+            self._request_script_page(self._next_cursor)
+
+    def show_search_results(self, message):
+        if message.get("query") != self.script_search.text().strip():
+            return
+        scripts = message.get("scripts", [])
+        self._fill_script_combo(scripts)
+        self.script_combo.setToolTip(f"{message.get('total', len(scripts))} matching scripts")
+
+    def _fill_script_combo(self, scripts):
         self._scripts = {item["id"]: item for item in scripts}
         self.script_combo.clear()
         for script_id, item in self._scripts.items():
             title = item.get("title", script_id)
             self.script_combo.addItem(title, script_id)
 
+    def _on_search_edited(self, _text):
+        self._search_timer.start()
+
+    def _on_search_timeout(self):
+        query = self.script_search.text().strip()
+        if query:
+            self.search_scripts.emit(query)
+        else:
+            self.script_combo.setToolTip("")
+            self._fill_script_combo(self._listed_scripts)
+            self._page_request = None
+
+    def show_cover(self, path):
+        pixmap = QtGui.QPixmap(path) if path else QtGui.QPixmap()
+        if pixmap.isNull():
+            self.cover_label.clear()
+            self.cover_label.setVisible(False)
+            return
+        self.cover_label.setPixmap(
+            pixmap.scaledToHeight(48, QtCore.Qt.SmoothTransformation)
+        )
+        self.cover_label.setVisible(True)
+
     def show_role(self, role):
         self._role_data = dict(role)
         display_name = role.get("name", "-")
@@ -344,8 +610,7 @@ class MainPage(QtWidgets.QWidget):
         title = QtWidgets.QLabel(f"{role_name} · {display_name}".strip(" ·"))
         intro = QtWidgets.QLabel(self._role_data.get("intro", ""))
         intro.setWordWrap(True)
-        story = QtWidgets.QTextEdit()
-        story.setReadOnly(True)
+        story = LazyTextView()
         story.setPlainText(self._role_data.get("story", ""))
         close_button = QtWidgets.QPushButton("Close")
         close_button.clicked.connect(dialog.accept)
@@ -363,6 +628,8 @@ class MainPage(QtWidgets.QWidget):
 
     def _on_player_count(self, value):
         self.set_player_count.emit(int(value))
+        if self.seating_check.isChecked():
+            self.reload_script_pages()
 
     def _on_name_edited(self):
         self._name_dirty = True
@@ -391,9 +658,57 @@ class MainPage(QtWidgets.QWidget):
         target_id = item.data(QtCore.Qt.UserRole)
         if target_id is None:
             return
+        seated = self._role_cards.get(self._player_id, {}).get("role_id") is not None
+        if self._audience_enabled and not seated:
+            self.audience_vote.emit(int(target_id))
+            return
         self._current_vote = int(target_id)
         self.submit_vote.emit(int(target_id))
 
+    def update_countdown(self, message):
+        remaining = message.get("remaining")
+        if remaining is None:
+            self.countdown_label.setText("")
+            return
+        minutes, seconds = divmod(int(remaining), 60)
+        self.countdown_label.setText(f"Time left: {minutes}:{seconds:02d}")
+
+    def _update_timers(self, timers):
+        if not timers or timers == self._timer_settings:
+            return
+        # Only follow the server when its settings change, so unsent edits in
+        # the spin boxes survive ordinary state updates.
+        self._timer_settings = timers
+        durations = timers.get("durations", {})
+        for phase, spin in self.timer_spins.items():
+            spin.setValue(int(durations.get(phase, 0)))
+        self.auto_close_check.setChecked(bool(timers.get("auto_close_votes")))
+
+    def _on_apply_timers(self):
+        timers = {phase: spin.value() for phase, spin in self.timer_spins.items()}
+        self.set_phase_timers.emit(timers, self.auto_close_check.isChecked())
+
+    def update_audience(self, summary):
+        self._audience_enabled = bool(summary and summary.get("enabled"))
+        self.audience_mode_check.blockSignals(True)
+        self.audience_mode_check.setChecked(self._audience_enabled)
+        self.audience_mode_check.blockSignals(False)
+        self.audience_status.setVisible(self._audience_enabled)
+        if not self._audience_enabled:
+            self.audience_status.setText("")
+            return
+        text = f"Audience votes: {summary.get('total', 0)}"
+        counts = summary.get("counts")
+        if counts:
+            parts = []
+            for player in self._players:
+                count = counts.get(str(player.get("player_id")), 0)
+                if count:
+                    parts.append(f"{player.get('display_name') or 'Player'} {count}")
+            if parts:
+                text = f"{text} ({', '.join(parts)})"
+        self.audience_status.setText(text)
+
     def _update_name_from_players(self, players):
         if not self._player_id:
             return
@@ -444,13 +759,33 @@ class MainPage(QtWidgets.QWidget):
             clue_id = clue.get("id")
             name = clue.get("name") or str(clue_id)
             clue_type = clue.get("type", "normal")
-            status = "revealed" if clue.get("revealed") else "hidden"
+            if clue.get("revealed"):
+                status = "revealed"
+            elif clue_id in self._revealed_clues:
+                status = "private"
+            elif self._available_clues is not None:
+                status = "available" if clue_id in self._available_clues else "locked"
+            else:
+                status = "hidden"
             item = QtWidgets.QListWidgetItem(f"{name} ({clue_type}) - {status}")
             item.setData(QtCore.Qt.UserRole, clue_id)
             self.clue_list.addItem(item)
         self.clue_list.blockSignals(False)
         self._refresh_clue_detail()
 
+    def _update_search_status(self, search, investigation):
+        if not search:
+            self._available_clues = None
+            self.search_status.setText("")
+            return
+        self._available_clues = set(search.get("available_clues", []))
+        parts = []
+        if search.get("player_remaining") is not None:
+            parts.append(f"your searches left: {search['player_remaining']}")
+        if investigation and investigation.get("round_remaining") is not None:
+            parts.append(f"round searches left: {investigation['round_remaining']}")
+        self.search_status.setText(", ".join(parts).capitalize())
+
     def _refresh_clue_detail(self):
         item = self.clue_list.currentItem()
         if not item:
@@ -504,17 +839,22 @@ class MainPage(QtWidgets.QWidget):
 
     def _update_result(self, result, players):
         if not result:
-            self.truth_text.setPlainText("")
-            self.events_list.clear()
+            if self._result_content is not None:
+                self._result_content = None
+                self.truth_text.setPlainText("")
+                self.events_list.clear()
             self.result_votes.clear()
             return
-        self.truth_text.setPlainText(result.get("truth", ""))
-        self.events_list.clear()
-        for event in result.get("events", []):
-            time_text = event.get("time", "")
-            content = event.get("content", "")
-            label = f"{time_text} - {content}".strip(" -")
-            self.events_list.addItem(label)
+        content_key = (result.get("truth", ""), result.get("events", []))
+        if content_key != self._result_content:
+            self._result_content = content_key
+            self.truth_text.setPlainText(result.get("truth", ""))
+            labels = []
+            for event in result.get("events", []):
+                time_text = event.get("time", "")
+                content = event.get("content", "")
+                labels.append(f"{time_text} - {content}".strip(" -"))
+            self.events_list.set_items(labels)
         self.result_votes.clear()
         vote_summary = result.get("votes", {})
         counts = vote_summary.get("counts", {})
@@ -524,6 +864,44 @@ class MainPage(QtWidgets.QWidget):
             count = counts.get(player_key, counts.get(player.get("player_id"), 0))
             self.result_votes.addItem(f"{name}: {count}")
 
+    def show_history(self, message):
+        report = message.get("report", {})
+        dialog = QtWidgets.QDialog(self)
+        dialog.setWindowTitle("Game history")
+        dialog.resize(760, 420)
+        layout = QtWidgets.QVBoxLayout(dialog)
+        layout.addWidget(QtWidgets.QLabel(f"Archived games: {report.get('games', 0)}"))
+        headers = ["Script", "Games", "Vote accuracy", "Solved", "Phase averages", "Top clues"]
+        table = QtWidgets.QTableWidget(len(report.get("scripts", [])), len(headers))
+        table.setHorizontalHeaderLabels(headers)
+        table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        for row, script in enumerate(report.get("scripts", [])):
+            phases = ", ".join(
+                f"{phase} {seconds:.0f}s"
+                for phase, seconds in script.get("phase_seconds", {}).items()
+            )
+            clues = ", ".join(
+                f"{clue.get('name') or clue.get('clue_id')} {clue.get('per_game', 0):.1f}"
+                for clue in script.get("clue_frequency", [])[:3]
+            )
+            values = [
+                script.get("title") or script.get("script_id"),
+                str(script.get("games", 0)),
+                _percent(script.get("vote_accuracy")),
+                _percent(script.get("solve_rate")),
+                phases,
+                clues,
+            ]
+            for column, value in enumerate(values):
+                table.setItem(row, column, QtWidgets.QTableWidgetItem(value))
+        table.resizeColumnsToContents()
+        layout.addWidget(table)
+        close_button = QtWidgets.QPushButton("Close")
+        close_button.clicked.connect(dialog.accept)
+        layout.addWidget(close_button)
+        self._fade_in_dialog(dialog)
+        dialog.exec_()
+
     def _fade_in_dialog(self, dialog):
         dialog.setWindowOpacity(0.0)
         animation = QtCore.QPropertyAnimation(dialog, b"windowOpacity", dialog)
@@ -535,29 +913,220 @@ class MainPage(QtWidgets.QWidget):
         animation.start()
 
 
+def _percent(value):
+    return "-" if value is None else f"{value:.0%}"
+
+
+def _clock(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes:02d}:{seconds:02d}"
+
+
+class ReplayBar(QtWidgets.QFrame):
+    # Plays a recorded game back through MainPage.update_state. The clock
+    # runs at the chosen speed and only a change of frame emits a state, so
+    # seeking and playing both cost one bisect per tick.
+    state_changed = QtCore.pyqtSignal(dict)
+    closed = QtCore.pyqtSignal()
+    SPEEDS = (0.5, 1.0, 2.0, 4.0, 8.0)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setProperty("panel", "status")
+        self._replay = None
+        self._index = None
+        self._position = 0.0
+        self._anchor = None
+        self._timer = QtCore.QTimer(self)
+        self._timer.setInterval(50)
+        self._timer.timeout.connect(self._on_tick)
+        layout = QtWidgets.QHBoxLayout(self)
+        layout.setContentsMargins(16, 8, 16, 8)
+        self.title_label = QtWidgets.QLabel("Replay")
+        self.previous_button = QtWidgets.QPushButton("◀")
+        self.previous_button.setToolTip("Previous change")
+        self.previous_button.clicked.connect(lambda: self._step(-1))
+        self.play_button = QtWidgets.QPushButton("Play")
+        self.play_button.clicked.connect(self.toggle)
+        self.next_button = QtWidgets.QPushButton("▶")
+        self.next_button.setToolTip("Next change")
+        self.next_button.clicked.connect(lambda: self._step(1))
+        self.slider = QtWidgets.QSlider(QtCore.Qt.Horizontal)
+        self.slider.valueChanged.connect(self._on_slider)
+        self.time_label = QtWidgets.QLabel("00:00 / 00:00")
+        self.speed_combo = QtWidgets.QComboBox()
+        for speed in self.SPEEDS:
+            self.speed_combo.addItem(f"{speed:g}×", speed)
+        self.speed_combo.setCurrentIndex(self.SPEEDS.index(1.0))
+        self.speed_combo.currentIndexChanged.connect(self._on_speed)
+        close_button = QtWidgets.QPushButton("Close replay")
+        close_button.clicked.connect(self._on_close)
+        layout.addWidget(self.title_label)
+        layout.addWidget(self.previous_button)
+        layout.addWidget(self.play_button)
+        layout.addWidget(self.next_button)
+        layout.addWidget(self.slider, 1)
+        layout.addWidget(self.time_label)
+        layout.addWidget(self.speed_combo)
+        layout.addWidget(close_button)
+
+    def load(self, replay):
+        self.pause()
+        self._replay = replay
+        self._index = None
+        header = replay.header
+        self.title_label.setText(f"Replay: {header.get('title') or header.get('script_id')}")
+        self.slider.blockSignals(True)
+        self.slider.setRange(0, int(replay.duration * 1000))
+        self.slider.blockSignals(False)
+        self.seek(0.0)
+
+    def seek(self, seconds):
+        if self._replay is None:
+            return
+        self._position = min(max(seconds, 0.0), self._replay.duration)
+        if self._anchor is not None:
+            self._anchor = (time.monotonic(), self._position)
+        index = self._replay.index_at(self._position)
+        if index != self._index:
+            self._index = index
+            self.state_changed.emit(self._replay.state_at(index))
+        self.slider.blockSignals(True)
+        self.slider.setValue(int(self._position * 1000))
+        self.slider.blockSignals(False)
+        self.time_label.setText(f"{_clock(self._position)} / {_clock(self._replay.duration)}")
+
+    def toggle(self):
+        if self._anchor is None:
+            self.play()
+        else:
+            self.pause()
+
+    def play(self):
+        if self._replay is None:
+            return
+        if self._position >= self._replay.duration:
+            self.seek(0.0)
+        self._anchor = (time.monotonic(), self._position)
+        self.play_button.setText("Pause")
+        self._timer.start()
+
+    def pause(self):
+        self._anchor = None
+        self._timer.stop()
+        self.play_button.setText("Play")
+
+    def _on_tick(self):
+        started, position = self._anchor
+        speed = self.speed_combo.currentData()
+        self.seek(position + (time.monotonic() - started) * speed)
+        if self._position >= self._replay.duration:
+            self.pause()
+
+    def _step(self, offset):
+        if self._replay is None:
+            return
+        index = min(max((self._index or 0) + offset, 0), len(self._replay) - 1)
+        self.seek(self._replay.times[index])
+
+    def _on_slider(self, value):
+        self.seek(value / 1000)
+
+    def _on_speed(self, _index):
+        if self._anchor is not None:
+            self._anchor = (time.monotonic(), self._position)
+
+    def _on_close(self):
+        self.pause()
+        self._replay = None
+        self.closed.emit()
+
+
+class StartupReport:
+    # Wall time of each startup phase, measured from when the frontend
+    # package was first imported. Phases after the first paint, such as the
+    # main page being built on first use, are printed as they happen.
+    def __init__(self, enabled=False, started=IMPORTED_AT):
+        self.enabled = enabled
+        self.phases = []
+        self._started = started
+        self._last = started
+        self._reported = False
+
+    def mark(self, phase):
+        # Closes a phase that started where the previous one ended.
+        now = time.perf_counter()
+        self.add(phase, now - self._last)
+        self._last = now
+
+    def add(self, phase, seconds):
+        self.phases.append((phase, seconds))
+        if self.enabled and self._reported:
+            print(f"startup: {phase:<18} {seconds * 1000:8.1f} ms (on first use)")
+
+    def report(self):
+        if self._reported:
+            return
+        self._reported = True
+        if not self.enabled:
+            return
+        for phase, seconds in self.phases:
+            print(f"startup: {phase:<18} {seconds * 1000:8.1f} ms")
+        print(f"startup: {'total':<18} {(self._last - self._started) * 1000:8.1f} ms")
+
+
 class MainWindow(QtWidgets.QMainWindow):
-    def __init__(self):
+    def __init__(self, options=None, startup=None):
         super().__init__()
+        self._options = options or parse_args([])[0]
+        self._startup = startup or StartupReport()
         self.setWindowTitle("Who Sthe Murder MVP")
         self.resize(1000, 700)
         self._server = None
         self._client = NetworkClient()
         self._is_host = False
+        self._is_spectator = False
         self._player_id = None
+        self._asset_index = {}
+        self._cover_name = None
+        self._cover_hash = None
         self._animations = []
-        self._build_ui()
+        self._main_page = None
+        self._startup.mark("window")
+        # The stylesheet goes on before any child exists, so each widget is
+        # polished once as it is created rather than again for the theme.
         self._apply_theme()
+        self._startup.mark("theme")
+        self._build_ui()
         self._connect_signals()
+        self._startup.mark("start page")
 
     def _build_ui(self):
         self.stack = QtWidgets.QStackedWidget()
         self.start_page = StartPage()
-        self.main_page = MainPage()
         self.stack.addWidget(self.start_page)
-        self.stack.addWidget(self.main_page)
-        self.setCentralWidget(self.stack)
+        self.replay_bar = ReplayBar()
+        self.replay_bar.setVisible(False)
+        central = QtWidgets.QWidget()
+        central_layout = QtWidgets.QVBoxLayout(central)
+        central_layout.setContentsMargins(0, 0, 0, 0)
+        central_layout.setSpacing(0)
+        central_layout.addWidget(self.stack, 1)
+        central_layout.addWidget(self.replay_bar)
+        self.setCentralWidget(central)
         self.stack.setCurrentWidget(self.start_page)
 
+    @property
+    def main_page(self):
+        # Players who never leave the start page never build the game page.
+        if self._main_page is None:
+            start = time.perf_counter()
+            self._main_page = MainPage()
+            self.stack.addWidget(self._main_page)
+            self._connect_main_page()
+            self._startup.add("main page", time.perf_counter() - start)
+        return self._main_page
+
     def _apply_theme(self):
         app_font = QtGui.QFont("Bahnschrift", 10)
         self.setFont(app_font)
@@ -605,7 +1174,7 @@ class MainWindow(QtWidgets.QMainWindow):
                 border-radius: 10px;
                 color: #314954;
             }
-            QLineEdit, QSpinBox, QComboBox, QTextEdit, QListWidget {
+            QLineEdit, QSpinBox, QComboBox, QTextEdit, QListWidget, QListView {
                 background: #f8fbfd;
                 border: 1px solid #d7e0e8;
                 border-radius: 10px;
@@ -676,11 +1245,23 @@ class MainWindow(QtWidgets.QMainWindow):
     def _connect_signals(self):
         self.start_page.host_requested.connect(self._start_host)
         self.start_page.client_requested.connect(self._start_client)
+        self.start_page.replay_requested.connect(self.open_replay)
+        self.replay_bar.state_changed.connect(lambda state: self.main_page.update_state(state))
+        self.replay_bar.closed.connect(self._close_replay)
         self._client.message_received.connect(self._on_message)
         self._client.error.connect(self._show_error)
         self._client.disconnected.connect(self._on_disconnected)
-        self.main_page.select_script.connect(
-            lambda script_id: self._client.send({"type": "select_script", "script_id": script_id})
+        self._client.asset_ready.connect(self._on_asset_ready)
+        self._client.asset_failed.connect(self._on_asset_failed)
+
+    def _connect_main_page(self):
+        self.main_page.select_script.connect(self._on_select_script)
+        self.main_page.request_script_page.connect(self._on_request_script_page)
+        self.main_page.request_history.connect(
+            lambda: self._client.send({"type": "history_report"})
+        )
+        self.main_page.search_scripts.connect(
+            lambda query: self._client.send({"type": "search_scripts", "query": query})
         )
         self.main_page.set_player_count.connect(
             lambda count: self._client.send({"type": "set_player_count", "player_count": count})
@@ -694,6 +1275,9 @@ class MainWindow(QtWidgets.QMainWindow):
         self.main_page.advance_phase.connect(
             lambda: self._client.send({"type": "advance_phase"})
         )
+        self.main_page.advance_round.connect(
+            lambda: self._client.send({"type": "advance_round"})
+        )
         self.main_page.reset_game.connect(
             lambda: self._client.send({"type": "reset_game"})
         )
@@ -703,28 +1287,106 @@ class MainWindow(QtWidgets.QMainWindow):
         self.main_page.submit_vote.connect(
             lambda target_id: self._client.send({"type": "submit_vote", "target_id": target_id})
         )
+        self.main_page.audience_vote.connect(
+            lambda target_id: self._client.send({"type": "audience_vote", "target_id": target_id})
+        )
+        self.main_page.set_audience_mode.connect(
+            lambda enabled: self._client.send({"type": "set_audience_mode", "enabled": enabled})
+        )
+        self.main_page.set_phase_timers.connect(
+            lambda timers, auto_close: self._client.send({
+                "type": "set_phase_timers",
+                "timers": timers,
+                "auto_close_votes": auto_close,
+            })
+        )
+
+    def _on_select_script(self, script_id):
+        with self._client.batch() as batch:
+            batch.select_script(script_id)
+            batch.set_player_count(self.main_page.player_count_spin.value())
+
+    def _on_request_script_page(self, cursor, players):
+        message = {"type": "request_script_page", "limit": SCRIPT_PAGE_SIZE}
+        if cursor:
+            message["cursor"] = cursor
+        if players:
+            message["players"] = players
+        self._client.send(message)
 
     def _start_host(self, name, port):
         if self._server:
             return
+        # The server stack is only loaded by the player who hosts.
+        from backend.server import GameServer
+
         try:
-            self._server = GameServer(DEFAULT_HOST, port, get_scripts_path())
+            self._server = GameServer(
+                DEFAULT_HOST,
+                port,
+                get_scripts_path(),
+                profile_dir=self._options.profile_dir,
+                assets_path=get_assets_path(),
+                history_path=default_history_dir(),
+                discovery_port=DISCOVERY_PORT,
+            )
             self._server.start()
         except OSError as exc:
             self._server = None
             self._show_error(str(exc))
             return
+        if self._options.profile:
+            self._server.start_profile(self._options.profile, self._options.profile_seconds)
         self._is_host = True
-        if self._client.connect_to_host("127.0.0.1", port, name, is_host=True):
+        self._is_spectator = False
+        self.main_page.begin_script_paging()
+        if self._client.connect_to_host(
+            "127.0.0.1", port, name, is_host=True, scripts_page=SCRIPT_PAGE_SIZE
+        ):
             self._enter_main()
 
-    def _start_client(self, host, port, name):
+    def _start_client(self, host, port, name, spectator=False, host_token=""):
         self._is_host = False
-        if self._client.connect_to_host(host, port, name, is_host=False):
+        self._is_spectator = spectator
+        # Only the host picks scripts, so players skip the listing; a player
+        # made host by a dedicated server asks for it after the welcome.
+        if self._client.connect_to_host(
+            host,
+            port,
+            name,
+            is_host=bool(host_token) and not spectator,
+            spectator=spectator,
+            scripts_page=0,
+            host_token=host_token or None,
+        ):
             self._enter_main()
 
+    def open_replay(self, path):
+        # Replays need no server: the recorded frames drive the same page a
+        # spectator sees, with the host's private clues included.
+        if self._server:
+            self._show_error("Stop hosting before opening a replay.")
+            return
+        try:
+            replay = Replay.load(path)
+        except (OSError, ValueError) as exc:
+            self._show_error(f"Cannot open replay: {exc}")
+            return
+        self._is_host = False
+        self._is_spectator = True
+        self.main_page.set_player_id(None)
+        self._enter_main()
+        self.replay_bar.setVisible(True)
+        self.replay_bar.load(replay)
+
+    def _close_replay(self):
+        self.replay_bar.setVisible(False)
+        self.stack.setCurrentWidget(self.start_page)
+        self._fade_in(self.start_page)
+
     def _enter_main(self):
         self.main_page.set_host_mode(self._is_host)
+        self.main_page.set_spectator_mode(self._is_spectator)
         self.stack.setCurrentWidget(self.main_page)
         self._fade_in(self.main_page)
 
@@ -733,12 +1395,43 @@ class MainWindow(QtWidgets.QMainWindow):
         if message_type == "welcome":
             self._player_id = message.get("player_id")
             self.main_page.set_player_id(self._player_id)
+            if message.get("is_host") and not self._is_host:
+                # Elected, or accepted by host token, on a dedicated server.
+                self._is_host = True
+                self.main_page.set_host_mode(True)
+                self.main_page.reload_script_pages()
+            self._client.send({"type": "request_asset_index"})
+            return
+        if message_type == "asset_index":
+            assets = message.get("assets")
+            self._asset_index = assets if isinstance(assets, dict) else {}
+            self._load_cover()
             return
         if message_type == "scripts":
             self.main_page.update_scripts(message.get("scripts", []))
             return
+        if message_type == "script_page":
+            self.main_page.add_script_page(message)
+            return
+        if message_type == "history_report":
+            self.main_page.show_history(message)
+            return
+        if message_type == "script_results":
+            self.main_page.show_search_results(message)
+            return
         if message_type == "state":
-            self.main_page.update_state(message.get("state", {}))
+            state = message.get("state", {})
+            self.main_page.update_state(state)
+            cover = (state.get("script") or {}).get("cover")
+            if cover != self._cover_name:
+                self._cover_name = cover
+                self._load_cover()
+            return
+        if message_type == "audience_votes":
+            self.main_page.update_audience(message.get("audience"))
+            return
+        if message_type == "countdown":
+            self.main_page.update_countdown(message)
             return
         if message_type == "role_assigned":
             self.main_page.show_role(message.get("role", {}))
@@ -746,6 +1439,36 @@ class MainWindow(QtWidgets.QMainWindow):
         if message_type == "error":
             self._show_error(message.get("message", "Unknown error"))
             return
+        if message_type == "throttled":
+            if message.get("request_type") == "connect":
+                self._show_error(message.get("message", "Server is full"))
+            return
+        if message_type == "batch_result":
+            if not message.get("ok"):
+                for result in message.get("results", []):
+                    if result.get("error") not in (None, "Rolled back", "Skipped"):
+                        self._show_error(f"{result.get('type')}: {result.get('error')}")
+                        break
+            return
+
+    def _load_cover(self):
+        name = self._cover_name
+        entry = self._asset_index.get(name) if isinstance(name, str) else None
+        digest = entry.get("hash") if isinstance(entry, dict) else None
+        if not isinstance(digest, str):
+            self._cover_hash = None
+            self.main_page.show_cover(None)
+            return
+        self._cover_hash = digest
+        self._client.request_asset(digest)
+
+    def _on_asset_ready(self, digest, path):
+        if digest == self._cover_hash:
+            self.main_page.show_cover(path)
+
+    def _on_asset_failed(self, digest):
+        if digest == self._cover_hash:
+            self.main_page.show_cover(None)
 
     def _on_disconnected(self):
         self._show_error("Disconnected from server. Check the host address and reconnect.")
@@ -762,10 +1485,38 @@ class MainWindow(QtWidgets.QMainWindow):
         event.accept()
 
 
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Who's the Murderer client")
+    parser.add_argument(
+        "--profile",
+        choices=PROFILE_MODES,
+        help="profile the host server for a bounded window after it starts",
+    )
+    parser.add_argument("--profile-seconds", type=float, default=DEFAULT_PROFILE_SECONDS)
+    parser.add_argument("--profile-dir", help="where .pstats and collapsed-stack files are written")
+    parser.add_argument("--replay", metavar="PATH", help="open a recorded game replay")
+    parser.add_argument(
+        "--startup-report",
+        action="store_true",
+        help="print how long each startup phase took",
+    )
+    return parser.parse_known_args(argv)
+
+
 def main():
-    app = QtWidgets.QApplication(sys.argv)
-    window = MainWindow()
+    startup = StartupReport()
+    startup.mark("imports")
+    options, qt_args = parse_args(sys.argv[1:])
+    startup.enabled = options.startup_report
+    app = QtWidgets.QApplication(sys.argv[:1] + qt_args)
+    startup.mark("qt application")
+    window = MainWindow(options, startup)
     window.show()
+    startup.mark("show")
+    # Runs once the event loop has painted the first frame.
+    QtCore.QTimer.singleShot(0, lambda: (startup.mark("first paint"), startup.report()))
+    if options.replay:
+        window.open_replay(options.replay)
     sys.exit(app.exec_())
 
 
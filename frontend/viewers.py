@@ -0,0 +1,134 @@
+import re
+
+from PyQt5 import QtCore, QtWidgets
+
+FETCH_BATCH_SIZE = 256
+CHAPTER_PATTERN = re.compile(
+    r"^\s*(第[0-9一二三四五六七八九十百千零]+[章幕节回卷]|#{1,3}\s+\S|chapter\s+\d+|【[^】]+】)",
+    re.IGNORECASE,
+)
+
+
+def split_lines(text):
+    if not text:
+        return []
+    return text.splitlines()
+
+
+def build_chapter_index(lines):
+    chapters = []
+    for row, line in enumerate(lines):
+        if len(line) > 80:
+            continue
+        if CHAPTER_PATTERN.match(line):
+            chapters.append((line.strip().lstrip("#").strip(), row))
+    return chapters
+
+
+class LazyLinesModel(QtCore.QAbstractListModel):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._lines = []
+        self._loaded = 0
+
+    def set_lines(self, lines):
+        self.beginResetModel()
+        self._lines = lines
+        self._loaded = min(len(lines), FETCH_BATCH_SIZE)
+        self.endResetModel()
+
+    def lines(self):
+        return self._lines
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return self._loaded
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid() or role != QtCore.Qt.DisplayRole:
+            return None
+        return self._lines[index.row()]
+
+    def canFetchMore(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return False
+        return self._loaded < len(self._lines)
+
+    def fetchMore(self, parent=QtCore.QModelIndex()):
+        self.fetch_until(self._loaded + FETCH_BATCH_SIZE - 1)
+
+    def fetch_until(self, row):
+        target = min(len(self._lines), row + 1)
+        if target <= self._loaded:
+            return
+        self.beginInsertRows(QtCore.QModelIndex(), self._loaded, target - 1)
+        self._loaded = target
+        self.endInsertRows()
+
+
+class LazyListView(QtWidgets.QListView):
+    def __init__(self, parent=None, uniform=True):
+        super().__init__(parent)
+        self._model = LazyLinesModel(self)
+        self.setModel(self._model)
+        self.setUniformItemSizes(uniform)
+        self.setLayoutMode(QtWidgets.QListView.Batched)
+        self.setBatchSize(FETCH_BATCH_SIZE)
+        self.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.setVerticalScrollMode(QtWidgets.QAbstractItemView.ScrollPerPixel)
+
+    def set_items(self, labels):
+        self._model.set_lines(list(labels))
+
+    def items(self):
+        return self._model.lines()
+
+    def clear(self):
+        self._model.set_lines([])
+
+    def scroll_to_row(self, row):
+        self._model.fetch_until(row)
+        index = self._model.index(row)
+        if index.isValid():
+            self.scrollTo(index, QtWidgets.QAbstractItemView.PositionAtTop)
+
+
+class LazyTextView(QtWidgets.QWidget):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._text = ""
+        self._chapters = []
+        layout = QtWidgets.QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.setSpacing(6)
+        self.chapter_combo = QtWidgets.QComboBox()
+        self.chapter_combo.setVisible(False)
+        self.chapter_combo.activated.connect(self.jump_to_chapter)
+        self.lines_view = LazyListView(uniform=False)
+        self.lines_view.setWordWrap(True)
+        self.lines_view.setResizeMode(QtWidgets.QListView.Adjust)
+        self.lines_view.setSelectionMode(QtWidgets.QAbstractItemView.ExtendedSelection)
+        layout.addWidget(self.chapter_combo)
+        layout.addWidget(self.lines_view)
+
+    def setPlainText(self, text):
+        self._text = text or ""
+        lines = split_lines(self._text)
+        self._chapters = build_chapter_index(lines)
+        self.lines_view.set_items(lines)
+        self.chapter_combo.clear()
+        for title, _ in self._chapters:
+            self.chapter_combo.addItem(title)
+        self.chapter_combo.setVisible(bool(self._chapters))
+
+    def toPlainText(self):
+        return self._text
+
+    def chapters(self):
+        return list(self._chapters)
+
+    def jump_to_chapter(self, chapter_index):
+        if chapter_index < 0 or chapter_index >= len(self._chapters):
+            return
+        self.lines_view.scroll_to_row(self._chapters[chapter_index][1])